@@ -0,0 +1,174 @@
+"""
+Adaptive (AIMD) concurrency control for TDL Easy engines.
+
+Instead of a fixed downloadLimit/threads pair, the controller starts low
+and probes upward one step per interval while throughput keeps growing
+(additive increase). It halves concurrency on FLOOD_WAIT or when too many
+messages fail (multiplicative decrease), then waits a few intervals
+before probing again. Throughput is bytes/s while tdl reports sizes and
+messages/s otherwise; a probe is only judged against a rate in the same
+unit. update() only looks at ProgressTracker snapshots and takes the
+clock as an argument, so it can be driven by a simulated
+tdl or by recorded numbers.
+"""
+import threading
+from contextlib import contextmanager
+
+# same bounds as the launcher's downloadLimit/threads dialogs
+MIN_WORKERS, MAX_WORKERS = 1, 10
+MIN_THREADS, MAX_THREADS = 1, 8
+START_WORKERS = 1
+START_THREADS = 2
+DEFAULT_INTERVAL = 10.0
+# an interval counts as overloaded when its failed/finished ratio is this
+# much above the usual ratio (deleted or empty messages always fail)
+DEFAULT_ERROR_THRESHOLD = 0.25
+# fewer finished messages than this in an interval say nothing about errors
+MIN_ERROR_SAMPLE = 8
+# smoothing factor for the usual error ratio
+ERROR_SMOOTHING = 0.2
+# an increase has to gain at least this much throughput to be kept
+DEFAULT_MIN_GAIN = 0.05
+# intervals to hold after a decrease or an unprofitable probe
+DEFAULT_COOLDOWN = 3
+
+class AimdController:
+    """
+    Decide the number of concurrent tdl workers and the -t threads value.
+
+    Call update(snapshot, now) every `interval` seconds with the engine's
+    progress snapshot. Workers are gated through slot(); threads is read
+    when the next tdl command is built.
+    """
+
+    def __init__(self, min_workers=MIN_WORKERS, max_workers=MAX_WORKERS,
+                 min_threads=MIN_THREADS, max_threads=MAX_THREADS,
+                 workers=START_WORKERS, threads=START_THREADS,
+                 error_threshold=DEFAULT_ERROR_THRESHOLD, min_gain=DEFAULT_MIN_GAIN,
+                 cooldown=DEFAULT_COOLDOWN, interval=DEFAULT_INTERVAL):
+        self.min_workers = max(1, min_workers)
+        self.max_workers = max(self.min_workers, max_workers)
+        self.min_threads = max(1, min_threads)
+        self.max_threads = max(self.min_threads, max_threads)
+        self.workers = min(max(workers, self.min_workers), self.max_workers)
+        self.threads = min(max(threads, self.min_threads), self.max_threads)
+        self.error_threshold = error_threshold
+        self.min_gain = min_gain
+        self.cooldown = cooldown
+        self.interval = interval
+        # (time, workers, threads, rate, reason) for every change
+        self.history = []
+        self._last = None
+        self._probe = None
+        self._hold = 0
+        self._error_ratio = None
+        self._grow_threads = False
+        self._active = 0
+        self._cond = threading.Condition()
+
+    # ------------------------------------------------------------------
+    # worker gate
+    # ------------------------------------------------------------------
+
+    @contextmanager
+    def slot(self):
+        """
+        Hold one of the currently allowed worker slots.
+        """
+        with self._cond:
+            while self._active >= self.workers:
+                self._cond.wait()
+            self._active += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._active -= 1
+                self._cond.notify_all()
+
+    def _set(self, workers, threads, now, rate, reason):
+        with self._cond:
+            changed = (workers, threads) != (self.workers, self.threads)
+            self.workers, self.threads = workers, threads
+            self._cond.notify_all()
+        if changed:
+            self.history.append((now, workers, threads, rate, reason))
+            return reason
+        return None
+
+    # ------------------------------------------------------------------
+    # control loop
+    # ------------------------------------------------------------------
+
+    def update(self, snap, now):
+        """
+        Feed one progress snapshot; returns a reason string if the
+        concurrency changed, else None.
+        """
+        counters = (snap['bytes'], snap['downloaded'], snap['failed'], snap.get('flood_waits', 0))
+        if self._last is None:
+            self._last = (now, counters)
+            return None
+        last_time, last = self._last
+        dt = now - last_time
+        if dt <= 0:
+            return None
+        self._last = (now, counters)
+        d_bytes, d_done, d_failed, d_flood = (c - p for c, p in zip(counters, last))
+        finished = d_done + d_failed
+        # bytes when tdl reports sizes, message count otherwise
+        if d_bytes:
+            rate, unit = d_bytes / dt, 'bytes'
+        else:
+            rate, unit = d_done / dt, 'messages'
+
+        if d_flood:
+            return self._decrease(now, rate, 'FLOOD_WAIT', threads_too=True)
+        if finished >= MIN_ERROR_SAMPLE:
+            ratio = d_failed / finished
+            usual = self._error_ratio
+            if usual is None:
+                self._error_ratio = ratio
+            else:
+                self._error_ratio += ERROR_SMOOTHING * (ratio - usual)
+                if ratio > usual + self.error_threshold:
+                    return self._decrease(now, rate, f"{d_failed}/{finished} failed")
+        if not finished and not d_bytes:
+            # nothing finished yet (large files): no signal either way
+            return None
+
+        if self._probe is not None:
+            previous_rate, previous_unit, workers, threads = self._probe
+            self._probe = None
+            if unit != previous_unit:
+                # bytes/s and messages/s do not compare: keep the probe's
+                # setting and measure again from here
+                return None
+            if rate < previous_rate * (1 + self.min_gain):
+                self._hold = self.cooldown
+                return self._set(workers, threads, now, rate, 'no throughput gain')
+        if self._hold:
+            self._hold -= 1
+            return None
+        return self._increase(now, rate, unit)
+
+    def _increase(self, now, rate, unit):
+        workers, threads = self.workers, self.threads
+        can_workers = workers < self.max_workers
+        can_threads = threads < self.max_threads
+        if not (can_workers or can_threads):
+            return None
+        if can_threads and (self._grow_threads or not can_workers):
+            threads += 1
+        else:
+            workers += 1
+        self._grow_threads = not self._grow_threads
+        self._probe = (rate, unit, self.workers, self.threads)
+        return self._set(workers, threads, now, rate, 'probing')
+
+    def _decrease(self, now, rate, reason, threads_too=False):
+        self._probe = None
+        self._hold = self.cooldown
+        workers = max(self.min_workers, self.workers // 2)
+        threads = max(self.min_threads, self.threads // 2) if threads_too else self.threads
+        return self._set(workers, threads, now, rate, reason)
@@ -0,0 +1,488 @@
+"""
+Headless command line entry point for TDL Easy.
+
+Runs range, full-chat, single-file and bulk link jobs in-process from a JSON
+config using the same keys as tdl_easy.json, without importing tkinter:
+
+    python -m tdl_gui run range --config job.json
+    python -m tdl_gui run full --config job.json
+    python -m tdl_gui run single --config job.json
+    python -m tdl_gui run bulk --config job.json
+
+or queues them for the multi-job scheduler:
+
+    python -m tdl_gui jobs add full --config chat1.json --priority 5
+    python -m tdl_gui jobs list
+    python -m tdl_gui jobs run --max-jobs 3 --max-processes 8
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+import tdl_engine
+import tdl_jobs
+import tdl_plan
+import tdl_progress
+from tdl_retry import DeadLetters
+from tdl_adaptive import AimdController
+from tdl_export import ExportFormatError
+from tdl_index import write_json_atomic
+from tdl_links import parse_base_url, parse_link, parse_links, read_links_file
+
+JOB_MODES = ('range', 'full', 'single', 'bulk')
+
+# seconds between progress lines printed by `run`
+PROGRESS_INTERVAL = 10
+
+class ConfigError(ValueError):
+    """
+    Raised when a job config is missing or has invalid values.
+    """
+
+# ==============================================================================
+# Config handling
+# ==============================================================================
+
+def load_config(path):
+    """
+    Load a job config in tdl_easy.json format.
+    """
+    try:
+        with open(path, 'r', encoding='utf-8-sig') as f:
+            config = json.load(f)
+    except (OSError, ValueError) as e:
+        raise ConfigError(f"cannot read config {path}: {e}")
+    if not isinstance(config, dict):
+        raise ConfigError(f"config {path} must be a JSON object")
+    return config
+
+def save_config(path, config):
+    """
+    Write config back through a temp file and atomic rename.
+    """
+    write_json_atomic(path, config, ensure_ascii=False, indent=2)
+
+def _require(config, key):
+    value = config.get(key)
+    if value is None or str(value).strip() == '':
+        raise ConfigError(f"config key '{key}' is required")
+    return value
+
+def _int_option(config, key, default, low, high):
+    value = config.get(key)
+    if value is None or str(value).strip() == '':
+        return default
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise ConfigError(f"config key '{key}' must be an integer")
+    if not low <= value <= high:
+        raise ConfigError(f"config key '{key}' must be between {low} and {high}")
+    return value
+
+def _float_option(config, key, default, low, high):
+    value = config.get(key)
+    if value is None or str(value).strip() == '':
+        return default
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        raise ConfigError(f"config key '{key}' must be a number")
+    if not low <= value <= high:
+        raise ConfigError(f"config key '{key}' must be between {low} and {high}")
+    return value
+
+def _common_options(config):
+    tdl_path = _require(config, 'tdl_path')
+    media_dir = _require(config, 'mediaDir')
+    if not os.path.isdir(tdl_path):
+        raise ConfigError(f"TDL path not found: {tdl_path}")
+    if not os.path.isdir(media_dir):
+        raise ConfigError(f"Media directory not found: {media_dir}")
+    return {
+        'tdl_path': tdl_path,
+        'media_dir': media_dir,
+        'download_limit': _int_option(config, 'downloadLimit', tdl_engine.DEFAULT_DOWNLOAD_LIMIT, 1, 10),
+        'threads': _int_option(config, 'threads', tdl_engine.DEFAULT_THREADS, 1, 8),
+        'max_retries': _int_option(config, 'maxRetries', tdl_engine.DEFAULT_MAX_RETRIES, 1, 5),
+        'controller': AimdController() if config.get('autoConcurrency') else None,
+        'rate_limit': _float_option(config, 'rateLimit', None, 0.05, 100),
+        'stall_timeout': _int_option(config, 'stallTimeout', tdl_engine.DEFAULT_IDLE_TIMEOUT,
+                                     10, 24 * 3600),
+        'dedup': bool(config.get('dedup')),
+    }
+
+def _message_url(config, key):
+    url = str(_require(config, key)).strip()
+    link = parse_link(url)
+    if link is None:
+        raise ConfigError(f"config key '{key}' is not a Telegram message URL: {url}")
+    return url, link.topic_base_url, link.message
+
+# ==============================================================================
+# Job builders
+# ==============================================================================
+
+def config_ranges(config):
+    """
+    Return (base URL, [(start ID, end ID), ...]) of a range job: startUrl
+    with endUrl or endId, plus every [startUrl, endUrl] pair in `ranges`.
+    All ranges must be in one chat; with several of them the base URL is
+    the chat's, without a topic, so ranges from different topics can
+    share a job.
+    """
+    spans = []
+    chats = set()
+    base = None
+    if config.get('startUrl') or not config.get('ranges'):
+        _url, base, start_id = _message_url(config, 'startUrl')
+        if config.get('endUrl'):
+            _url, _base, end_id = _message_url(config, 'endUrl')
+        else:
+            end_id = _int_option(config, 'endId', None, 0, tdl_engine.MAX_MESSAGE_ID)
+        if end_id is None or end_id < start_id:
+            raise ConfigError('endId must be >= startId.')
+        spans.append((start_id, end_id))
+        chats.add(tdl_engine.chat_from_base_url(base).lower())
+    ranges = config.get('ranges') or []
+    if not isinstance(ranges, list):
+        raise ConfigError("config key 'ranges' must be a list of [startUrl, endUrl] pairs")
+    for i, pair in enumerate(ranges):
+        links = [None]
+        if isinstance(pair, list) and len(pair) == 2:
+            links = [parse_link(str(url).strip()) for url in pair]
+        if None in links:
+            raise ConfigError(f"ranges[{i}] must be a [startUrl, endUrl] pair of Telegram message URLs")
+        start, end = links
+        if end.message < start.message:
+            raise ConfigError(f"ranges[{i}]: the end message must not be before the start")
+        spans.append((start.message, end.message))
+        chats.update((start.chat.lower(), end.chat.lower()))
+        base = base or start.topic_base_url
+    if len(chats) > 1:
+        raise ConfigError('all ranges of a job must be in one chat')
+    if len(spans) > 1:
+        base = parse_base_url(base).base_url
+    return base, spans
+
+def build_range_engine(config, log):
+    opts = _common_options(config)
+    base, spans = config_ranges(config)
+    (start_id, end_id), more = spans[0], spans[1:]
+    order = config.get('order') or tdl_plan.ORDER_ID
+    if order not in tdl_plan.ORDERS:
+        raise ConfigError(f"config key 'order' must be one of: {', '.join(tdl_plan.ORDERS)}")
+    return tdl_engine.RangeEngine(opts['tdl_path'], opts['media_dir'], base, start_id, end_id,
+                                  download_limit=opts['download_limit'], threads=opts['threads'],
+                                  max_retries=opts['max_retries'], log=log,
+                                  controller=opts['controller'], rate_limit=opts['rate_limit'],
+                                  stall_timeout=opts['stall_timeout'], dedup=opts['dedup'],
+                                  plan=bool(config.get('plan')), order=order,
+                                  batch_size=_int_option(config, 'batchSize',
+                                                         tdl_engine.DEFAULT_BATCH_SIZE, 1, 100),
+                                  ranges=more)
+
+def build_full_engine(config, log, full_sync=False):
+    opts = _common_options(config)
+    _url, base, _msg_id = _message_url(config, 'telegramMessageUrl')
+    chat = tdl_engine.chat_from_base_url(base)
+    since_id = None
+    if 'sinceId' in config:
+        since_id = config['sinceId'] or None
+    elif not full_sync:
+        since_id = (config.get('highWaterMarks') or {}).get(chat)
+    return tdl_engine.FullChatEngine(opts['tdl_path'], opts['media_dir'], chat,
+                                     workers=_int_option(config, 'shardWorkers',
+                                                         tdl_engine.DEFAULT_SHARD_WORKERS, 1, 16),
+                                     download_limit=opts['download_limit'], threads=opts['threads'],
+                                     max_retries=opts['max_retries'], since_id=since_id, log=log,
+                                     controller=opts['controller'], rate_limit=opts['rate_limit'],
+                                     stall_timeout=opts['stall_timeout'], dedup=opts['dedup'],
+                                     pack=bool(config.get('packBySize')))
+
+def build_single_engine(config, log):
+    opts = _common_options(config)
+    _url, base, msg_id = _message_url(config, 'telegramUrl')
+    return tdl_engine.RangeEngine(opts['tdl_path'], opts['media_dir'], base, msg_id, msg_id,
+                                  download_limit=1, threads=opts['threads'],
+                                  max_retries=opts['max_retries'], log=log,
+                                  controller=opts['controller'], rate_limit=opts['rate_limit'],
+                                  stall_timeout=opts['stall_timeout'], dedup=opts['dedup'])
+
+def config_links(config):
+    """
+    Return the message links (TelegramLink) of a bulk job: the `links`
+    key (a list of URLs or one multi-line string) plus the links found in
+    the text or CSV file named by `linksFile`.
+    """
+    links = config.get('links') or []
+    text = links if isinstance(links, str) else '\n'.join(map(str, links))
+    found, invalid, _duplicates = parse_links(text)
+    if config.get('linksFile'):
+        try:
+            more, more_invalid, _duplicates = read_links_file(config['linksFile'])
+        except OSError as e:
+            raise ConfigError(f"cannot read linksFile: {e}")
+        seen = {link.key for link in found}
+        found += [link for link in more if link.key not in seen]
+        invalid += more_invalid
+    if not found:
+        raise ConfigError("config has no valid message links in 'links' or 'linksFile'")
+    return found, invalid
+
+def build_bulk_engine(config, log):
+    opts = _common_options(config)
+    links, invalid = config_links(config)
+    if invalid:
+        log(f"[!] Ignoring {len(invalid)} invalid links, e.g. {invalid[0]}")
+    return tdl_engine.BulkEngine(opts['tdl_path'], opts['media_dir'], links,
+                                 download_limit=opts['download_limit'], threads=opts['threads'],
+                                 max_retries=opts['max_retries'], log=log,
+                                 rate_limit=opts['rate_limit'], stall_timeout=opts['stall_timeout'],
+                                 dedup=opts['dedup'],
+                                 batch_size=_int_option(config, 'batchSize',
+                                                        tdl_engine.DEFAULT_BATCH_SIZE, 1, 100))
+
+def build_engine(mode, config, log=None, full_sync=False):
+    """
+    Build the engine for a 'range', 'full', 'single' or 'bulk' job.
+    """
+    log = log or _print_log
+    if mode == 'range':
+        return build_range_engine(config, log)
+    if mode == 'full':
+        return build_full_engine(config, log, full_sync=full_sync)
+    if mode == 'single':
+        return build_single_engine(config, log)
+    if mode == 'bulk':
+        return build_bulk_engine(config, log)
+    raise ConfigError(f"unknown job mode: {mode}")
+
+def job_chat(mode, config):
+    """
+    Return the chat a job's engine will download, or None for bulk jobs
+    and configs that do not name one (those fail when the job starts).
+    """
+    try:
+        if mode == 'range':
+            base, _spans = config_ranges(config)
+        elif mode == 'full':
+            _url, base, _msg_id = _message_url(config, 'telegramMessageUrl')
+        elif mode == 'single':
+            _url, base, _msg_id = _message_url(config, 'telegramUrl')
+        else:
+            return None
+    except ConfigError:
+        return None
+    return tdl_engine.chat_from_base_url(base)
+
+def job_chats(mode, config):
+    """
+    Return every chat a job downloads, lowercased, for the scheduler's
+    one-job-per-chat rule: the chats of all of a bulk job's links, else
+    job_chat() (an empty list when unknown).
+    """
+    if mode == 'bulk':
+        try:
+            links, _invalid = config_links(config)
+        except ConfigError:
+            return []
+        return sorted({link.chat.lower() for link in links})
+    chat = job_chat(mode, config)
+    return [chat.lower()] if chat else []
+
+def config_chat(config):
+    """
+    Return (media dir, chat) a job config downloads into.
+    """
+    media_dir = _require(config, 'mediaDir')
+    for key in ('telegramMessageUrl', 'startUrl', 'telegramUrl'):
+        if config.get(key):
+            _url, base, _msg_id = _message_url(config, key)
+            return media_dir, tdl_engine.chat_from_base_url(base)
+    if config.get('ranges'):
+        base, _spans = config_ranges(config)
+        return media_dir, tdl_engine.chat_from_base_url(base)
+    raise ConfigError('config has no telegramMessageUrl, startUrl, ranges or telegramUrl')
+
+def save_high_water_mark(config_path, chat, msg_id):
+    """
+    Store a full-chat high-water mark in a job config file.
+    """
+    config = load_config(config_path)
+    config.setdefault('highWaterMarks', {})[chat] = msg_id
+    save_config(config_path, config)
+
+# ==============================================================================
+# Entry point
+# ==============================================================================
+
+def _print_log(text):
+    # one write per line, so lines from parallel workers do not interleave
+    sys.stdout.write(text + '\n')
+    sys.stdout.flush()
+
+def default_jobs_dir():
+    """
+    Return jobs directory next to the launcher script/executable.
+    """
+    if getattr(sys, 'frozen', False):
+        base = os.path.dirname(os.path.abspath(sys.argv[0]))
+    else:
+        base = os.path.abspath(os.path.dirname(__file__))
+    return os.path.join(base, tdl_jobs.JOBS_DIR_NAME)
+
+def run_engine(engine, progress_interval=PROGRESS_INTERVAL):
+    """
+    Run engine on a worker thread so Ctrl+C can stop it cleanly, printing
+    a progress line every progress_interval seconds (0 disables it).
+    """
+    outcome = {}
+
+    def runner():
+        try:
+            outcome['result'] = engine.run()
+        except Exception as e:
+            outcome['error'] = e
+
+    worker = threading.Thread(target=runner, daemon=True)
+    worker.start()
+    next_report = time.time() + progress_interval
+    try:
+        while worker.is_alive():
+            worker.join(0.5)
+            if progress_interval and time.time() >= next_report and worker.is_alive():
+                next_report += progress_interval
+                print(f"[i] {tdl_progress.format_progress(engine.progress.snapshot())}", flush=True)
+    except KeyboardInterrupt:
+        print('[!] Interrupted by user, finishing running downloads...', flush=True)
+        engine.stop()
+        worker.join()
+    if 'error' in outcome:
+        raise outcome['error']
+    return outcome.get('result')
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='tdl_gui', description='TDL Easy headless runner')
+    sub = parser.add_subparsers(dest='command', required=True)
+    run = sub.add_parser('run', help='run a download job in this process')
+    run.add_argument('mode', choices=JOB_MODES)
+    run.add_argument('--config', required=True, help='job config in tdl_easy.json format')
+    run.add_argument('--full-sync', action='store_true',
+                     help='full mode: ignore the saved high-water mark')
+
+    jobs = sub.add_parser('jobs', help='manage the persistent job queue')
+    jobs.add_argument('--jobs-dir', default=None, help='job queue directory')
+    jobs_sub = jobs.add_subparsers(dest='jobs_command', required=True)
+    add = jobs_sub.add_parser('add', help='queue a job')
+    add.add_argument('mode', choices=JOB_MODES)
+    add.add_argument('--config', required=True, help='job config in tdl_easy.json format')
+    add.add_argument('--priority', type=int, default=0, help='higher runs first')
+    jobs_sub.add_parser('list', help='show queued, running and finished jobs')
+    for name in ('cancel', 'remove'):
+        cmd = jobs_sub.add_parser(name, help=f"{name} a job")
+        cmd.add_argument('job_id')
+    run_jobs = jobs_sub.add_parser('run', help='run queued jobs until the queue is empty')
+    run_jobs.add_argument('--max-jobs', type=int, default=tdl_jobs.DEFAULT_MAX_JOBS)
+    run_jobs.add_argument('--max-processes', type=int, default=tdl_jobs.DEFAULT_MAX_PROCESSES,
+                          help='global cap on concurrent tdl processes')
+    run_jobs.add_argument('--max-threads', type=int, default=tdl_jobs.DEFAULT_MAX_THREADS,
+                          help='global cap on summed tdl -t threads')
+
+    dead = sub.add_parser('dead', help='show or re-queue messages that failed every retry')
+    dead_sub = dead.add_subparsers(dest='dead_command', required=True)
+    for name in ('list', 'requeue'):
+        cmd = dead_sub.add_parser(name)
+        cmd.add_argument('--config', required=True, help='job config in tdl_easy.json format')
+        if name == 'requeue':
+            cmd.add_argument('ids', nargs='*', type=int, help='message IDs (default: all)')
+    return parser
+
+def run_dead_command(args):
+    media_dir, chat = config_chat(load_config(args.config))
+    letters = DeadLetters.open(media_dir, chat)
+    if args.dead_command == 'list':
+        for msg_id, entry in letters.entries():
+            print(f"{msg_id}  attempts={entry['attempts']}  "
+                  f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(entry['time']))}  {entry['error']}")
+        return 0
+    removed = letters.requeue(args.ids or None)
+    letters.save()
+    print(f"[i] Re-queued {len(removed)} messages of chat {chat}")
+    return 0
+
+def run_jobs_command(args):
+    store = tdl_jobs.JobStore(args.jobs_dir or default_jobs_dir())
+    if args.jobs_command == 'add':
+        config = load_config(args.config)
+        job = store.add(args.mode, config_path=args.config, priority=args.priority,
+                        chat=job_chat(args.mode, config), chats=job_chats(args.mode, config))
+        print(job['id'])
+        return 0
+    if args.jobs_command == 'list':
+        for job in store.list():
+            stats = job.get('stats') or {}
+            print(f"{job['id']}  {job['mode']:<6} prio={job['priority']:<3} {job['status']:<9} "
+                  f"{job.get('chat') or '-':<20} downloaded={stats.get('downloaded', 0)} "
+                  f"failed={stats.get('failed', 0)} {job.get('error') or ''}".rstrip())
+        return 0
+    if args.jobs_command == 'remove':
+        return 0 if store.remove(args.job_id) else 1
+    if args.jobs_command == 'cancel':
+        job = store.get(args.job_id)
+        if not job or job['status'] != tdl_jobs.STATUS_QUEUED:
+            return 1
+        store.update(args.job_id, status=tdl_jobs.STATUS_CANCELLED)
+        return 0
+
+    failed = []
+
+    def on_finish(job):
+        stats = job.get('stats') or {}
+        print(f"[{'+' if job['status'] == tdl_jobs.STATUS_DONE else 'x'}] Job {job['id']} "
+              f"{job['status']}: {job.get('error') or stats}", flush=True)
+        if job['status'] != tdl_jobs.STATUS_DONE or stats.get('failed'):
+            failed.append(job['id'])
+        if job['mode'] == 'full' and stats.get('high_water') and job.get('configPath'):
+            save_high_water_mark(job['configPath'], job['chat'], stats['high_water'])
+
+    scheduler = tdl_jobs.Scheduler(
+        store, build_engine, max_jobs=args.max_jobs,
+        budget=tdl_jobs.ProcessBudget(args.max_processes, args.max_threads),
+        on_finish=on_finish)
+    try:
+        scheduler.run_until_empty()
+    except KeyboardInterrupt:
+        print('[!] Interrupted by user, stopping running jobs...', flush=True)
+        scheduler.stop()
+        while scheduler.running:
+            time.sleep(0.5)
+    return 1 if failed else 0
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    try:
+        if args.command == 'jobs':
+            return run_jobs_command(args)
+        if args.command == 'dead':
+            return run_dead_command(args)
+        config = load_config(args.config)
+        engine = build_engine(args.mode, config, full_sync=args.full_sync)
+        stats = run_engine(engine)
+    except ConfigError as e:
+        print(f"[x] Error: {e}", file=sys.stderr)
+        return 2
+    except (OSError, RuntimeError, ExportFormatError) as e:
+        print(f"[x] Error: {e}", file=sys.stderr)
+        return 1
+
+    if args.mode == 'full' and stats.get('high_water'):
+        save_high_water_mark(args.config, engine.chat, stats['high_water'])
+    return 1 if stats['failed'] else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
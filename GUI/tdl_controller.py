@@ -0,0 +1,194 @@
+"""
+Controller between the launcher window and the job scheduler.
+
+The Tk mainloop must never wait for job work. The window hands submit,
+pause, resume and cancel commands to the controller, which carries them
+out on its own worker thread next to the scheduler's job threads. The
+controller posts events back on a thread-safe queue that the window
+drains with after():
+
+    ('jobs', [row, ...])   state of this session's jobs, every refresh
+    ('finished', job)      a job finished, failed or was cancelled
+    ('error', text)        a command could not be carried out
+
+Nothing in here imports tkinter.
+"""
+import queue
+import threading
+import time
+
+from tdl_jobs import JobStore, Scheduler, STATUS_QUEUED, STATUS_RUNNING
+
+EVENT_JOBS = 'jobs'
+EVENT_FINISHED = 'finished'
+EVENT_ERROR = 'error'
+
+# shown for a running job whose engine is paused
+STATUS_PAUSED = 'paused'
+
+DEFAULT_REFRESH_INTERVAL = 0.5
+# finished jobs kept in the rows; older ones are dropped
+MAX_FINISHED_ROWS = 50
+
+class JobController:
+    """
+    Run launcher jobs in the background and report on them through
+    self.events. Every public method only queues a command, so it is safe
+    to call from the Tk thread.
+    """
+
+    def __init__(self, jobs_dir, engine_factory, refresh_interval=DEFAULT_REFRESH_INTERVAL,
+                 **scheduler_options):
+        self.store = JobStore(jobs_dir)
+        self.scheduler = Scheduler(self.store, engine_factory, on_finish=self._on_finish,
+                                   **scheduler_options)
+        self.refresh_interval = refresh_interval
+        self.events = queue.Queue()
+        self._commands = queue.Queue()
+        self._stop = threading.Event()
+        self._thread = None
+        # job id -> last known job dict: queued ones found at start plus
+        # the ones submitted, started or finished since; rows() builds on
+        # it instead of reading every job file again
+        self._jobs = {}
+        self._jobs_lock = threading.Lock()
+
+    # commands (any thread)
+
+    def submit(self, mode, config, priority=0, chat=None, chats=None):
+        self._commands.put(('submit', mode, config, priority, chat, chats))
+
+    def pause(self, job_id):
+        self._commands.put(('pause', job_id))
+
+    def resume(self, job_id):
+        self._commands.put(('resume', job_id))
+
+    def cancel(self, job_id):
+        self._commands.put(('cancel', job_id))
+
+    def drain(self):
+        """
+        Return the events posted since the last call, without waiting.
+        """
+        events = []
+        while True:
+            try:
+                events.append(self.events.get_nowait())
+            except queue.Empty:
+                return events
+
+    def start(self):
+        if self._thread is None:
+            for job in self.store.list():
+                if job['status'] in (STATUS_QUEUED, STATUS_RUNNING):
+                    self._remember(job)
+            self.scheduler.start()
+            self._thread = threading.Thread(target=self._loop, daemon=True)
+            self._thread.start()
+
+    def stop(self, kill=False, timeout=None):
+        """
+        Stop the worker and every running job; with kill their tdl
+        processes are terminated. With timeout, wait up to that many
+        seconds for the jobs to save their state and the worker to exit.
+        """
+        self._stop.set()
+        self._commands.put(None)
+        self.scheduler.stop(kill=kill, timeout=timeout)
+        if self._thread is not None and timeout is not None:
+            self._thread.join(timeout)
+
+    @property
+    def stopped(self):
+        """
+        True once stop() was called and the worker and every job have
+        ended, so the window can poll for it instead of waiting.
+        """
+        return (self._stop.is_set() and not self.scheduler.running
+                and not (self._thread is not None and self._thread.is_alive()))
+
+    # worker thread
+
+    def _remember(self, job):
+        with self._jobs_lock:
+            self._jobs[job['id']] = job
+            finished = [j for j in self._jobs.values()
+                        if j['status'] not in (STATUS_QUEUED, STATUS_RUNNING)]
+            for old in sorted(finished, key=lambda j: j.get('finished') or 0)[:-MAX_FINISHED_ROWS]:
+                del self._jobs[old['id']]
+
+    def _on_finish(self, job):
+        if job:
+            self._remember(job)
+        self.events.put((EVENT_FINISHED, job))
+        self._commands.put(('refresh',))
+
+    def _handle(self, command):
+        name, args = command[0], command[1:]
+        if name == 'submit':
+            mode, config, priority, chat, chats = args
+            self._remember(self.store.add(mode, config=config, priority=priority, chat=chat,
+                                          chats=chats))
+            self.scheduler.wake()
+        elif name == 'cancel':
+            if not self.scheduler.cancel(args[0], kill=True):
+                self.events.put((EVENT_ERROR, f"job {args[0]} cannot be cancelled"))
+            elif args[0] not in self.scheduler.running:
+                # a queued job: cancelled in its file right away
+                job = self.store.get(args[0])
+                if job:
+                    self._remember(job)
+        elif name in ('pause', 'resume'):
+            if not getattr(self.scheduler, name)(args[0]):
+                self.events.put((EVENT_ERROR, f"job {args[0]} is not running"))
+
+    def _loop(self):
+        next_refresh = 0
+        while not self._stop.is_set():
+            try:
+                command = self._commands.get(timeout=max(0, next_refresh - time.monotonic()))
+            except queue.Empty:
+                command = None
+            if command is not None:
+                try:
+                    self._handle(command)
+                except Exception as e:
+                    self.events.put((EVENT_ERROR, str(e)))
+            if time.monotonic() >= next_refresh or command is not None:
+                self.events.put((EVENT_JOBS, self.rows()))
+                next_refresh = time.monotonic() + self.refresh_interval
+
+    def rows(self):
+        """
+        Return one dict per job of this session: id, mode, chat, status
+        and, for running jobs, a progress snapshot. Only jobs that started
+        without being seen before (queued by another process) are read
+        from their files.
+        """
+        running = dict(self.scheduler.running)
+        for job_id in running:
+            if job_id not in self._jobs:
+                job = self.store.get(job_id)
+                if job:
+                    self._remember(job)
+        with self._jobs_lock:
+            for job_id in running:
+                job = self._jobs.get(job_id)
+                if job and job['status'] == STATUS_QUEUED:
+                    # shown as running until its finish event arrives
+                    self._jobs[job_id] = dict(job, status=STATUS_RUNNING)
+            jobs = sorted(self._jobs.values(), key=lambda j: j['created'])
+        rows = []
+        for job in jobs:
+            engine = running.get(job['id'])
+            row = {'id': job['id'], 'mode': job['mode'], 'chat': job.get('chat'),
+                   'status': job['status'], 'progress': None}
+            if engine is not None:
+                row['chat'] = engine.chat
+                row['status'] = STATUS_PAUSED if engine.paused else STATUS_RUNNING
+                row['progress'] = engine.progress.snapshot()
+            elif job.get('stats'):
+                row['stats'] = job['stats']
+            rows.append(row)
+        return rows
@@ -0,0 +1,258 @@
+"""
+Content deduplication store for TDL Easy.
+
+The same forwarded video posted in twenty channels used to be downloaded
+and stored twenty times. One DedupStore per launcher (kept next to tdl)
+remembers the size and SHA-256 of every downloaded file in any media
+directory and the Telegram document or photo ID it came from (read from
+`tdl chat export --raw`). Engines then skip messages whose document is
+already on disk and link the existing file under the new message's
+name, and any download whose content matches an existing file is
+replaced by a link to it. Links across filesystems fall back to a copy.
+Files are hashed only when another file of the same size exists.
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+
+from tdl_index import INDEX_DIR_NAME, write_json_atomic
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+DEDUP_NAME = 'dedup.json'
+
+# ioctl that makes one file share the extents of another (btrfs, XFS)
+FICLONE = 0x40049409
+
+_HASH_CHUNK = 1 << 20
+
+def document_key(msg):
+    """
+    Return 'document:<id>' or 'photo:<id>' for an export message that
+    carries its raw MTProto struct, else None.
+    """
+    media = raw_field(msg.get('raw'), 'media')
+    for kind in ('document', 'photo'):
+        obj_id = raw_field(raw_field(media, kind), 'id')
+        if isinstance(obj_id, int) and obj_id:
+            return f"{kind}:{obj_id}"
+    return None
+
+def raw_field(obj, name):
+    """
+    Return field name of a raw MTProto struct from `tdl chat export --raw`.
+    The structs use Go field names ("Media", "ID"), so case is ignored.
+    """
+    if not isinstance(obj, dict):
+        return None
+    for key, value in obj.items():
+        if key.lower() == name:
+            return value
+    return None
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _reflink(src, dest):
+    if fcntl is None:
+        return False
+    try:
+        with open(src, 'rb') as s, open(dest, 'wb') as d:
+            fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+        return True
+    except OSError:
+        if os.path.exists(dest):
+            os.remove(dest)
+        return False
+
+def link_file(src, dest):
+    """
+    Make dest share src's data: a hard link, else a reflink, else a copy.
+    Returns 'hardlink', 'reflink' or 'copy'.
+    """
+    tmp = dest + '.tmp'
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    try:
+        os.link(src, tmp)
+        method = 'hardlink'
+    except OSError:
+        if _reflink(src, tmp):
+            method = 'reflink'
+        else:
+            shutil.copy2(src, tmp)
+            method = 'copy'
+    os.replace(tmp, dest)
+    return method
+
+class DedupStore:
+    """
+    Size, hash and document ID of downloaded files, keyed by absolute
+    path, so files in any media directory can be matched.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        # absolute path -> {'size': n, 'sha256': hex or None}
+        self._files = {}
+        # document key -> absolute path
+        self._documents = {}
+        self._by_size = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        for path, entry in data.get('files', {}).items():
+            self._put(path, entry)
+        self._documents = dict(data.get('documents', {}))
+
+    def __len__(self):
+        return len(self._files)
+
+    def _put(self, path, entry):
+        self._files[path] = entry
+        self._by_size.setdefault(entry['size'], set()).add(path)
+
+    def _forget(self, path):
+        entry = self._files.pop(path, None)
+        if entry is not None:
+            self._by_size.get(entry['size'], set()).discard(path)
+            self._dirty = True
+
+    def _existing(self, path):
+        """
+        Return path's entry if the file is still there unchanged, else
+        forget it.
+        """
+        entry = self._files.get(path)
+        try:
+            if entry is not None and os.path.getsize(path) == entry['size']:
+                return entry
+        except OSError:
+            pass
+        self._forget(path)
+        return None
+
+    def _hash(self, path):
+        # hashed without the lock, so one big file does not hold up
+        # every other job recording its downloads
+        with self._lock:
+            entry = self._files.get(path)
+            digest = entry.get('sha256') if entry else None
+        if digest is None:
+            digest = file_hash(path)
+            with self._lock:
+                if self._files.get(path) is entry and entry is not None:
+                    entry['sha256'] = digest
+                    self._dirty = True
+        return digest
+
+    def lookup(self, key):
+        """
+        Return absolute path of the stored file for a document key, or None.
+        """
+        with self._lock:
+            path = self._documents.get(key)
+            if path is None:
+                return None
+            if self._existing(path) is None:
+                del self._documents[key]
+                return None
+            return path
+
+    def link(self, key, dest):
+        """
+        Link the stored file of document key to dest. Returns the number
+        of bytes not downloaded, or 0 when the document is unknown.
+        """
+        src = self.lookup(key)
+        dest = os.path.abspath(dest)
+        if src is None or dest == src:
+            return 0
+        link_file(src, dest)
+        with self._lock:
+            entry = self._files.get(src)
+            if entry is None:
+                return 0
+            self._put(dest, dict(entry))
+            self._dirty = True
+            return entry['size']
+
+    def add(self, path, key=None):
+        """
+        Record a finished download. If a file with the same content is
+        stored already, path is replaced by a link to it. Returns the
+        number of bytes saved that way.
+        """
+        path = os.path.abspath(path)
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return 0
+        with self._lock:
+            candidates = [p for p in self._by_size.get(size, ()) if p != path]
+        digest = None
+        saved = 0
+        for cand in candidates:
+            with self._lock:
+                if self._existing(cand) is None:
+                    continue
+            try:
+                if os.path.samefile(cand, path):
+                    break
+                if digest is None:
+                    digest = file_hash(path)
+                if self._hash(cand) == digest:
+                    link_file(cand, path)
+                    saved = size
+                    break
+            except OSError:
+                continue
+        with self._lock:
+            self._put(path, {'size': size, 'sha256': digest})
+            if key and self._documents.get(key) not in self._files:
+                self._documents[key] = path
+            self._dirty = True
+        return saved
+
+    def save(self):
+        """
+        Write the store through a temp file and atomic rename.
+        """
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {'files': dict(sorted(self._files.items())),
+                    'documents': dict(sorted(self._documents.items()))}
+            self._dirty = False
+        write_json_atomic(self.path, data, separators=(',', ':'))
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+def store_for(tdl_path):
+    """
+    Return the launcher-wide store kept next to tdl in tdl_path, shared
+    by every job and media directory that downloads with that tdl.
+    """
+    path = os.path.normcase(os.path.abspath(os.path.join(tdl_path, INDEX_DIR_NAME, DEDUP_NAME)))
+    with _stores_lock:
+        store = _stores.get(path)
+        if store is None:
+            store = _stores[path] = DedupStore(path)
+        return store
@@ -0,0 +1,1124 @@
+"""
+Native download engine for TDL Easy.
+
+Runs tdl subprocesses directly from Python instead of the PowerShell
+scripts. Nothing in here imports tkinter, so the engine can be driven by
+the launcher, by scripts, or against a fake tdl executable on Linux.
+"""
+import glob
+import json
+import os
+import threading
+import time
+from contextlib import nullcontext
+
+from tdl_dedup import document_key, store_for
+from tdl_export import (ExportReader, export_chat_id, ShardWriter, filter_export, start_export,
+                        DEFAULT_SHARD_BYTES, DEFAULT_SHARD_SIZE)
+from tdl_index import IdIndex, INDEX_DIR_NAME, write_json_atomic
+from tdl_intervals import IntervalSet
+from tdl_jobs import ChainedBudget, ProcessBudget
+from tdl_links import group_links, parse_base_url
+from tdl_proc import default_manager
+from tdl_plan import (ORDER_ID, estimate_seconds, export_spans, media_size, plan_intervals,
+                      previous_rate)
+from tdl_progress import (ProgressTracker, format_duration, format_size,
+                          format_spawn_report)
+from tdl_ratelimit import DelayQueue, IntervalQueue, bucket_for, parse_flood_wait
+from tdl_retry import DeadLetters, backoff_delay, error_reason
+from tdl_scanner import MediaScanner, MESSAGE_FILE_RE
+from tdl_supervisor import Supervisor, DEFAULT_IDLE_TIMEOUT
+
+# ==============================================================================
+# Defaults
+# ==============================================================================
+
+DEFAULT_DOWNLOAD_LIMIT = 2
+DEFAULT_THREADS = 4
+DEFAULT_MAX_RETRIES = 1
+DEFAULT_SHARD_WORKERS = 2
+# message IDs handed to one tdl process by range jobs
+DEFAULT_BATCH_SIZE = 1
+# FLOOD_WAIT parks per message/shard that do not count as retries
+DEFAULT_MAX_FLOOD_WAITS = 5
+# stall kills per message/shard that are re-queued without counting as retries
+DEFAULT_MAX_STALLS = 3
+
+# files at least this big are large: they get a shard of their own and may
+# not occupy the last free worker, which is kept for small files
+DEFAULT_LARGE_FILE = 64 << 20
+
+# exit code reported by run_tdl for a process the supervisor killed
+STALLED = 'stalled'
+
+# chat key of bulk link jobs, which span many chats
+BULK_CHAT = 'links'
+
+# upper bound passed to `tdl chat export -T id -i from,to` for open ranges
+MAX_MESSAGE_ID = 2**31 - 1
+
+# username -> dialog ID of the chats downloaded into a media dir
+CHAT_IDS_NAME = 'chats.json'
+_chat_ids_lock = threading.Lock()
+
+# ==============================================================================
+# Helpers
+# ==============================================================================
+
+def find_tdl_executable(tdl_path):
+    """
+    Return path to the tdl executable inside tdl_path, or None.
+    """
+    for name in ('tdl.exe', 'tdl'):
+        candidate = os.path.join(tdl_path, name)
+        if os.path.isfile(candidate):
+            return candidate
+    return None
+
+def chat_from_base_url(base_url):
+    """
+    Return chat key (numeric ID or username) from a base URL like
+    https://t.me/c/12345678/ or https://t.me/username/.
+    """
+    link = parse_base_url(base_url)
+    return link.chat if link else None
+
+def _read_chat_ids(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+def load_id_file(path):
+    """
+    Load one-ID-per-line file (processed.txt / error_index.txt) into a set.
+    """
+    ids = set()
+    if not os.path.exists(path):
+        return ids
+    with open(path, 'r', encoding='utf-8-sig', errors='ignore') as f:
+        for line in f:
+            line = line.strip()
+            if line.isdigit():
+                ids.add(int(line))
+    return ids
+
+def open_state_index(media_dir, chat, kind, legacy_file=None):
+    """
+    Open the persistent ID index for chat, importing a legacy
+    one-ID-per-line file left by the PowerShell scripts.
+    """
+    index = IdIndex.open(media_dir, chat, kind)
+    if legacy_file and os.path.exists(legacy_file):
+        index.update(load_id_file(legacy_file))
+        index.compact()
+        os.remove(legacy_file)
+    return index
+
+def open_dead_letters(media_dir, chat, legacy_file=None):
+    """
+    Open the dead-letter list for chat, importing a legacy
+    error_index.txt left by the PowerShell scripts.
+    """
+    letters = DeadLetters.open(media_dir, chat)
+    if legacy_file and os.path.exists(legacy_file):
+        letters.update(load_id_file(legacy_file), error='imported from error_index.txt')
+        letters.save()
+        os.remove(legacy_file)
+    return letters
+
+def remove_incomplete_files(media_dir, msg_ids=None, chat=None):
+    """
+    Delete zero-length tdl files left behind by interrupted downloads.
+
+    With msg_ids only files of those messages are touched, and with chat
+    only files named <chat>_<msg_id>_..., so one job never deletes the
+    files that another job in the same media dir is still writing.
+    """
+    removed = []
+    for root, _dirs, files in os.walk(media_dir):
+        for name in files:
+            path = os.path.join(root, name)
+            m = MESSAGE_FILE_RE.search(name)
+            if not m:
+                continue
+            if msg_ids is not None and int(m.group(1)) not in msg_ids:
+                continue
+            if chat is not None and name[:m.start()] != chat:
+                continue
+            try:
+                if os.path.getsize(path) == 0:
+                    os.remove(path)
+                    removed.append(name)
+            except OSError:
+                pass
+    return removed
+
+def build_download_command(tdl_exe, media_dir, urls, download_limit=1, threads=DEFAULT_THREADS):
+    """
+    Build argument list for a single `tdl download` invocation.
+    """
+    cmd = [tdl_exe, 'download', '--desc', '--dir', media_dir]
+    for url in urls:
+        cmd += ['--url', url]
+    cmd += ['-l', str(download_limit), '-t', str(threads)]
+    return cmd
+
+def run_tdl(cmd, cwd=None, on_line=None, supervisor=None, msg_ids=(), handles=None, manager=None):
+    """
+    Run tdl to completion on the process manager, answering 'y' to any
+    prompt. on_line(line) is called for every output line (including
+    progress bar redraws) while tdl runs. With a supervisor the process is
+    killed once it stops making progress on msg_ids, and the exit code is
+    STALLED. handles: optional set holding the ProcessHandle while it
+    runs, so the caller can cancel it. Returns a tdl_proc.ProcessResult
+    whose output is the tail of what tdl printed.
+    """
+    watch = None
+
+    def feed(line):
+        if watch:
+            watch.feed(line)
+        if on_line:
+            on_line(line)
+
+    handle = (manager or default_manager()).start(cmd, cwd=cwd, on_line=feed, stdin_data=b'y\n')
+    if handles is not None:
+        handles.add(handle)
+    try:
+        if supervisor:
+            # watch only once spawned, so waiting for the semaphore is no stall
+            handle.started.wait()
+            if handle.pid is not None:
+                watch = supervisor.watch(handle, msg_ids)
+        result = handle.result()
+    finally:
+        if watch:
+            supervisor.release(watch)
+        if handles is not None:
+            handles.discard(handle)
+    if watch and watch.stalled:
+        result.returncode = STALLED
+    return result
+
+# ==============================================================================
+# Engines
+# ==============================================================================
+
+class BaseEngine:
+    """
+    State shared by the download engines: ID indexes, media scanner,
+    download_log.txt and the stop flag.
+
+    budget: optional tdl_jobs.JobBudget; every tdl process then waits for
+    a slot in the launcher-wide process/thread caps before it starts.
+    controller: optional tdl_adaptive.AimdController; the engine then
+    starts its maximum number of workers, lets the controller gate how
+    many run at once and takes -t from it for every new tdl process.
+    dedup: record every download in the launcher-wide DedupStore and
+    replace files whose content is already stored by links to it.
+    """
+
+    def __init__(self, tdl_path, media_dir, chat, threads=DEFAULT_THREADS,
+                 max_retries=DEFAULT_MAX_RETRIES, tdl_exe=None, log=None, controller=None,
+                 rate_limit=None, stall_timeout=DEFAULT_IDLE_TIMEOUT, dedup=False):
+        self.tdl_path = tdl_path
+        self.media_dir = media_dir
+        self.chat = str(chat)
+        self.threads = max(1, int(threads))
+        self.max_retries = max(1, int(max_retries))
+        self.tdl_exe = tdl_exe or find_tdl_executable(tdl_path)
+        self.log = log or print
+
+        self.log_file = os.path.join(tdl_path, 'download_log.txt')
+        self.processed = open_state_index(media_dir, self.chat, 'processed',
+                                          os.path.join(media_dir, 'processed.txt'))
+        # messages that used up their retries; skipped until re-queued
+        self.errors = open_dead_letters(media_dir, self.chat,
+                                        os.path.join(media_dir, 'error_index.txt'))
+        self.scanner = MediaScanner(media_dir)
+        # tdl names files <dialog id>_<message id>_...; match on the chat's
+        # ID so jobs sharing a media dir don't skip each other. A username
+        # is resolved in _start(); while it is None no file counts as a
+        # reason to skip a message
+        self.scan_chat = self.chat if self.chat.lstrip('-').isdigit() else None
+
+        # shared with every job using the same tdl, whatever its media dir
+        self.dedup = store_for(tdl_path) if dedup else None
+
+        self.stats = {'downloaded': 0, 'failed': 0, 'skipped': 0,
+                      'deduplicated': 0, 'dedup_bytes': 0}
+        self.progress = ProgressTracker(
+            os.path.join(media_dir, INDEX_DIR_NAME, 'metrics', f"{self.chat}.json"))
+        self.budget = None
+        self.controller = controller
+        # shared by every engine working on this chat in the process
+        self.bucket = bucket_for(self.chat, rate_limit) if rate_limit else bucket_for(self.chat)
+        self.max_flood_waits = DEFAULT_MAX_FLOOD_WAITS
+        # kills only our own tdl processes, and only when they stop progressing
+        self.supervisor = Supervisor(media_dir, stall_timeout, log=self.log)
+        self.max_stalls = DEFAULT_MAX_STALLS
+        self.large_file = DEFAULT_LARGE_FILE
+        # off when the progress tracker is shared and its owner reports
+        self.report_spawns = True
+        # off when the owner removes incomplete files once all engines ended
+        self.cleanup = True
+        # message IDs handed to tdl, the only ones whose files _finish removes
+        self._attempted = set()
+        # workers started and how many of them hold a large item
+        self._lanes = 1
+        self._large_active = 0
+        self._lane_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._finished = threading.Event()
+        # tdl processes running right now, for stop(kill=True)
+        self._handles = set()
+        # cleared while paused; workers wait on it before starting tdl
+        self._resumed = threading.Event()
+        self._resumed.set()
+
+    def stop(self, kill=False):
+        """
+        Ask workers to finish their current task and exit. With kill the
+        running tdl processes are terminated instead of waited for.
+        """
+        self._stop.set()
+        self._resumed.set()
+        if kill:
+            for handle in list(self._handles):
+                handle.cancel()
+
+    @property
+    def stopped(self):
+        return self._stop.is_set()
+
+    def pause(self):
+        """
+        Start no new tdl processes until resume(); running ones finish.
+        """
+        if not self._stop.is_set():
+            self._resumed.clear()
+            self.log('[i] Paused, running downloads will finish')
+
+    def resume(self):
+        if not self._resumed.is_set():
+            self._resumed.set()
+            self.log('[i] Resumed')
+
+    @property
+    def paused(self):
+        return not self._resumed.is_set()
+
+    def _may_start(self):
+        """
+        Wait while paused, then for the chat's rate limit. Returns False
+        once the engine is stopped.
+        """
+        self._resumed.wait()
+        return not self._stop.is_set() and self.bucket.acquire(self._stop)
+
+    def _slot(self, threads):
+        if self.budget is None:
+            return nullcontext()
+        return self.budget.slot(threads)
+
+    def _park(self, what, wait):
+        self.bucket.drain()
+        self.log(f"[!] FLOOD_WAIT {wait}s on {what}, parked until it passes")
+
+    def _current_threads(self):
+        return self.controller.threads if self.controller else self.threads
+
+    def _worker_count(self, fixed):
+        return self.controller.max_workers if self.controller else fixed
+
+    def _worker_slot(self):
+        if self.controller is None:
+            return nullcontext()
+        return self.controller.slot()
+
+    def _tune(self):
+        self.controller.update(self.progress.snapshot(), time.time())
+        while not self._finished.wait(self.controller.interval):
+            reason = self.controller.update(self.progress.snapshot(), time.time())
+            if reason:
+                self.log(f"[i] Concurrency: {self.controller.workers} workers x "
+                         f"{self.controller.threads} threads ({reason})")
+
+    def _claim(self, large):
+        """
+        Admit a large item unless large ones already occupy every worker
+        but one. Called from DelayQueue.get(accept=...).
+        """
+        if not large:
+            return True
+        with self._lane_lock:
+            workers = self.controller.workers if self.controller else self._lanes
+            if self._large_active >= max(1, workers - 1):
+                return False
+            self._large_active += 1
+            return True
+
+    def _release(self, large):
+        if large:
+            with self._lane_lock:
+                self._large_active -= 1
+
+    def _write_log(self, text):
+        with self._lock:
+            try:
+                with open(self.log_file, 'a', encoding='utf-8') as f:
+                    f.write(text.rstrip('\n') + '\n')
+            except OSError:
+                pass
+
+    def _run_logged(self, cmd, title, msg_ids=()):
+        stamp = time.strftime('%Y-%m-%d %H:%M:%S')
+        self._write_log(f"[{stamp}] {title}\n{' '.join(cmd)}")
+        with self._lock:
+            self._attempted.update(msg_ids)
+        started = []
+
+        def on_line(line):
+            # time to the first transfer line is tdl's per-process startup cost
+            if not started[1:] and MESSAGE_FILE_RE.search(line):
+                started.append(time.monotonic() - started[0])
+            self.progress.feed(line)
+
+        try:
+            with self._slot(self._current_threads()):
+                started.append(time.monotonic())
+                result = run_tdl(cmd, cwd=self.tdl_path, on_line=on_line,
+                                 supervisor=self.supervisor, msg_ids=msg_ids, handles=self._handles)
+        except OSError as e:
+            self._write_log(str(e))
+            self.log(f"[x] Error executing command: {e}")
+            return None, ''
+        code, output = result.returncode, result.output
+        self.progress.spawned(len(msg_ids), started[1] if started[1:] else None)
+        self._write_log(output)
+        self._write_log(f"[exit {code}] {result.wall:.1f}s, {result.lines} output lines"
+                        + (', cancelled' if result.cancelled else ''))
+        if code == STALLED:
+            self._write_log(f"[stalled] no progress for {self.supervisor.idle_timeout}s, killed")
+        return code, output
+
+    def _mark_done(self, msg_id, key=None):
+        with self._lock:
+            self.processed.add(msg_id)
+            self.stats['downloaded'] += 1
+        size = self._file_size(msg_id)
+        if self.dedup is not None:
+            path = self.scanner.path_for(msg_id, self.scan_chat)
+            if path:
+                self._note_dedup(self.dedup.add(path, key))
+        self.progress.message_done(msg_id, size)
+
+    def _link_document(self, msg_id, key, chat_id):
+        """
+        Link the stored file of document key under msg_id's own file name
+        instead of downloading it again. Returns True if it was linked.
+        """
+        src = self.dedup.lookup(key) if key else None
+        if src is None or chat_id is None:
+            return False
+        name = os.path.basename(src)
+        m = MESSAGE_FILE_RE.search(name)
+        if not m:
+            return False
+        dest = os.path.join(self.media_dir, f"{chat_id}_{msg_id}_{name[m.end():]}")
+        try:
+            self._note_dedup(self.dedup.link(key, dest))
+        except OSError as e:
+            self.log(f"[!] Could not link {name} for index {msg_id}: {e}")
+            return False
+        self.scanner.note_created(dest)
+        with self._lock:
+            self.processed.add(msg_id)
+        self._mark_skipped()
+        self.log(f"[=] Index {msg_id} is the same document as {name}, linked")
+        return True
+
+    def _note_dedup(self, saved):
+        if saved:
+            with self._lock:
+                self.stats['deduplicated'] += 1
+                self.stats['dedup_bytes'] += saved
+
+    def _mark_failed(self, msg_id, attempts=1, error=''):
+        with self._lock:
+            self.errors.add(msg_id, attempts, error)
+            self.stats['failed'] += 1
+        self.progress.message_failed(msg_id)
+
+    def _mark_skipped(self, count=1):
+        self.stats['skipped'] += count
+        self.progress.message_skipped(count)
+
+    def _file_size(self, msg_id):
+        path = self.scanner.path_for(msg_id, self.scan_chat)
+        try:
+            return os.path.getsize(path) if path else 0
+        except OSError:
+            return 0
+
+    def _has_file(self, msg_id):
+        return self.scanner.has(msg_id, self.scan_chat)
+
+    def _rescan(self, msg_ids, since):
+        """
+        Refresh the scanner once for the files a tdl process that ended at
+        since (time.monotonic()) wrote, unless a watcher follows the media
+        directory or every one of msg_ids has a file already.
+        """
+        if self.scanner.watching or all(self._has_file(msg_id) for msg_id in msg_ids):
+            return
+        self.scanner.refresh(since=since)
+
+    def _is_known(self, msg_id):
+        return (msg_id in self.processed or msg_id in self.errors
+                or (self.scan_chat is not None and self._has_file(msg_id)))
+
+    def _known_ids(self, wanted):
+        """
+        Return the IDs of IntervalSet wanted that _is_known() would skip,
+        as an IntervalSet built from the intervals of the processed index
+        within wanted's bounds, not by testing every ID.
+        """
+        bounds = wanted.bounds()
+        if bounds is None:
+            return IntervalSet()
+        low, high = bounds
+        others = [msg_id for msg_id in self.errors if low <= msg_id <= high]
+        if self.scan_chat is not None:
+            others += [msg_id for msg_id in self.scanner.ids(self.scan_chat) if low <= msg_id <= high]
+        return IntervalSet.from_sorted(self.processed.intervals(low, high)) | IntervalSet.from_ids(others)
+
+    def _resolve_scan_chat(self):
+        """
+        Return the dialog ID tdl puts in this username chat's file names,
+        from .tdl-index/chats.json or a one-message export; None if tdl
+        cannot resolve it.
+        """
+        path = os.path.join(self.media_dir, INDEX_DIR_NAME, CHAT_IDS_NAME)
+        key = self.chat.lower()
+        with _chat_ids_lock:
+            known = _read_chat_ids(path)
+        if key in known:
+            return str(known[key])
+        with self._slot(1):
+            chat_id = export_chat_id(self.tdl_exe, self.chat,
+                                     os.path.join(self.media_dir, INDEX_DIR_NAME,
+                                                  f"{self.chat}.resolve.json"),
+                                     cwd=self.tdl_path, log_file=self.log_file)
+        if chat_id is None:
+            return None
+        with _chat_ids_lock:
+            known = _read_chat_ids(path)
+            known[key] = chat_id
+            write_json_atomic(path, known, indent=2)
+        return str(chat_id)
+
+    def _start(self):
+        if not self.tdl_exe:
+            raise FileNotFoundError(f"tdl executable not found in {self.tdl_path}")
+        if self.scan_chat is None:
+            self.scan_chat = self._resolve_scan_chat()
+            if self.scan_chat is None:
+                self.log(f"[!] Could not resolve chat {self.chat} to its ID; files already in "
+                         f"the media folder are not used to skip its messages")
+        self.scanner.load()
+        self.scanner.refresh()
+        self.scanner.start_watching()
+        if self.controller:
+            self.log(f"[i] Auto concurrency: starting with {self.controller.workers} workers x "
+                     f"{self.controller.threads} threads")
+            threading.Thread(target=self._tune, daemon=True).start()
+
+    def _run_workers(self, target, count):
+        self._lanes = count
+        workers = [threading.Thread(target=target, daemon=True) for _ in range(count)]
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+
+    def remove_incomplete(self):
+        """
+        Delete the empty files this engine's tdl processes left behind.
+        """
+        for name in remove_incomplete_files(self.media_dir, self._attempted, self.scan_chat):
+            self.log(f"[x] Removed incomplete file {name}")
+
+    def _finish(self):
+        self._finished.set()
+        self.supervisor.close()
+        self.scanner.stop_watching()
+        self.scanner.refresh()
+        self.scanner.save()
+
+        if self.cleanup:
+            self.remove_incomplete()
+
+        # processed IDs and dead letters both carry over to the next run
+        self.processed.compact()
+        self.processed.close()
+        self.errors.save()
+        if self.dedup is not None:
+            self.dedup.save()
+        if self.stats['deduplicated']:
+            self.log(f"[i] {self.stats['deduplicated']} messages share an existing file, "
+                     f"{self.stats['dedup_bytes'] / 2**20:.1f} MiB saved")
+        if len(self.errors):
+            self.log(f"[i] {len(self.errors)} messages in the dead-letter list "
+                     f"(re-queue them to try again)")
+        snap = self.progress.snapshot()
+        if snap['spawns'] and self.report_spawns:
+            self.log(f"[i] {format_spawn_report(snap)}")
+        self.progress.write_metrics({'finished': True, 'stopped': self._stop.is_set()})
+        self.log(f"[done] Completed! {self.stats['downloaded']} downloaded, "
+                 f"{self.stats['failed']} failed, {self.stats['skipped']} skipped.")
+        return self.stats
+
+class RangeEngine(BaseEngine):
+    """
+    Download message IDs start_id..end_id with a pool of tdl processes.
+
+    IDs are fed from a work queue to download_limit workers; each worker
+    runs a tdl process for up to batch_size ready IDs, so a slow message
+    only occupies one slot while the others keep pulling new IDs, and
+    larger batches pay tdl's session load and connect once for many IDs.
+    A message that hits FLOOD_WAIT is parked for the reported wait instead
+    of being retried right away.
+
+    With plan set the range is exported first and only media messages are
+    queued, in `order` (tdl_plan.ORDER_*); IDs without media are counted
+    in stats['empty'] instead of failing one by one. dedup implies plan:
+    the export names each message's document, and documents already in
+    the launcher-wide DedupStore are linked before anything is
+    queued.
+
+    The work is an IntervalSet: start_id..end_id plus any extra
+    (start, end) pairs in ranges, or only the message IDs in ids. IDs
+    already processed, dead-lettered or on disk are subtracted as
+    intervals and the rest is handed out in ID order by an IntervalQueue,
+    so a 10M-ID range is planned without listing it.
+    """
+
+    def __init__(self, tdl_path, media_dir, base_url, start_id, end_id,
+                 download_limit=DEFAULT_DOWNLOAD_LIMIT, threads=DEFAULT_THREADS,
+                 max_retries=DEFAULT_MAX_RETRIES, tdl_exe=None, chat=None, log=None,
+                 controller=None, rate_limit=None, stall_timeout=DEFAULT_IDLE_TIMEOUT,
+                 dedup=False, plan=False, order=ORDER_ID, batch_size=DEFAULT_BATCH_SIZE, ids=None,
+                 ranges=None):
+        super().__init__(tdl_path, media_dir, chat or chat_from_base_url(base_url) or 'chat',
+                         threads=threads, max_retries=max_retries, tdl_exe=tdl_exe, log=log,
+                         controller=controller, rate_limit=rate_limit,
+                         stall_timeout=stall_timeout, dedup=dedup)
+        self.base_url = base_url
+        self.start_id = int(start_id)
+        self.end_id = int(end_id)
+        self.download_limit = max(1, int(download_limit))
+        self.batch_size = max(1, int(batch_size))
+        self.plan = plan or dedup
+        self.order = order
+        if ids is not None:
+            self.wanted = IntervalSet.from_ids(set(ids))
+        else:
+            self.wanted = IntervalSet([(self.start_id, self.end_id)] + list(ranges or ()))
+        if self.wanted:
+            self.start_id, self.end_id = self.wanted.bounds()
+        self.manifest = None
+        # msg_id -> size from the manifest, used to keep one worker for small files
+        self._sizes = {}
+        self.stats['empty'] = 0
+        self._queue = DelayQueue()
+        # msg_id -> dict(attempts, flood_waits, stalls)
+        self._counts = {}
+
+    def _download(self, batch):
+        """
+        Run one tdl process for the IDs in batch; returns (exit code, output).
+        """
+        if not self._may_start():
+            return None, ''
+        urls = [f"{self.base_url}{msg_id}" for msg_id in batch]
+        cmd = build_download_command(self.tdl_exe, self.media_dir, urls, 1, self._current_threads())
+        if len(batch) == 1:
+            title = f"Processing index: {batch[0]}"
+        else:
+            title = f"Processing indexes: {','.join(map(str, batch))}"
+        return self._run_logged(cmd, title, batch)
+
+    def _is_large(self, msg_id):
+        return self._sizes.get(msg_id, 0) >= self.large_file
+
+    def _accept(self, msg_id):
+        return self._claim(self._is_large(msg_id))
+
+    def _worker(self):
+        accept = self._accept if self._sizes else None
+        while True:
+            msg_id = self._queue.get(self._stop, accept)
+            if msg_id is None:
+                return
+            # the rest of the batch rides on the same tdl process
+            batch = [msg_id] + self._queue.get_ready(self.batch_size - 1, accept)
+            try:
+                self._process(batch)
+            finally:
+                for msg_id in batch:
+                    self._release(self._is_large(msg_id))
+
+    def _process(self, batch):
+        with self._worker_slot():
+            code, output = self._download(batch)
+        self._rescan(batch, time.monotonic())
+        failed = []
+        keys = self.manifest.keys if self.manifest is not None else {}
+        for msg_id in batch:
+            if self._has_file(msg_id):
+                self.log(f"[ok] Downloaded index {msg_id}")
+                self._mark_done(msg_id, keys.get(msg_id))
+            else:
+                failed.append(msg_id)
+        if not failed or self._stop.is_set():
+            return
+        wait = parse_flood_wait(output)
+        parked = []
+        for msg_id in failed:
+            with self._lock:
+                counts = self._counts.setdefault(msg_id, {'attempts': 0, 'flood_waits': 0, 'stalls': 0})
+                if code == STALLED and counts['stalls'] < self.max_stalls:
+                    counts['stalls'] += 1
+                    reason = 'stall'
+                elif wait and counts['flood_waits'] < self.max_flood_waits:
+                    counts['flood_waits'] += 1
+                    reason = 'flood'
+                else:
+                    counts['attempts'] += 1
+                    reason = None
+            if reason == 'stall':
+                # killed by the supervisor: try again right away
+                self._queue.put(msg_id)
+            elif reason == 'flood':
+                # only these IDs wait; the other workers keep going
+                parked.append(msg_id)
+                self._queue.put(msg_id, wait)
+            elif counts['attempts'] < self.max_retries:
+                # retried on its own after a backoff, not in another full pass
+                self._queue.put(msg_id, backoff_delay(counts['attempts']))
+            else:
+                self.log(f"[x] Failed to download index {msg_id} (may be deleted or empty)")
+                self._mark_failed(msg_id, counts['attempts'], error_reason(output, msg_id))
+        if parked:
+            self._park(f"index {parked[0]}" if len(parked) == 1 else f"{len(parked)} indexes", wait)
+
+    def _plan(self):
+        """
+        Export the wanted intervals and build their manifest; None if an
+        export failed. The gaps between a job's ranges are not exported.
+        """
+        plan_dir = os.path.join(self.media_dir, INDEX_DIR_NAME, 'plans')
+        intervals = self.wanted.intervals()
+        spans = export_spans(intervals)
+        self.log(f"[i] Planning indexes {self.start_id}-{self.end_id} of chat {self.chat}"
+                 f"{f' in {len(spans)} exports' if len(spans) > 1 else ''}...")
+        with self._slot(1):
+            manifest = plan_intervals(self.tdl_exe, self.chat, intervals,
+                                      os.path.join(plan_dir, f"{self.chat}.export.json"),
+                                      cwd=self.tdl_path, log_file=self.log_file)
+        if manifest is None:
+            self.log('[!] Planning export failed, queueing every index in the range')
+            return None
+        manifest.save(os.path.join(plan_dir, f"{self.chat}.json"))
+        return manifest
+
+    def run(self):
+        """
+        Run the whole range and return the stats dict.
+        """
+        self._start()
+        self.manifest = self._plan() if self.plan else None
+        wanted = self.wanted
+        pending = wanted - self._known_ids(wanted)
+        if self.manifest is None:
+            self._mark_skipped(len(wanted) - len(pending))
+            self._queue = IntervalQueue(pending.intervals())
+            self.progress.add_total(len(pending))
+        else:
+            candidates = [msg_id for msg_id in self.manifest.ordered(self.order) if msg_id in wanted]
+            self._sizes = {msg_id: size for msg_id, size in self.manifest.entries if size}
+            self.stats['empty'] = len(wanted) - len(candidates)
+            queued = [msg_id for msg_id in candidates if msg_id in pending]
+            self._mark_skipped(len(candidates) - len(queued))
+            if self.dedup is not None:
+                # documents already on disk are linked, not downloaded
+                chat_id = self.manifest.chat_id or self.scan_chat
+                keys = self.manifest.keys
+                queued = [msg_id for msg_id in queued
+                          if not self._link_document(msg_id, keys.get(msg_id), chat_id)]
+            for msg_id in queued:
+                self._queue.put(msg_id)
+            total_bytes = self.manifest.size_of(queued)
+            self.progress.add_total(len(queued), total_bytes)
+            eta = estimate_seconds(total_bytes, len(queued), previous_rate(self.progress.metrics_path))
+            self.log(f"[i] Plan: {len(queued)} media messages, {format_size(total_bytes)}"
+                     f"{f', ETA ~{format_duration(eta)} at the last run speed' if eta else ''}; "
+                     f"{self.stats['empty']} indexes without media left out")
+        self._queue.close()
+        self.log(f"[i] Queued {len(self._queue)} indexes, skipped {self.stats['skipped']}")
+
+        self._run_workers(self._worker, self._worker_count(self.download_limit))
+        return self._finish()
+
+class FullChatEngine(BaseEngine):
+    """
+    Download a whole chat as message-ID shards on several tdl processes.
+
+    The chat export is streamed while tdl writes it; messages that are not
+    processed, errored or on disk yet are cut into shard files, and each
+    finished shard is picked up by one of `workers` tdl processes. Every
+    shard has its own retry budget: only its missing messages are retried,
+    so a failing shard never restarts the whole chat. On FLOOD_WAIT the
+    rest of the shard is parked for the reported wait without using up a
+    retry, while the other workers keep downloading.
+
+    With since_id set only messages newer than that high-water mark are
+    exported, plus any re-queued dead letters below it. After run(),
+    stats['high_water'] is the newest exported message ID for the next
+    incremental run.
+
+    With dedup the export includes raw messages, and a message whose
+    document or photo is already stored in the media directory is linked
+    from the existing file instead of being downloaded.
+
+    With pack the shards are cut by byte cost as well (shard_bytes), each
+    large file gets a shard of its own, and free workers pick the heaviest
+    waiting shard first (longest processing time first), while one worker
+    always stays free for small files.
+    """
+
+    def __init__(self, tdl_path, media_dir, chat, workers=DEFAULT_SHARD_WORKERS,
+                 download_limit=DEFAULT_DOWNLOAD_LIMIT, threads=DEFAULT_THREADS,
+                 max_retries=DEFAULT_MAX_RETRIES, shard_size=DEFAULT_SHARD_SIZE,
+                 since_id=None, tdl_exe=None, log=None, controller=None, rate_limit=None,
+                 stall_timeout=DEFAULT_IDLE_TIMEOUT, dedup=False, pack=False,
+                 shard_bytes=DEFAULT_SHARD_BYTES):
+        super().__init__(tdl_path, media_dir, chat, threads=threads,
+                         max_retries=max_retries, tdl_exe=tdl_exe, log=log,
+                         controller=controller, rate_limit=rate_limit,
+                         stall_timeout=stall_timeout, dedup=dedup)
+        self.workers = max(1, int(workers))
+        self.download_limit = max(1, int(download_limit))
+        self.shard_size = max(1, int(shard_size))
+        self.since_id = int(since_id) if since_id else None
+        self.pack = pack
+        self.shard_bytes = shard_bytes
+        self._max_seen = None
+        self.shard_dir = os.path.join(media_dir, INDEX_DIR_NAME, 'shards', self.chat)
+        # per chat, so full-chat jobs sharing a media dir don't overwrite each other
+        self.export_file = os.path.join(self.shard_dir, 'tdl-export.json')
+        # per-shard progress: path -> dict(count, downloaded, failed, attempts, flood_waits, stalls)
+        self.shards = {}
+        # msg_id -> document key of queued messages (dedup only)
+        self._keys = {}
+        self._queue = DelayQueue(priority=lambda shard: shard['bytes']) if pack else DelayQueue()
+
+    def _shard_command(self, path):
+        return [self.tdl_exe, 'download', '--file', path, '--dir', self.media_dir,
+                '-l', str(self.download_limit), '-t', str(self._current_threads()), '--skip-same']
+
+    def _run_shard(self, shard):
+        """
+        Run one attempt of a shard. Messages still missing afterwards are
+        re-queued (stall kill, FLOOD_WAIT or backoff before the next retry)
+        or, once the retries are used up, go to the dead-letter list.
+        """
+        path = shard['path']
+        name = os.path.basename(path)
+        progress = self.shards[path]
+        ids = [msg['id'] for msg in ExportReader(path)]
+        if not self._may_start():
+            return
+        progress['attempts'] += 1
+        code, output = self._run_logged(self._shard_command(path),
+                                        f"Shard {name} attempt {progress['attempts']}", ids)
+        self._rescan(ids, time.monotonic())
+        missing = []
+        for msg_id in ids:
+            if self._has_file(msg_id):
+                self._mark_done(msg_id, self._keys.pop(msg_id, None))
+                progress['downloaded'] += 1
+            else:
+                missing.append(msg_id)
+        if self._stop.is_set():
+            return
+        if missing:
+            if code == STALLED and progress['stalls'] < self.max_stalls:
+                # killed by the supervisor: hand the rest to the next free worker
+                progress['attempts'] -= 1
+                progress['stalls'] += 1
+                filter_export(path, path, set(missing))
+                self._queue.put(shard)
+                return
+            wait = parse_flood_wait(output)
+            if wait and progress['flood_waits'] < self.max_flood_waits:
+                # park the rest of this shard; other shards keep downloading
+                progress['attempts'] -= 1
+                progress['flood_waits'] += 1
+                filter_export(path, path, set(missing))
+                self._park(f"{len(missing)} messages of {name}", wait)
+                self._queue.put(shard, wait)
+                return
+            if progress['attempts'] < self.max_retries:
+                # retry only what is still missing from this shard
+                filter_export(path, path, set(missing))
+                self._queue.put(shard, backoff_delay(progress['attempts']))
+                return
+        for msg_id in missing:
+            self._mark_failed(msg_id, progress['attempts'], error_reason(output, msg_id))
+            progress['failed'] += 1
+        self.log(f"[{'ok' if not missing else 'x'}] Shard {name}: "
+                 f"{progress['downloaded']} downloaded, {progress['failed']} failed")
+        os.remove(path)
+
+    def _high_water(self):
+        if self._stop.is_set() or self._max_seen is None:
+            return self.since_id
+        return max(self._max_seen, self.since_id or 0)
+
+    def _is_large(self, shard):
+        return shard.get('large', False)
+
+    def _accept(self, shard):
+        return self._claim(self._is_large(shard))
+
+    def _worker(self):
+        accept = self._accept if self.pack else None
+        while True:
+            shard = self._queue.get(self._stop, accept)
+            if shard is None:
+                return
+            large = self.pack and self._is_large(shard)
+            try:
+                with self._worker_slot():
+                    self._run_shard(shard)
+            finally:
+                self._release(large)
+
+    def _on_shard(self, shard):
+        self.shards[shard['path']] = {'count': shard['count'], 'downloaded': 0,
+                                      'failed': 0, 'attempts': 0, 'flood_waits': 0, 'stalls': 0}
+        self.progress.add_total(shard['count'], shard['bytes'])
+        self._queue.put(shard)
+
+    def _on_large_shard(self, shard):
+        shard['large'] = True
+        self._on_shard(shard)
+
+    def _link_duplicate(self, msg, chat_id):
+        """
+        Link the stored file of msg's document under msg's own file name
+        instead of downloading it again. Returns True if it was linked.
+        """
+        key = self._keys[msg['id']] = document_key(msg)
+        if not self._link_document(msg['id'], key, chat_id):
+            return False
+        with self._lock:
+            del self._keys[msg['id']]
+        return True
+
+    def _export_and_shard(self, requeued):
+        extra_args = ()
+        if self.since_id:
+            # re-queued dead letters below the high-water mark are exported
+            # again; everything already done in between is skipped as known
+            after = min([self.since_id] + [msg_id - 1 for msg_id in requeued])
+            extra_args = ('-T', 'id', '-i', f"{after + 1},{MAX_MESSAGE_ID}")
+            self.log(f"[i] Incremental sync of chat {self.chat} after message {after}")
+        if self.dedup is not None or self.pack:
+            # raw messages carry the document/photo IDs and sizes
+            extra_args += ('--raw',)
+        with self._slot(1):
+            proc = start_export(self.tdl_exe, self.chat, self.export_file, cwd=self.tdl_path,
+                                log_file=self.log_file, extra_args=extra_args)
+            reader = ExportReader(self.export_file, follow=lambda: proc.poll() is None)
+            writer = ShardWriter(self.shard_dir, None, self.shard_size, on_shard=self._on_shard,
+                                 max_bytes=self.shard_bytes if self.pack else None)
+            # one large file per shard, so it never holds up small ones
+            large_writer = ShardWriter(self.shard_dir, None, 1, prefix='tdl-large',
+                                       on_shard=self._on_large_shard)
+            try:
+                for msg in reader:
+                    msg_id = msg.get('id')
+                    if not isinstance(msg_id, int):
+                        continue
+                    if self._max_seen is None or msg_id > self._max_seen:
+                        self._max_seen = msg_id
+                    if self._is_known(msg_id):
+                        self._mark_skipped()
+                        continue
+                    if self.dedup is not None:
+                        if self._link_duplicate(msg, reader.chat_id or self.chat):
+                            continue
+                    size = (media_size(msg) or 0) if self.pack else 0
+                    msg.pop('raw', None)
+                    target = large_writer if size >= self.large_file else writer
+                    target.chat_id = reader.chat_id
+                    target.write(msg, size)
+                    if self._stop.is_set():
+                        proc.terminate()
+                        break
+            finally:
+                writer.close()
+                large_writer.close()
+                code = proc.wait()
+        if code != 0 and not self._stop.is_set():
+            raise RuntimeError(f"tdl chat export failed for chat {self.chat} (exit code {code})")
+        self.log(f"[+] Exported chat {self.chat}: {len(self.shards)} shards, "
+                 f"{self.stats['skipped']} messages skipped")
+
+    def run(self):
+        """
+        Export, shard and download the whole chat; returns the stats dict.
+        """
+        self._start()
+        for stale in glob.glob(os.path.join(self.shard_dir, '*.json')):
+            os.remove(stale)
+        os.makedirs(self.shard_dir, exist_ok=True)
+        self._lanes = self._worker_count(self.workers)
+        workers = [threading.Thread(target=self._worker, daemon=True)
+                   for _ in range(self._lanes)]
+        for w in workers:
+            w.start()
+        requeued = self.errors.requeued()
+        try:
+            self._export_and_shard(requeued)
+        finally:
+            self._queue.close()
+            for w in workers:
+                w.join()
+        if os.path.exists(self.export_file):
+            os.remove(self.export_file)
+        if not self._stop.is_set():
+            self.errors.clear_requeued(requeued)
+        self.stats['high_water'] = self._high_water()
+        return self._finish()
+
+class BulkEngine:
+    """
+    Download a list of message links from many chats as one job.
+
+    links are tdl_links.TelegramLink message links, e.g. from
+    tdl_links.parse_links(). They are grouped into one RangeEngine per
+    chat that queues only that chat's IDs, so processed indexes, dead
+    letters and rate limits stay per chat. Up to download_limit chats run
+    at once, and all of them draw from one pool of download_limit tdl
+    processes that goes to the chat with the fewest running processes
+    first. The chat engines share one ProgressTracker, so the job reports
+    as a whole.
+    """
+
+    def __init__(self, tdl_path, media_dir, links, download_limit=DEFAULT_DOWNLOAD_LIMIT,
+                 threads=DEFAULT_THREADS, max_retries=DEFAULT_MAX_RETRIES, tdl_exe=None, log=None,
+                 rate_limit=None, stall_timeout=DEFAULT_IDLE_TIMEOUT, dedup=False,
+                 batch_size=DEFAULT_BATCH_SIZE):
+        self.chat = BULK_CHAT
+        self.media_dir = media_dir
+        self.download_limit = max(1, int(download_limit))
+        self.log = log or print
+        self.progress = ProgressTracker(
+            os.path.join(media_dir, INDEX_DIR_NAME, 'metrics', f"{BULK_CHAT}.json"))
+        self.budget = None
+        self.pool = ProcessBudget(self.download_limit, self.download_limit * max(1, int(threads)))
+        self.stats = {'downloaded': 0, 'failed': 0, 'skipped': 0,
+                      'deduplicated': 0, 'dedup_bytes': 0, 'chats': 0}
+        self.engines = []
+        groups = group_links(links)
+        # biggest chats first, so a long one does not start last
+        for base, ids in sorted(groups.items(), key=lambda g: -len(g[1])):
+            chat = chat_from_base_url(base) or 'chat'
+            engine = RangeEngine(tdl_path, media_dir, base, ids[0], ids[-1], ids=ids,
+                                 download_limit=self.download_limit, threads=threads,
+                                 max_retries=max_retries, tdl_exe=tdl_exe,
+                                 log=lambda text, chat=chat: self.log(f"{chat}: {text}"),
+                                 rate_limit=rate_limit, stall_timeout=stall_timeout,
+                                 dedup=dedup, batch_size=batch_size)
+            engine.progress = self.progress
+            engine.report_spawns = False
+            # the chats share media_dir: clean up once every chat is done
+            engine.cleanup = False
+            self.engines.append(engine)
+        self._pending = list(self.engines)
+        self._lock = threading.Lock()
+        self._error = None
+
+    def stop(self, kill=False):
+        for engine in self.engines:
+            engine.stop(kill=kill)
+
+    @property
+    def stopped(self):
+        return any(engine.stopped for engine in self.engines)
+
+    def pause(self):
+        for engine in self.engines:
+            engine.pause()
+
+    def resume(self):
+        for engine in self.engines:
+            engine.resume()
+
+    @property
+    def paused(self):
+        return any(engine.paused for engine in self.engines)
+
+    def _runner(self):
+        while True:
+            with self._lock:
+                if not self._pending or self._error is not None:
+                    return
+                engine = self._pending.pop(0)
+            if engine.stopped:
+                continue
+            engine.budget = ChainedBudget(self.pool.for_job(engine.chat), self.budget)
+            try:
+                stats = engine.run()
+            except Exception as e:
+                with self._lock:
+                    if self._error is None:
+                        self._error = e
+                self.stop()
+                return
+            with self._lock:
+                self.stats['chats'] += 1
+                for key in ('downloaded', 'failed', 'skipped', 'deduplicated', 'dedup_bytes'):
+                    self.stats[key] += stats.get(key, 0)
+
+    def run(self):
+        """
+        Run every chat's links and return the summed stats dict.
+        """
+        count = sum(len(engine.wanted) for engine in self.engines)
+        self.log(f"[i] {count} links in {len(self.engines)} chats")
+        runners = [threading.Thread(target=self._runner, daemon=True)
+                   for _ in range(min(self.download_limit, len(self.engines)))]
+        for runner in runners:
+            runner.start()
+        for runner in runners:
+            runner.join()
+        for engine in self.engines:
+            engine.remove_incomplete()
+        if self._error is not None:
+            raise self._error
+        snap = self.progress.snapshot()
+        if snap['spawns']:
+            self.log(f"[i] {format_spawn_report(snap)}")
+        self.progress.write_metrics({'finished': True, 'stopped': self.stopped})
+        self.log(f"[done] Links: {self.stats['downloaded']} downloaded, {self.stats['failed']} failed, "
+                 f"{self.stats['skipped']} skipped in {self.stats['chats']} chats.")
+        return self.stats
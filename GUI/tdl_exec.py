@@ -0,0 +1,96 @@
+"""
+Execution backends for TDL Easy launcher actions.
+
+The launcher used to run every action as `cmd /c start PowerShell.exe`,
+which only works on Windows and pays for a new console window plus
+PowerShell startup on every click. Downloads now run in-process on the
+native engines, and the remaining actions go through an executor:
+
+    direct    run a program such as tdl straight through subprocess, no
+              shell in between (the default for tdl commands)
+    console   open a Windows console window, the old behaviour; used for
+              .ps1 scripts and for interactive commands (login) when the
+              launcher has no terminal of its own
+
+The .ps1 scripts (the updater) fetch Windows builds of tdl, so they are
+only run on Windows.
+
+Nothing in here imports tkinter.
+"""
+import os
+import shutil
+import subprocess
+import sys
+
+def has_terminal():
+    """
+    True when the launcher was started from a terminal a child can use.
+    """
+    try:
+        return sys.stdin is not None and sys.stdin.isatty()
+    except (AttributeError, ValueError):
+        return False
+
+def interactive_supported():
+    """
+    True when an interactive command can get a terminal: a console window
+    on Windows, else the launcher's own terminal or x-terminal-emulator.
+    """
+    return sys.platform == 'win32' or has_terminal() or shutil.which('x-terminal-emulator') is not None
+
+class DirectExecutor:
+    """
+    Run a program directly through subprocess, without a shell or a
+    console window; its output is discarded. Interactive commands
+    inherit the launcher's terminal, or open one with
+    x-terminal-emulator when the launcher has none.
+    """
+
+    def __init__(self, interactive=False):
+        self.interactive = interactive
+
+    def run(self, argv, cwd=None):
+        if self.interactive:
+            terminal = None if has_terminal() else shutil.which('x-terminal-emulator')
+            return subprocess.Popen([terminal, '-e'] + list(argv) if terminal else argv, cwd=cwd)
+        creationflags = getattr(subprocess, 'CREATE_NO_WINDOW', 0)
+        return subprocess.Popen(argv, cwd=cwd, stdin=subprocess.DEVNULL,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT,
+                                creationflags=creationflags)
+
+class WindowsConsoleExecutor:
+    """
+    Open a new Windows console window (`cmd /c start`) for a program or a
+    .ps1 script; with keep_open the window stays after it finishes.
+    """
+
+    def __init__(self, keep_open=False):
+        self.keep_open = keep_open
+
+    def run(self, argv, cwd=None):
+        inner = ['cmd', '/k'] + list(argv) if self.keep_open else list(argv)
+        return subprocess.Popen(['cmd', '/c', 'start', ''] + inner, cwd=cwd)
+
+    def run_script(self, script_path):
+        cmd = ['PowerShell.exe'] + (['-NoExit'] if self.keep_open else [])
+        cmd += ['-ExecutionPolicy', 'Bypass', '-File', script_path]
+        return subprocess.Popen(['cmd', '/c', 'start', ''] + cmd,
+                                cwd=os.path.dirname(script_path))
+
+def command_executor(interactive=False, keep_open=False):
+    """
+    Executor for a program such as tdl: direct, except for interactive
+    commands on Windows when there is no terminal to inherit.
+    """
+    if interactive and sys.platform == 'win32' and not has_terminal():
+        return WindowsConsoleExecutor(keep_open=keep_open)
+    return DirectExecutor(interactive=interactive)
+
+def script_executor(keep_open=False):
+    """
+    Executor for a .ps1 script: a console window on Windows, None on
+    other systems.
+    """
+    if sys.platform == 'win32':
+        return WindowsConsoleExecutor(keep_open=keep_open)
+    return None
@@ -0,0 +1,310 @@
+"""
+Streaming reader and shard writer for tdl chat export JSON.
+
+`tdl chat export` writes {"id": <chat>, "messages": [{...}, ...]}. The
+reader walks that document with a bounded buffer and yields one message
+at a time, optionally following a file that tdl is still writing, so
+memory stays flat no matter how large the chat is.
+"""
+import json
+import os
+import subprocess
+import time
+
+from tdl_index import atomic_open
+
+DEFAULT_CHUNK_SIZE = 1 << 16
+DEFAULT_SHARD_SIZE = 1000
+# byte budget of a shard when message sizes are known
+DEFAULT_SHARD_BYTES = 256 << 20
+
+_WHITESPACE = ' \t\r\n'
+
+class ExportFormatError(ValueError):
+    """
+    Raised when the export file is not a tdl export document.
+    """
+
+# ==============================================================================
+# Streaming reader
+# ==============================================================================
+
+class ExportReader:
+    """
+    Iterate messages of a tdl export file without loading it whole.
+
+    follow: optional callable returning True while the file is still being
+    written; the reader then waits for more data at EOF instead of failing.
+    Top-level fields other than "messages" (the chat "id") are collected
+    into self.header as they are reached.
+    """
+
+    def __init__(self, path, follow=None, chunk_size=DEFAULT_CHUNK_SIZE, poll_interval=0.2):
+        self.path = path
+        self.follow = follow
+        self.chunk_size = chunk_size
+        self.poll_interval = poll_interval
+        self.header = {}
+        self._decoder = json.JSONDecoder()
+        self._fh = None
+        self._buf = ''
+        self._pos = 0
+        self._eof = False
+
+    @property
+    def chat_id(self):
+        return self.header.get('id')
+
+    def _open(self):
+        while not os.path.exists(self.path):
+            if not (self.follow and self.follow()):
+                raise FileNotFoundError(self.path)
+            time.sleep(self.poll_interval)
+        self._fh = open(self.path, 'r', encoding='utf-8-sig')
+
+    def _fill(self):
+        """
+        Read more data into the buffer; returns False at final EOF.
+        """
+        if self._pos > self.chunk_size:
+            self._buf = self._buf[self._pos:]
+            self._pos = 0
+        size = max(self.chunk_size, len(self._buf) - self._pos)
+        while True:
+            data = self._fh.read(size)
+            if data:
+                self._buf += data
+                return True
+            if self.follow and self.follow():
+                time.sleep(self.poll_interval)
+                continue
+            # writer finished: pick up anything flushed after the last poll
+            data = self._fh.read(size)
+            if data:
+                self._buf += data
+                return True
+            self._eof = True
+            return False
+
+    def _peek(self):
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill():
+                raise ExportFormatError(f"unexpected end of export file: {self.path}")
+
+    def _expect(self, ch):
+        if self._peek() != ch:
+            raise ExportFormatError(f"expected '{ch}' at offset {self._pos} in {self.path}")
+        self._pos += 1
+
+    def _value(self):
+        self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise ExportFormatError(f"truncated value in export file: {self.path}")
+            # a number ending exactly at the buffer edge may continue in the next chunk
+            if end == len(self._buf) and not self._eof and self._fill():
+                continue
+            self._pos = end
+            return value
+
+    def __iter__(self):
+        self._open()
+        try:
+            self._expect('{')
+            if self._peek() == '}':
+                return
+            while True:
+                key = self._value()
+                self._expect(':')
+                if key == 'messages':
+                    yield from self._messages()
+                else:
+                    self.header[key] = self._value()
+                if self._peek() == ',':
+                    self._pos += 1
+                    continue
+                self._expect('}')
+                return
+        finally:
+            self._fh.close()
+
+    def _messages(self):
+        self._expect('[')
+        if self._peek() == ']':
+            self._pos += 1
+            return
+        while True:
+            yield self._value()
+            if self._peek() == ',':
+                self._pos += 1
+                continue
+            self._expect(']')
+            return
+
+def iter_messages(path, skip=(), follow=None, media_only=False):
+    """
+    Yield export messages whose ID is not in any of the skip containers.
+    """
+    for msg in ExportReader(path, follow=follow):
+        msg_id = msg.get('id')
+        if not isinstance(msg_id, int):
+            continue
+        if any(msg_id in ids for ids in skip):
+            continue
+        if media_only and not msg.get('file'):
+            continue
+        yield msg
+
+# ==============================================================================
+# Shard writer
+# ==============================================================================
+
+class ShardWriter:
+    """
+    Write messages into compact export files of at most shard_size
+    messages each, in the format accepted by `tdl download --file`.
+    With max_bytes, a shard is also closed once the sizes passed to
+    write() add up to that many bytes.
+    """
+
+    def __init__(self, out_dir, chat_id, shard_size=DEFAULT_SHARD_SIZE, prefix='tdl-export',
+                 on_shard=None, max_bytes=None):
+        self.out_dir = out_dir
+        self.chat_id = chat_id
+        self.shard_size = max(1, int(shard_size))
+        self.prefix = prefix
+        self.on_shard = on_shard
+        self.max_bytes = max_bytes
+        # one dict per finished shard: path, count, bytes, min_id, max_id
+        self.shards = []
+        self._fh = None
+        self._current = None
+
+    def _start_shard(self):
+        os.makedirs(self.out_dir, exist_ok=True)
+        path = os.path.join(self.out_dir, f"{self.prefix}-{len(self.shards) + 1:04d}.json")
+        self._fh = open(path, 'w', encoding='utf-8')
+        self._fh.write('{"id":%s,"messages":[' % json.dumps(self.chat_id))
+        self._current = {'path': path, 'count': 0, 'bytes': 0, 'min_id': None, 'max_id': None}
+
+    def _finish_shard(self):
+        self._fh.write(']}')
+        self._fh.close()
+        self._fh = None
+        self.shards.append(self._current)
+        if self.on_shard:
+            self.on_shard(self._current)
+        self._current = None
+
+    def write(self, msg, size=0):
+        if self._fh is None:
+            self._start_shard()
+        shard = self._current
+        if shard['count']:
+            self._fh.write(',')
+        self._fh.write(json.dumps(msg, ensure_ascii=False, separators=(',', ':')))
+        shard['count'] += 1
+        shard['bytes'] += size
+        msg_id = msg['id']
+        shard['min_id'] = msg_id if shard['min_id'] is None else min(shard['min_id'], msg_id)
+        shard['max_id'] = msg_id if shard['max_id'] is None else max(shard['max_id'], msg_id)
+        if shard['count'] >= self.shard_size or (self.max_bytes and shard['bytes'] >= self.max_bytes):
+            self._finish_shard()
+
+    def close(self):
+        if self._fh is not None:
+            self._finish_shard()
+        return self.shards
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def write_shards(messages, out_dir, chat_id, shard_size=DEFAULT_SHARD_SIZE, prefix='tdl-export'):
+    """
+    Write an iterable of messages into shard files and return shard info.
+    """
+    with ShardWriter(out_dir, chat_id, shard_size, prefix) as writer:
+        for msg in messages:
+            writer.write(msg)
+    return writer.shards
+
+def filter_export(src, dest, keep):
+    """
+    Stream messages of src whose ID is in keep into export file dest
+    (which may be src itself). Returns number of messages written.
+    """
+    reader = ExportReader(src)
+    count = 0
+    with atomic_open(dest) as f:
+        for msg in reader:
+            if msg.get('id') not in keep:
+                continue
+            f.write(',' if count else '{"id":%s,"messages":[' % json.dumps(reader.chat_id))
+            f.write(json.dumps(msg, ensure_ascii=False, separators=(',', ':')))
+            count += 1
+        if not count:
+            f.write('{"id":%s,"messages":[' % json.dumps(reader.chat_id))
+        f.write(']}')
+    return count
+
+# ==============================================================================
+# Export process
+# ==============================================================================
+
+def build_export_command(tdl_exe, chat, export_file, with_content=True, extra_args=()):
+    """
+    Build argument list for `tdl chat export`.
+    """
+    cmd = [tdl_exe, 'chat', 'export', '-c', str(chat), '-o', export_file]
+    if with_content:
+        cmd.append('--with-content')
+    cmd += list(extra_args)
+    return cmd
+
+def export_chat_id(tdl_exe, chat, export_file, cwd=None, log_file=None):
+    """
+    Return the dialog ID tdl reports for chat (e.g. a username) in the
+    header of a one-message export, or None if the export failed.
+    """
+    os.makedirs(os.path.dirname(export_file), exist_ok=True)
+    proc = start_export(tdl_exe, chat, export_file, cwd=cwd, log_file=log_file,
+                        with_content=False, extra_args=('-T', 'id', '-i', '1,1'))
+    try:
+        if proc.wait() != 0:
+            return None
+        reader = ExportReader(export_file)
+        for _msg in reader:
+            pass
+        return reader.chat_id
+    except (OSError, ValueError):
+        return None
+    finally:
+        if os.path.exists(export_file):
+            os.remove(export_file)
+
+def start_export(tdl_exe, chat, export_file, cwd=None, log_file=None, **kwargs):
+    """
+    Start `tdl chat export` in the background and return the Popen.
+    Pass `lambda: proc.poll() is None` as follow= to read while it runs.
+    """
+    if os.path.exists(export_file):
+        os.remove(export_file)
+    out = open(log_file, 'a', encoding='utf-8') if log_file else subprocess.DEVNULL
+    try:
+        return subprocess.Popen(build_export_command(tdl_exe, chat, export_file, **kwargs),
+                                cwd=cwd, stdin=subprocess.DEVNULL,
+                                stdout=out, stderr=subprocess.STDOUT)
+    finally:
+        if log_file:
+            out.close()
@@ -1,11 +1,28 @@
+import sys
+
+if __name__ == '__main__' and len(sys.argv) > 1:
+    # headless mode (python -m tdl_gui run ...): never load tkinter
+    from tdl_cli import main
+    sys.exit(main(sys.argv[1:]))
+
 import tkinter as tk
-from tkinter import simpledialog, messagebox, filedialog
+from tkinter import simpledialog, messagebox, filedialog, ttk
 import subprocess
 import os
-import sys
 import shutil
 import json
-import re
+import time
+
+import tdl_cli
+import tdl_controller
+import tdl_engine
+import tdl_exec
+import tdl_jobs
+import tdl_links
+import tdl_progress
+import tdl_retry
+from tdl_index import write_json_atomic
+from tdl_links import extract_message_id_from_url, extract_base_url_from_message_url
 
 # ==============================================================================
 # Globals and configuration
@@ -24,6 +41,21 @@ CLOSE_TERMINAL = True
 # widget references for easy text updates
 WIDGETS = {}
 
+# tdl_easy.json keys kept when task parameters are replaced or cleared
+PERSISTENT_STATE_KEYS = ('highWaterMarks', 'dedup', 'plan', 'order', 'packBySize', 'batchSize')
+# the persistent keys that are engine options of every job
+JOB_OPTION_KEYS = ('dedup', 'plan', 'order', 'packBySize', 'batchSize')
+
+# background job controller, the job rows it last reported and how often
+# the Tk thread drains its events
+JOB_CONTROLLER = None
+# set by close_launcher while it waits for the jobs to stop
+CLOSING = False
+JOB_ROWS = []
+JOB_POLL_MS = 250
+# seconds to wait on close for killed jobs to save their state
+JOB_STOP_TIMEOUT = 30
+
 # menu texts for both languages
 MENU_TEXT = {
     'EN': {
@@ -32,25 +64,62 @@ MENU_TEXT = {
         'install_update': 'INSTALL/UPDATE TDL',
         'telegram_login': 'TELEGRAM LOGIN',
         'download_single': 'DOWNLOAD SINGLE FILE',
+        'download_bulk': 'DOWNLOAD LINKS LIST',
         'download_range': 'DOWNLOAD POSTS RANGE',
         'download_full': 'DOWNLOAD FULL CHAT',
+        'dead_letters': 'FAILED MESSAGES',
         'exit': 'EXIT',
         'button_en': 'EN',
         'button_ru': 'RU',
         'close_terminal': 'Close terminal',
-        'hint_close': 'PowerShell windows will auto-close after execution.',
-        'hint_no_close': 'PowerShell windows will stay open after execution.',
+        'hint_close': 'Console windows will auto-close after execution.',
+        'hint_no_close': 'Console windows will stay open after execution.',
         # Error messages
         'error': 'Error',
         'launch_error': 'Launch Error',
         'invalid_url': 'Invalid URL',
         'invalid_format': 'Invalid Format',
         'script_not_found': 'Script not found: {script}',
+        'no_terminal': 'No terminal window could be opened. Open a terminal in\n{path}\nand run: tdl login',
+        'windows_only': 'The TDL updater downloads the Windows build and only runs on Windows. On this system, install tdl from https://github.com/iyear/tdl/releases into the launcher folder.',
         'failed_to_copy': 'Failed to copy {file}: {error}',
         'tdl_not_found': 'tdl.exe not found. Please install/update TDL first.',
         'tdl_path_not_found': 'TDL path not found: {path}',
         'media_dir_not_found': 'Media directory not found: {path}',
         'endid_error': 'endId must be >= startId.',
+        'base_url_error': 'Failed to extract base URL from start URL',
+        # Background jobs
+        'jobs_header': 'Jobs',
+        'col_chat': 'Chat',
+        'col_mode': 'Type',
+        'col_status': 'Status',
+        'col_done': 'Done',
+        'col_speed': 'Speed',
+        'col_eta': 'ETA',
+        'mode_single': 'file',
+        'mode_range': 'range',
+        'mode_full': 'full chat',
+        'mode_bulk': 'links',
+        'status_queued': 'queued',
+        'status_running': 'running',
+        'status_paused': 'paused',
+        'status_done': 'done',
+        'status_failed': 'failed',
+        'status_cancelled': 'cancelled',
+        'job_pause': 'Pause',
+        'job_resume': 'Resume',
+        'job_cancel': 'Cancel',
+        'job_done_message': 'Completed: {downloaded} downloaded, {failed} failed, {skipped} skipped.',
+        'incremental_title': 'Incremental Sync',
+        'incremental_message': 'This chat was synced up to message {id}. Download only newer messages?',
+        'dead_title': 'Failed Messages',
+        'dead_no_task': 'No saved task yet. Start a range or full chat download first.',
+        'dead_empty': 'No failed messages for the saved task.',
+        'dead_header': 'Messages that failed every retry (chat {chat}):',
+        'dead_requeue_selected': 'Re-queue selected',
+        'dead_requeue_all': 'Re-queue all',
+        'dead_close': 'Close',
+        'dead_requeued': '{count} messages re-queued. They will be downloaded on the next run of the task.',
         # Dialog titles and prompts
         'tdl_path_title': 'TDL path',
         'tdl_path_prompt': 'Path to TDL:',
@@ -64,10 +133,17 @@ MENU_TEXT = {
         'task_limit_prompt': 'Max concurrent download tasks (1-10) [default 2]:',
         'threads_title': 'Threads',
         'threads_prompt': 'Max threads per task (1-8) [default 4]:',
+        'auto_title': 'Concurrency',
+        'auto_message': 'Tune download tasks and threads automatically?\n\nYes: start low and speed up while throughput grows, back off on FLOOD_WAIT or errors.\nNo: enter fixed values.',
         'message_url_title': 'Message URL',
         'message_url_prompt': 'Enter Telegram message URL (https://t.me/c/12345678/123 or https://t.me/username/123):',
         'single_url_title': 'DOWNLOAD SINGLE FILE',
         'single_url_prompt': 'Paste the message link (https://t.me/...):',
+        'bulk_prompt': 'Paste message links (https://t.me/...), any number per line,\nor import a text/CSV file:',
+        'bulk_import': 'Import file...',
+        'bulk_filetypes': 'Text or CSV files',
+        'bulk_no_links': 'No Telegram message links found.',
+        'bulk_summary': '{links} links in {chats} chats ({duplicates} duplicates, {invalid} invalid links skipped).\n\nDownload them?',
         # URL validation messages
         'url_http_required': 'URL must start with http:// or https://',
         'url_telegram_format': 'Expected https://t.me/username/123 or https://t.me/c/12345678/123',
@@ -91,25 +167,62 @@ MENU_TEXT = {
         'install_update': 'УСТАНОВИТЬ/ОБНОВИТЬ TDL',
         'telegram_login': 'ЛОГИН В TELEGRAM',
         'download_single': 'СКАЧАТЬ ОДИНОЧНЫЙ ФАЙЛ',
+        'download_bulk': 'СКАЧАТЬ СПИСОК ССЫЛОК',
         'download_range': 'СКАЧАТЬ ДИАПАЗОН ПОСТОВ',
         'download_full': 'СКАЧАТЬ ВСЁ ИЗ ЧАТА',
+        'dead_letters': 'НЕУДАЧНЫЕ СООБЩЕНИЯ',
         'exit': 'ВЫХОД',
         'button_en': 'EN',
         'button_ru': 'RU',
         'close_terminal': 'Закрыть терминал',
-        'hint_close': 'PowerShell-окна авто-закрываются по завершении.',
-        'hint_no_close': 'PowerShell-окна остаются открытыми после выполнения.',
+        'hint_close': 'Консольные окна авто-закрываются по завершении.',
+        'hint_no_close': 'Консольные окна остаются открытыми после выполнения.',
         # Error messages
         'error': 'Ошибка',
         'launch_error': 'Ошибка запуска',
         'invalid_url': 'Неверный URL',
         'invalid_format': 'Неверный формат',
         'script_not_found': 'Скрипт не найден: {script}',
+        'no_terminal': 'Не удалось открыть окно терминала. Откройте терминал в папке\n{path}\nи выполните: tdl login',
+        'windows_only': 'Программа обновления TDL скачивает сборку для Windows и работает только в Windows. В этой системе установите tdl с https://github.com/iyear/tdl/releases в папку лаунчера.',
         'failed_to_copy': 'Не удалось скопировать {file}: {error}',
         'tdl_not_found': 'tdl.exe не найден. Сначала установите/обновите TDL.',
         'tdl_path_not_found': 'Путь к TDL не найден: {path}',
         'media_dir_not_found': 'Папка для медиа не найдена: {path}',
         'endid_error': 'endId должен быть >= startId.',
+        'base_url_error': 'Не удалось получить базовый URL из начального URL',
+        # Background jobs
+        'jobs_header': 'Задачи',
+        'col_chat': 'Чат',
+        'col_mode': 'Тип',
+        'col_status': 'Статус',
+        'col_done': 'Готово',
+        'col_speed': 'Скорость',
+        'col_eta': 'Осталось',
+        'mode_single': 'файл',
+        'mode_range': 'диапазон',
+        'mode_full': 'весь чат',
+        'mode_bulk': 'ссылки',
+        'status_queued': 'в очереди',
+        'status_running': 'идёт',
+        'status_paused': 'пауза',
+        'status_done': 'готово',
+        'status_failed': 'ошибка',
+        'status_cancelled': 'отменена',
+        'job_pause': 'Пауза',
+        'job_resume': 'Продолжить',
+        'job_cancel': 'Отменить',
+        'job_done_message': 'Готово: скачано {downloaded}, ошибок {failed}, пропущено {skipped}.',
+        'incremental_title': 'Инкрементальная синхронизация',
+        'incremental_message': 'Чат уже синхронизирован до сообщения {id}. Скачать только новые сообщения?',
+        'dead_title': 'Неудачные сообщения',
+        'dead_no_task': 'Нет сохранённой задачи. Сначала запустите загрузку диапазона или всего чата.',
+        'dead_empty': 'Для сохранённой задачи нет неудачных сообщений.',
+        'dead_header': 'Сообщения, не скачанные после всех попыток (чат {chat}):',
+        'dead_requeue_selected': 'Повторить выбранные',
+        'dead_requeue_all': 'Повторить все',
+        'dead_close': 'Закрыть',
+        'dead_requeued': 'В очередь возвращено сообщений: {count}. Они будут скачаны при следующем запуске задачи.',
         # Dialog titles and prompts
         'tdl_path_title': 'Путь к TDL',
         'tdl_path_prompt': 'Путь к TDL:',
@@ -123,10 +236,17 @@ MENU_TEXT = {
         'task_limit_prompt': 'Макс. одновременных задач загрузки (1-10) [по умолчанию 2]:',
         'threads_title': 'Потоки',
         'threads_prompt': 'Макс. потоков на задачу (1-8) [по умолчанию 4]:',
+        'auto_title': 'Параллельность',
+        'auto_message': 'Подбирать число задач и потоков автоматически?\n\nДа: начать с малого и наращивать, пока растёт скорость, снижать при FLOOD_WAIT или ошибках.\nНет: ввести фиксированные значения.',
         'message_url_title': 'URL сообщения',
         'message_url_prompt': 'Введите URL сообщения Telegram (https://t.me/c/12345678/123 или https://t.me/username/123):',
         'single_url_title': 'СКАЧАТЬ ОДИНОЧНЫЙ ФАЙЛ',
         'single_url_prompt': 'Вставьте ссылку на сообщение (https://t.me/...):',
+        'bulk_prompt': 'Вставьте ссылки на сообщения (https://t.me/...), сколько угодно в строке,\nили импортируйте текстовый/CSV файл:',
+        'bulk_import': 'Импорт файла...',
+        'bulk_filetypes': 'Текстовые или CSV файлы',
+        'bulk_no_links': 'Ссылки на сообщения Telegram не найдены.',
+        'bulk_summary': '{links} ссылок в {chats} чатах (пропущено: {duplicates} повторов, {invalid} неверных ссылок).\n\nСкачать их?',
         # URL validation messages
         'url_http_required': 'URL должен начинаться с http:// или https://',
         'url_telegram_format': 'Ожидается https://t.me/username/123 или https://t.me/c/12345678/123',
@@ -150,80 +270,6 @@ MENU_TEXT = {
 # Utility functions
 # ==============================================================================
 
-def extract_message_id_from_url(url):
-    """
-    Extract message ID from Telegram URL.
-    Supports formats:
-    - https://t.me/username/1234
-    - https://t.me/c/12345678/1234
-    - https://t.me/c/12345678/166/1234 (topic)
-    """
-    try:
-        # Remove trailing slash if present
-        url = url.rstrip('/')
-        
-        # Parse URL
-        if not url.startswith('http'):
-            return None
-            
-        # Extract path segments
-        if '/t.me/' in url:
-            path = url.split('/t.me/')[1]
-        else:
-            return None
-            
-        segments = path.split('/')
-        
-        if len(segments) == 2 and segments[0].replace('_', '').isalnum() and segments[1].isdigit():
-            # public username format: https://t.me/username/1234
-            return int(segments[1])
-        elif len(segments) == 3 and segments[0] == 'c' and segments[1].isdigit() and segments[2].isdigit():
-            # internal channel format: https://t.me/c/12345678/1234
-            return int(segments[2])
-        elif len(segments) == 4 and segments[0] == 'c' and segments[1].isdigit() and segments[2].isdigit() and segments[3].isdigit():
-            # topic format: https://t.me/c/12345678/166/1234
-            return int(segments[3])
-            
-    except (ValueError, IndexError):
-        pass
-    
-    return None
-
-def extract_base_url_from_message_url(url):
-    """
-    Extract base URL from message URL.
-    """
-    try:
-        # Remove trailing slash if present
-        url = url.rstrip('/')
-        
-        # Parse URL
-        if not url.startswith('http'):
-            return None
-            
-        # Extract path segments
-        if '/t.me/' in url:
-            path = url.split('/t.me/')[1]
-        else:
-            return None
-            
-        segments = path.split('/')
-        
-        if len(segments) == 2 and segments[0].replace('_', '').isalnum() and segments[1].isdigit():
-            # public username format: https://t.me/username/1234
-            return f"https://t.me/{segments[0]}/"
-        elif len(segments) == 3 and segments[0] == 'c' and segments[1].isdigit() and segments[2].isdigit():
-            # internal channel format: https://t.me/c/12345678/1234
-            return f"https://t.me/c/{segments[1]}/"
-        elif len(segments) == 4 and segments[0] == 'c' and segments[1].isdigit() and segments[2].isdigit() and segments[3].isdigit():
-            # topic format: https://t.me/c/12345678/166/1234
-            return f"https://t.me/c/{segments[1]}/{segments[2]}/"
-            
-    except (ValueError, IndexError):
-        pass
-    
-    return None
-
 def resource_path(rel):
     """
     Return absolute path to resource, works for dev and PyInstaller.
@@ -244,53 +290,36 @@ def get_launcher_dir():
     else:
         return os.path.abspath(os.path.dirname(__file__))
 
+def run_powershell_script(script_path):
+    """
+    Run a PowerShell script in its own console window (closed
+    automatically when done unless the checkbox is cleared). Windows only.
+    """
+    if not os.path.isfile(script_path):
+        messagebox.showerror(MENU_TEXT[LANG]['error'], MENU_TEXT[LANG]['script_not_found'].format(script=os.path.basename(script_path)))
+        return
+    executor = tdl_exec.script_executor(keep_open=not CLOSE_TERMINAL)
+    if executor is None:
+        messagebox.showerror(MENU_TEXT[LANG]['error'], MENU_TEXT[LANG]['windows_only'])
+        return
+    try:
+        executor.run_script(script_path)
+    except Exception as e:
+        messagebox.showerror(MENU_TEXT[LANG]['launch_error'], str(e))
 
-
-
-
-def run_powershell_script(script_path=None, extra_command=None):
+def run_tdl_command(args, interactive=False):
     """
-    Launch a PowerShell script or command in its own window and
-    optionally close the window automatically when done.
+    Run tdl from the launcher directory without a shell in between;
+    interactive commands get a terminal or console window.
     """
-    global CLOSE_TERMINAL
-    if extra_command and not script_path:
-        # running inline command
-        if CLOSE_TERMINAL:
-            cmd = [
-                'cmd', '/c', 'start', '', 'PowerShell.exe',
-                '-ExecutionPolicy', 'Bypass',
-                '-Command', f"{extra_command}; exit"
-            ]
-        else:
-            cmd = [
-                'cmd', '/c', 'start', '', 'PowerShell.exe',
-                '-NoExit',
-                '-ExecutionPolicy', 'Bypass',
-                '-Command', extra_command
-            ]
-        cwd = get_launcher_dir()
-    else:
-        # running a .ps1 file
-        if not os.path.isfile(script_path):
-            messagebox.showerror(MENU_TEXT[LANG]['error'], MENU_TEXT[LANG]['script_not_found'].format(script=os.path.basename(script_path)))
-            return
-        if CLOSE_TERMINAL:
-            cmd = [
-                'cmd', '/c', 'start', '', 'PowerShell.exe',
-                '-ExecutionPolicy', 'Bypass',
-                '-File', script_path
-            ]
-        else:
-            cmd = [
-                'cmd', '/c', 'start', '', 'PowerShell.exe',
-                '-NoExit',
-                '-ExecutionPolicy', 'Bypass',
-                '-File', script_path
-            ]
-        cwd = os.path.dirname(script_path)
+    launcher_dir = get_launcher_dir()
+    tdl_exe = tdl_engine.find_tdl_executable(launcher_dir)
+    if not tdl_exe:
+        messagebox.showerror(MENU_TEXT[LANG]['error'], MENU_TEXT[LANG]['tdl_not_found'])
+        return
+    executor = tdl_exec.command_executor(interactive=interactive, keep_open=not CLOSE_TERMINAL)
     try:
-        subprocess.Popen(cmd, cwd=cwd)
+        executor.run([tdl_exe] + list(args), cwd=launcher_dir)
     except Exception as e:
         messagebox.showerror(MENU_TEXT[LANG]['launch_error'], str(e))
 
@@ -312,11 +341,11 @@ def ensure_and_copy(src_rel_name):
 
 def write_state_json(path, obj):
     """
-    Write JSON state file for PS scripts.
+    Write JSON state file for PS scripts through a temp file and atomic
+    rename, so a crash never leaves a half-written state behind.
     """
     try:
-        with open(path, 'w', encoding='utf-8') as f:
-            json.dump(obj, f, ensure_ascii=False, indent=2)
+        write_json_atomic(path, obj, fsync=True, ensure_ascii=False, indent=2)
     except Exception as e:
         messagebox.showerror(MENU_TEXT[LANG]['error'], str(e))
         return False
@@ -370,7 +399,6 @@ def clear_saved_parameters():
     """
     Clear saved parameters by writing empty values to the state file.
     """
-    state_file = os.path.join(get_launcher_dir(), 'tdl_easy.json')
     empty_state = {
         'tdl_path': '',
         'telegramUrl': '',
@@ -382,7 +410,58 @@ def clear_saved_parameters():
         'threads': '',
         'maxRetries': ''
     }
-    write_state_json(state_file, empty_state)
+    save_task_state(empty_state)
+
+def save_task_state(state):
+    """
+    Write task parameters to tdl_easy.json, keeping values that outlive
+    a single task (such as sync high-water marks).
+    """
+    state_file = os.path.join(get_launcher_dir(), 'tdl_easy.json')
+    previous = load_state_json(state_file) or {}
+    state = dict(state)
+    for key in PERSISTENT_STATE_KEYS:
+        if key in previous and key not in state:
+            state[key] = previous[key]
+    return write_state_json(state_file, state)
+
+def saved_job_options():
+    """
+    Return the engine options saved in tdl_easy.json (dedup, plan, ...),
+    to be merged into each job the launcher queues.
+    """
+    saved = load_state_json(os.path.join(get_launcher_dir(), 'tdl_easy.json')) or {}
+    return {key: saved[key] for key in JOB_OPTION_KEYS if key in saved}
+
+def get_high_water_mark(chat):
+    """
+    Return saved high-water mark (last synced message ID) for chat, or None.
+    """
+    state = load_state_json(os.path.join(get_launcher_dir(), 'tdl_easy.json')) or {}
+    return (state.get('highWaterMarks') or {}).get(str(chat))
+
+def set_high_water_mark(chat, msg_id):
+    """
+    Store high-water mark for chat in tdl_easy.json.
+    """
+    state_file = os.path.join(get_launcher_dir(), 'tdl_easy.json')
+    state = load_state_json(state_file) or {}
+    marks = state.get('highWaterMarks') or {}
+    marks[str(chat)] = msg_id
+    state['highWaterMarks'] = marks
+    write_state_json(state_file, state)
+
+def open_folder(path):
+    """
+    Open a folder in the system file manager, ignoring failures.
+    """
+    try:
+        if sys.platform == 'win32':
+            os.startfile(path)
+        else:
+            subprocess.Popen(['xdg-open', path])
+    except Exception:
+        pass
 
 # ==============================================================================
 # Dialog classes
@@ -486,67 +565,73 @@ class PathInputDialog(simpledialog.Dialog):
     def apply(self):
         self.result = self.entry.get()
 
+class LinksInputDialog(simpledialog.Dialog):
+    """
+    Multi-line box for pasting message links, with a button that loads
+    them from a text or CSV file.
+    """
+    def __init__(self, parent, title, prompt):
+        self.prompt = prompt
+        self.result = None
+        super().__init__(parent, title)
+
+    def body(self, master):
+        self.attributes('-topmost', True)
+        tk.Label(master, text=self.prompt, justify='left').grid(row=0, sticky='w', padx=5, pady=(5,0))
+        text_frame = tk.Frame(master)
+        text_frame.grid(row=1, padx=5, pady=(0,5), sticky='nsew')
+        scrollbar = tk.Scrollbar(text_frame)
+        scrollbar.pack(side='right', fill='y')
+        self.text = tk.Text(text_frame, width=80, height=15, wrap='none',
+                            yscrollcommand=scrollbar.set)
+        self.text.pack(side='left', fill='both', expand=True)
+        scrollbar.config(command=self.text.yview)
+        tk.Button(master, text=MENU_TEXT[LANG]['bulk_import'], command=self.import_file
+                  ).grid(row=2, sticky='w', padx=5)
+        return self.text
+
+    def import_file(self):
+        path = filedialog.askopenfilename(
+            filetypes=[(MENU_TEXT[LANG]['bulk_filetypes'], '*.txt *.csv'), ('*', '*')])
+        if not path:
+            return
+        try:
+            with open(path, 'r', encoding='utf-8-sig', errors='replace') as f:
+                content = f.read()
+        except OSError as e:
+            messagebox.showerror(MENU_TEXT[LANG]['error'], str(e), parent=self)
+            return
+        self.text.insert('end', ('\n' if self.text.get('1.0', 'end').strip() else '') + content)
+
+    def apply(self):
+        self.result = self.text.get('1.0', 'end')
+
 # ==============================================================================
 # TDL actions
 # ==============================================================================
 
-def make_autoyes_wrapper(original_name, wrapper_name):
-    launcher_dir = get_launcher_dir()
-    original = ensure_and_copy(original_name)
-    if not original:
-        return None
-    wrapper_path = os.path.join(launcher_dir, wrapper_name)
-    
-    # Copy config file to script directory if it exists
-    config_source = os.path.join(launcher_dir, 'tdl_easy.json')
-    config_dest = os.path.join(os.path.dirname(original), 'tdl_easy.json')
-    
-    content = f"""# Auto wrapper: answer Yes to saved parameters prompt and invoke original
-function Read-Host {{
-    param($prompt)
-    return 'Yes'
-}}
-
-# Copy config file to script directory if it exists
-$configSource = '{config_source.replace("'", "''")}'
-$configDest = '{config_dest.replace("'", "''")}'
-if (Test-Path $configSource) {{
-    # Only copy if source and destination are different
-    if ($configSource -ne $configDest) {{
-        Copy-Item -Path $configSource -Destination $configDest -Force
-    }}
-}}
-
-& '.\\{original_name}'
-"""
-    try:
-        with open(wrapper_path, 'w', encoding='utf-8') as f:
-            f.write(content)
-    except Exception as e:
-        messagebox.showerror(MENU_TEXT[LANG]['error'], str(e))
-        return None
-    return wrapper_path
-
 def install_update_tdl():
+    if sys.platform != 'win32':
+        messagebox.showerror(MENU_TEXT[LANG]['error'], MENU_TEXT[LANG]['windows_only'])
+        return
     updater = ensure_and_copy('tdl-updater.ps1')
     if not updater:
         return
     run_powershell_script(updater)
 
 def login_telegram():
-    launcher_dir = get_launcher_dir()
-    tdl_exe = os.path.join(launcher_dir, 'tdl.exe')
-    if not os.path.isfile(tdl_exe):
+    if not tdl_engine.find_tdl_executable(get_launcher_dir()):
         messagebox.showerror(MENU_TEXT[LANG]['error'], MENU_TEXT[LANG]['tdl_not_found'])
         return
+    if not tdl_exec.interactive_supported():
+        messagebox.showerror(MENU_TEXT[LANG]['error'],
+                             MENU_TEXT[LANG]['no_terminal'].format(path=get_launcher_dir()))
+        return
     messagebox.showinfo(
         MENU_TEXT[LANG]['login_info_title'],
         MENU_TEXT[LANG]['login_info_message']
     )
-    run_powershell_script(
-        None,
-        extra_command=f"& '{tdl_exe}' login"
-    )
+    run_tdl_command(['login'], interactive=True)
 
 def download_single_file():
     url = simpledialog.askstring(
@@ -560,46 +645,240 @@ def download_single_file():
     if not (url.startswith('http://') or url.startswith('https://')):
         messagebox.showwarning(MENU_TEXT[LANG]['invalid_url'], MENU_TEXT[LANG]['url_http_required'])
         return
-    if not re.match(r"^https?://t\.me/(?:(?:c/\d+/(?:\d+))(?:/\d+)?|(?:[A-Za-z0-9_]{5,32}/\d+))$", url):
+    if tdl_links.parse_link(url) is None:
         messagebox.showwarning(MENU_TEXT[LANG]['invalid_url'], MENU_TEXT[LANG]['url_telegram_format'])
         return
     launcher_dir = get_launcher_dir()
-    original = ensure_and_copy('tdl-easy-single.ps1')
-    if not original:
+    if not tdl_engine.find_tdl_executable(launcher_dir):
+        messagebox.showerror(MENU_TEXT[LANG]['error'], MENU_TEXT[LANG]['tdl_not_found'])
+        return
+    # same defaults as tdl-easy-single.ps1: tdl and media in the launcher folder
+    submit_job('single', {'tdl_path': launcher_dir, 'mediaDir': launcher_dir, 'telegramUrl': url})
+
+def download_links():
+    """
+    Download a pasted or imported list of message links from any number
+    of chats as one job.
+    """
+    dlg = LinksInputDialog(MAIN_ROOT, MENU_TEXT[LANG]['download_bulk'], MENU_TEXT[LANG]['bulk_prompt'])
+    if not dlg.result or not dlg.result.strip():
+        return
+    links, invalid, duplicates = tdl_links.parse_links(dlg.result)
+    if not links:
+        messagebox.showwarning(MENU_TEXT[LANG]['invalid_url'], MENU_TEXT[LANG]['bulk_no_links'])
+        return
+    chats = len(tdl_links.group_links(links))
+    if not messagebox.askyesno(MENU_TEXT[LANG]['download_bulk'], MENU_TEXT[LANG]['bulk_summary'].format(
+            links=len(links), chats=chats, duplicates=duplicates, invalid=len(invalid)),
+            parent=MAIN_ROOT):
+        return
+    launcher_dir = get_launcher_dir()
+    if not tdl_engine.find_tdl_executable(launcher_dir):
+        messagebox.showerror(MENU_TEXT[LANG]['error'], MENU_TEXT[LANG]['tdl_not_found'])
+        return
+    saved = load_state_json(os.path.join(launcher_dir, 'tdl_easy.json')) or {}
+    dlg = PathInputDialog(MAIN_ROOT, MENU_TEXT[LANG]['media_dir_title'], MENU_TEXT[LANG]['media_dir_prompt'],
+                          initialvalue=saved.get('mediaDir') or launcher_dir, width=80)
+    media_dir = dlg.result
+    if not media_dir:
+        return
+    if not os.path.isdir(media_dir):
+        messagebox.showerror(MENU_TEXT[LANG]['error'], MENU_TEXT[LANG]['media_dir_not_found'].format(path=media_dir))
+        return
+    config = {key: saved[key] for key in ('downloadLimit', 'threads') if key in saved}
+    config.update(saved_job_options())
+    config.update({'tdl_path': launcher_dir, 'mediaDir': media_dir,
+                   'links': [link.url for link in links]})
+    submit_job('bulk', config)
+
+def get_job_controller():
+    """
+    Return the launcher's job controller, starting it on first use.
+    Jobs are kept in a 'jobs' folder next to the launcher, so queued
+    downloads survive a restart.
+    """
+    global JOB_CONTROLLER
+    if JOB_CONTROLLER is None:
+        JOB_CONTROLLER = tdl_controller.JobController(
+            os.path.join(get_launcher_dir(), tdl_jobs.JOBS_DIR_NAME), tdl_cli.build_engine)
+        JOB_CONTROLLER.start()
+        MAIN_ROOT.after(JOB_POLL_MS, poll_job_events)
+    return JOB_CONTROLLER
+
+def close_launcher():
+    """
+    Close the window: kill running jobs' tdl processes, hide the window
+    and poll with after() until the jobs have saved their state (at most
+    JOB_STOP_TIMEOUT seconds) before destroying Tk.
+    """
+    global CLOSING
+    if JOB_CONTROLLER is None:
+        MAIN_ROOT.destroy()
+        return
+    if CLOSING:
+        return
+    CLOSING = True
+    MAIN_ROOT.withdraw()
+    JOB_CONTROLLER.stop(kill=True)
+    deadline = time.monotonic() + JOB_STOP_TIMEOUT
+
+    def wait_for_jobs():
+        if JOB_CONTROLLER.stopped or time.monotonic() >= deadline:
+            MAIN_ROOT.destroy()
+        else:
+            MAIN_ROOT.after(JOB_POLL_MS, wait_for_jobs)
+    wait_for_jobs()
+
+def poll_job_events():
+    """
+    Apply events posted by the job controller; runs on the Tk thread.
+    """
+    if CLOSING:
+        return
+    rows = None
+    for kind, payload in JOB_CONTROLLER.drain():
+        if kind == tdl_controller.EVENT_JOBS:
+            rows = payload
+        elif kind == tdl_controller.EVENT_FINISHED:
+            report_finished_job(payload)
+        elif kind == tdl_controller.EVENT_ERROR:
+            WIDGETS['hint'].config(text=payload)
+    if rows is not None:
+        JOB_ROWS[:] = rows
+        show_job_rows()
+    MAIN_ROOT.after(JOB_POLL_MS, poll_job_events)
+
+def job_row_values(row):
+    """
+    Column texts of one job in the jobs panel.
+    """
+    snap = row['progress']
+    if snap:
+        done = f"{snap['downloaded'] + snap['failed']}/{snap['total']}"
+        speed = f"{tdl_progress.format_size(snap['bytes_per_s'])}/s"
+        eta = tdl_progress.format_duration(snap['eta']) if row['status'] == 'running' else ''
+    else:
+        stats = row.get('stats') or {}
+        done = str(stats.get('downloaded', '')) if stats else ''
+        speed = eta = ''
+    return (row['chat'] or '', MENU_TEXT[LANG][f"mode_{row['mode']}"],
+            MENU_TEXT[LANG][f"status_{row['status']}"], done, speed, eta)
+
+def show_job_rows():
+    """
+    Refresh the jobs panel from JOB_ROWS, keeping the selection.
+    """
+    tree = WIDGETS.get('jobs')
+    if tree is None:
+        return
+    shown = set(tree.get_children())
+    for row in JOB_ROWS:
+        values = job_row_values(row)
+        if row['id'] in shown:
+            tree.item(row['id'], values=values)
+            shown.discard(row['id'])
+        else:
+            tree.insert('', 'end', iid=row['id'], values=values)
+    if shown:
+        tree.delete(*shown)
+    update_job_buttons()
+
+def selected_job():
+    tree = WIDGETS.get('jobs')
+    selection = tree.selection() if tree else ()
+    for row in JOB_ROWS:
+        if selection and row['id'] == selection[0]:
+            return row
+    return None
+
+def update_job_buttons(_event=None):
+    """
+    Enable pause/resume and cancel for the selected job.
+    """
+    row = selected_job()
+    status = row['status'] if row else None
+    WIDGETS['btn_pause'].config(
+        text=MENU_TEXT[LANG]['job_resume' if status == 'paused' else 'job_pause'],
+        state='normal' if status in ('running', 'paused') else 'disabled')
+    WIDGETS['btn_cancel'].config(
+        state='normal' if status in ('queued', 'running', 'paused') else 'disabled')
+
+def toggle_pause_job():
+    row = selected_job()
+    if row is None:
+        return
+    if row['status'] == 'paused':
+        JOB_CONTROLLER.resume(row['id'])
+    else:
+        JOB_CONTROLLER.pause(row['id'])
+
+def cancel_job():
+    row = selected_job()
+    if row is not None:
+        JOB_CONTROLLER.cancel(row['id'])
+
+def report_finished_job(job):
+    if job['status'] == tdl_jobs.STATUS_CANCELLED:
+        return
+    if job['status'] == tdl_jobs.STATUS_FAILED:
+        messagebox.showerror(MENU_TEXT[LANG]['error'], job.get('error') or '')
         return
-    wrapper_name = 'tdl-easy-single-wrapper.ps1'
-    wrapper_path = os.path.join(launcher_dir, wrapper_name)
+    stats = job.get('stats') or {}
+    if job['mode'] == 'full' and stats.get('high_water') and job['status'] == tdl_jobs.STATUS_DONE:
+        set_high_water_mark(job['chat'], stats['high_water'])
+    title = MENU_TEXT[LANG][f"download_{job['mode']}"]
+    messagebox.showinfo(title, MENU_TEXT[LANG]['job_done_message'].format(
+        downloaded=stats.get('downloaded', 0), failed=stats.get('failed', 0),
+        skipped=stats.get('skipped', 0)))
     try:
-        with open(original, 'r', encoding='utf-8', errors='ignore') as f:
-            content = f.read()
-        escaped_url = url.replace("'", "''")
-        new_content = content.replace('$telegramUrl = Read-Host',
-                                      f"$telegramUrl = '{escaped_url}'")
-        
-        # Copy config file to script directory if it exists
-        config_source = os.path.join(launcher_dir, 'tdl_easy.json')
-        config_dest = os.path.join(os.path.dirname(original), 'tdl_easy.json')
-        
-        # Add config copy to wrapper
-        config_copy_code = f"""
-# Copy config file to script directory if it exists
-$configSource = '{config_source.replace("'", "''")}'
-$configDest = '{config_dest.replace("'", "''")}'
-if (Test-Path $configSource) {{
-    # Only copy if source and destination are different
-    if ($configSource -ne $configDest) {{
-        Copy-Item -Path $configSource -Destination $configDest -Force
-    }}
-}}
-"""
-        new_content = config_copy_code + new_content
-        
-        with open(wrapper_path, 'w', encoding='utf-8') as f:
-            f.write(new_content)
-    except Exception as e:
-        messagebox.showerror(MENU_TEXT[LANG]['error'], str(e))
+        media_dir = tdl_jobs.job_config(job).get('mediaDir')
+    except (OSError, ValueError):
+        media_dir = None
+    if media_dir:
+        open_folder(media_dir)
+
+def submit_job(mode, config):
+    """
+    Queue a download job; it starts as soon as the scheduler has a free
+    slot and shows up in the jobs panel.
+    """
+    get_job_controller().submit(mode, config, chat=tdl_cli.job_chat(mode, config),
+                                chats=tdl_cli.job_chats(mode, config))
+
+def start_range_job(state):
+    """
+    Queue a range download for the native engine.
+    """
+    if not tdl_engine.find_tdl_executable(state['tdl_path']):
+        messagebox.showerror(MENU_TEXT[LANG]['error'], MENU_TEXT[LANG]['tdl_not_found'])
+        return
+    if not extract_base_url_from_message_url(state.get('startUrl', '')):
+        messagebox.showerror(MENU_TEXT[LANG]['error'], MENU_TEXT[LANG]['base_url_error'])
+        return
+    submit_job('range', dict(saved_job_options(), **state))
+
+def start_full_chat_job(state):
+    """
+    Queue a sharded full-chat download for the native engine.
+    """
+    if not tdl_engine.find_tdl_executable(state['tdl_path']):
+        messagebox.showerror(MENU_TEXT[LANG]['error'], MENU_TEXT[LANG]['tdl_not_found'])
+        return
+    base_link = extract_base_url_from_message_url(state.get('telegramMessageUrl', ''))
+    chat = tdl_engine.chat_from_base_url(base_link) if base_link else None
+    if not chat:
+        messagebox.showerror(MENU_TEXT[LANG]['error'], MENU_TEXT[LANG]['base_url_error'])
         return
-    run_powershell_script(wrapper_path)
+
+    config = dict(saved_job_options(), **state)
+    config['sinceId'] = None
+    high_water = get_high_water_mark(chat)
+    if high_water and messagebox.askyesno(
+            MENU_TEXT[LANG]['incremental_title'],
+            MENU_TEXT[LANG]['incremental_message'].format(id=high_water),
+            parent=MAIN_ROOT):
+        config['sinceId'] = high_water
+    submit_job('full', config)
 
 def download_range():
     launcher_dir = get_launcher_dir()
@@ -641,16 +920,13 @@ def download_range():
                     'endId': end_id,
                     'downloadLimit': dl_limit,
                     'threads': threads,
-                    'maxRetries': 1
+                    'maxRetries': 1,
+                    'autoConcurrency': bool(config.get('autoConcurrency'))
                 }
-                state_file = os.path.join(get_launcher_dir(), 'tdl_easy.json')
-                if not write_state_json(state_file, state):
+                if not save_task_state(state):
                     return
                 
-                wrapper = make_autoyes_wrapper('tdl-easy-range.ps1', 'tdl-easy-range-wrapper.ps1')
-                if not wrapper:
-                    return
-                run_powershell_script(wrapper)
+                start_range_job(state)
                 return
         else:
             # User chose No - clear saved parameters
@@ -710,30 +986,37 @@ def download_range():
             continue
         break
 
-    # Extract base URL from start URL for compatibility with PowerShell script
+    # Extract base URL from start URL
     base_link = extract_base_url_from_message_url(start_url)
     if not base_link:
-        messagebox.showerror(MENU_TEXT[LANG]['error'], 'Failed to extract base URL from start URL')
+        messagebox.showerror(MENU_TEXT[LANG]['error'], MENU_TEXT[LANG]['base_url_error'])
         return
 
-    while True:
-        dl_limit_dlg = IntegerInputDialog(MAIN_ROOT, MENU_TEXT[LANG]['task_limit_title'],
-                                          MENU_TEXT[LANG]['task_limit_prompt'],
-                                          initialvalue=2, minvalue=1, maxvalue=10)
-        dl_limit = dl_limit_dlg.result
-        if dl_limit is None:
-            return
-        if 1 <= dl_limit <= 10:
-            break
-    while True:
-        threads_dlg = IntegerInputDialog(MAIN_ROOT, MENU_TEXT[LANG]['threads_title'],
-                                         MENU_TEXT[LANG]['threads_prompt'],
-                                         initialvalue=4, minvalue=1, maxvalue=8)
-        threads = threads_dlg.result
-        if threads is None:
-            return
-        if 1 <= threads <= 8:
-            break
+    auto = messagebox.askyesnocancel(MENU_TEXT[LANG]['auto_title'],
+                                     MENU_TEXT[LANG]['auto_message'], parent=MAIN_ROOT)
+    if auto is None:
+        return
+    # fallback values; in auto mode the controller picks workers and threads
+    dl_limit, threads = 2, 4
+    if not auto:
+        while True:
+            dl_limit_dlg = IntegerInputDialog(MAIN_ROOT, MENU_TEXT[LANG]['task_limit_title'],
+                                              MENU_TEXT[LANG]['task_limit_prompt'],
+                                              initialvalue=2, minvalue=1, maxvalue=10)
+            dl_limit = dl_limit_dlg.result
+            if dl_limit is None:
+                return
+            if 1 <= dl_limit <= 10:
+                break
+        while True:
+            threads_dlg = IntegerInputDialog(MAIN_ROOT, MENU_TEXT[LANG]['threads_title'],
+                                             MENU_TEXT[LANG]['threads_prompt'],
+                                             initialvalue=4, minvalue=1, maxvalue=8)
+            threads = threads_dlg.result
+            if threads is None:
+                return
+            if 1 <= threads <= 8:
+                break
 
     state = {
         'tdl_path': tdl_path,
@@ -744,16 +1027,13 @@ def download_range():
         'endId': end_id,
         'downloadLimit': dl_limit,
         'threads': threads,
-        'maxRetries': 1
+        'maxRetries': 1,
+        'autoConcurrency': auto
     }
-    state_file = os.path.join(get_launcher_dir(), 'tdl_easy.json')
-    if not write_state_json(state_file, state):
+    if not save_task_state(state):
         return
 
-    wrapper = make_autoyes_wrapper('tdl-easy-range.ps1', 'tdl-easy-range-wrapper.ps1')
-    if not wrapper:
-        return
-    run_powershell_script(wrapper)
+    start_range_job(state)
 
 def download_full_chat():
     launcher_dir = get_launcher_dir()
@@ -789,16 +1069,13 @@ def download_full_chat():
                     'mediaDir': media_dir,
                     'downloadLimit': dl_limit,
                     'threads': threads,
-                    'maxRetries': 1
+                    'maxRetries': 1,
+                    'autoConcurrency': bool(config.get('autoConcurrency'))
                 }
-                state_file = os.path.join(get_launcher_dir(), 'tdl_easy.json')
-                if not write_state_json(state_file, state):
+                if not save_task_state(state):
                     return
                 
-                wrapper = make_autoyes_wrapper('tdl-easy-full.ps1', 'tdl-easy-full-wrapper.ps1')
-                if not wrapper:
-                    return
-                run_powershell_script(wrapper)
+                start_full_chat_job(state)
                 return
         else:
             # User chose No - clear saved parameters
@@ -827,30 +1104,35 @@ def download_full_chat():
         if not msg_url:
             return
         msg_url = msg_url.strip()
-        if (re.match(r"^https?://t\.me/c/\d+/\d+$", msg_url)
-                or re.match(r"^https?://t\.me/c/\d+/\d+/\d+$", msg_url)
-                or re.match(r"^https?://t\.me/[A-Za-z0-9_]{5,32}/\d+$", msg_url)):
+        if tdl_links.parse_link(msg_url) is not None:
             break
         messagebox.showwarning(MENU_TEXT[LANG]['invalid_format'], MENU_TEXT[LANG]['url_message_format'])
 
-    while True:
-        dl_limit_dlg = IntegerInputDialog(MAIN_ROOT, MENU_TEXT[LANG]['task_limit_title'],
-                                          MENU_TEXT[LANG]['task_limit_prompt'],
-                                          initialvalue=2, minvalue=1, maxvalue=10)
-        dl_limit = dl_limit_dlg.result
-        if dl_limit is None:
-            return
-        if 1 <= dl_limit <= 10:
-            break
-    while True:
-        threads_dlg = IntegerInputDialog(MAIN_ROOT, MENU_TEXT[LANG]['threads_title'],
-                                          MENU_TEXT[LANG]['threads_prompt'],
-                                          initialvalue=4, minvalue=1, maxvalue=8)
-        threads = threads_dlg.result
-        if threads is None:
-            return
-        if 1 <= threads <= 8:
-            break
+    auto = messagebox.askyesnocancel(MENU_TEXT[LANG]['auto_title'],
+                                     MENU_TEXT[LANG]['auto_message'], parent=MAIN_ROOT)
+    if auto is None:
+        return
+    # fallback values; in auto mode the controller picks workers and threads
+    dl_limit, threads = 2, 4
+    if not auto:
+        while True:
+            dl_limit_dlg = IntegerInputDialog(MAIN_ROOT, MENU_TEXT[LANG]['task_limit_title'],
+                                              MENU_TEXT[LANG]['task_limit_prompt'],
+                                              initialvalue=2, minvalue=1, maxvalue=10)
+            dl_limit = dl_limit_dlg.result
+            if dl_limit is None:
+                return
+            if 1 <= dl_limit <= 10:
+                break
+        while True:
+            threads_dlg = IntegerInputDialog(MAIN_ROOT, MENU_TEXT[LANG]['threads_title'],
+                                              MENU_TEXT[LANG]['threads_prompt'],
+                                              initialvalue=4, minvalue=1, maxvalue=8)
+            threads = threads_dlg.result
+            if threads is None:
+                return
+            if 1 <= threads <= 8:
+                break
 
     state = {
         'tdl_path': tdl_path,
@@ -858,16 +1140,64 @@ def download_full_chat():
         'mediaDir': media_dir,
         'downloadLimit': dl_limit,
         'threads': threads,
-        'maxRetries': 1
+        'maxRetries': 1,
+        'autoConcurrency': auto
     }
-    state_file = os.path.join(get_launcher_dir(), 'tdl_easy.json')
-    if not write_state_json(state_file, state):
+    if not save_task_state(state):
         return
 
-    wrapper = make_autoyes_wrapper('tdl-easy-full.ps1', 'tdl-easy-full-wrapper.ps1')
-    if not wrapper:
+    start_full_chat_job(state)
+
+def show_dead_letters():
+    """
+    Show messages of the saved task that failed every retry and let the
+    user put them back in the queue.
+    """
+    state = load_state_json(os.path.join(get_launcher_dir(), 'tdl_easy.json')) or {}
+    try:
+        media_dir, chat = tdl_cli.config_chat(state)
+    except tdl_cli.ConfigError:
+        messagebox.showinfo(MENU_TEXT[LANG]['dead_title'], MENU_TEXT[LANG]['dead_no_task'])
+        return
+    letters = tdl_retry.DeadLetters.open(media_dir, chat)
+    if not len(letters):
+        messagebox.showinfo(MENU_TEXT[LANG]['dead_title'], MENU_TEXT[LANG]['dead_empty'])
         return
-    run_powershell_script(wrapper)
+
+    win = tk.Toplevel(MAIN_ROOT)
+    win.title(MENU_TEXT[LANG]['dead_title'])
+    win.attributes('-topmost', True)
+    frame = tk.Frame(win, padx=10, pady=10)
+    frame.pack(fill='both', expand=True)
+    tk.Label(frame, text=MENU_TEXT[LANG]['dead_header'].format(chat=chat)).pack(anchor='w')
+
+    list_frame = tk.Frame(frame)
+    list_frame.pack(fill='both', expand=True, pady=(4,8))
+    scrollbar = tk.Scrollbar(list_frame)
+    scrollbar.pack(side='right', fill='y')
+    listbox = tk.Listbox(list_frame, width=90, height=15, selectmode='extended',
+                         yscrollcommand=scrollbar.set)
+    listbox.pack(side='left', fill='both', expand=True)
+    scrollbar.config(command=listbox.yview)
+    entries = letters.entries()
+    for msg_id, entry in entries:
+        listbox.insert('end', f"{msg_id}  ({entry['attempts']}x)  {entry['error']}")
+
+    def requeue(msg_ids):
+        removed = letters.requeue(msg_ids)
+        letters.save()
+        win.destroy()
+        messagebox.showinfo(MENU_TEXT[LANG]['dead_title'],
+                            MENU_TEXT[LANG]['dead_requeued'].format(count=len(removed)))
+
+    buttons = tk.Frame(frame)
+    buttons.pack(fill='x')
+    tk.Button(buttons, text=MENU_TEXT[LANG]['dead_requeue_selected'],
+              command=lambda: requeue([entries[i][0] for i in listbox.curselection()])
+              ).pack(side='left')
+    tk.Button(buttons, text=MENU_TEXT[LANG]['dead_requeue_all'],
+              command=lambda: requeue(None)).pack(side='left', padx=(6,0))
+    tk.Button(buttons, text=MENU_TEXT[LANG]['dead_close'], command=win.destroy).pack(side='right')
 
 # ==============================================================================
 # UI construction and language switching
@@ -921,21 +1251,51 @@ def build_widgets():
                            command=download_single_file)
     btn_single.grid(row=4, column=0, columnspan=3, pady=4)
 
+    btn_bulk = tk.Button(MAIN_FRAME, text=MENU_TEXT[LANG]['download_bulk'], width=35,
+                         command=download_links)
+    btn_bulk.grid(row=5, column=0, columnspan=3, pady=4)
+
     btn_range = tk.Button(MAIN_FRAME, text=MENU_TEXT[LANG]['download_range'], width=35,
                           command=download_range)
-    btn_range.grid(row=5, column=0, columnspan=3, pady=4)
+    btn_range.grid(row=6, column=0, columnspan=3, pady=4)
 
     btn_full = tk.Button(MAIN_FRAME, text=MENU_TEXT[LANG]['download_full'], width=35,
                          command=download_full_chat)
-    btn_full.grid(row=6, column=0, columnspan=3, pady=4)
+    btn_full.grid(row=7, column=0, columnspan=3, pady=4)
+
+    btn_dead = tk.Button(MAIN_FRAME, text=MENU_TEXT[LANG]['dead_letters'], width=35,
+                         command=show_dead_letters)
+    btn_dead.grid(row=8, column=0, columnspan=3, pady=4)
 
     btn_exit = tk.Button(MAIN_FRAME, text=MENU_TEXT[LANG]['exit'], width=35,
-                         command=MAIN_ROOT.destroy)
-    btn_exit.grid(row=7, column=0, columnspan=3, pady=(12,4))
+                         command=close_launcher)
+    btn_exit.grid(row=9, column=0, columnspan=3, pady=(12,4))
 
     hint_text = MENU_TEXT[LANG]['hint_close'] if CLOSE_TERMINAL else MENU_TEXT[LANG]['hint_no_close']
     hint = tk.Label(MAIN_FRAME, text=hint_text, font=('Segoe UI', 8), fg='gray')
-    hint.grid(row=8, column=0, columnspan=3, pady=(8,0))
+    hint.grid(row=10, column=0, columnspan=3, pady=(8,0))
+
+    lbl_jobs = tk.Label(MAIN_FRAME, text=MENU_TEXT[LANG]['jobs_header'],
+                        font=('Segoe UI', 10, 'bold'))
+    lbl_jobs.grid(row=11, column=0, columnspan=3, pady=(12,2), sticky='w')
+
+    columns = ('chat', 'mode', 'status', 'done', 'speed', 'eta')
+    jobs = ttk.Treeview(MAIN_FRAME, columns=columns, show='headings', height=5,
+                        selectmode='browse')
+    for column, width in zip(columns, (110, 70, 80, 80, 80, 70)):
+        jobs.heading(column, text=MENU_TEXT[LANG][f"col_{column}"])
+        jobs.column(column, width=width, anchor='w')
+    jobs.grid(row=12, column=0, columnspan=3, sticky='we')
+    jobs.bind('<<TreeviewSelect>>', update_job_buttons)
+
+    job_buttons = tk.Frame(MAIN_FRAME)
+    job_buttons.grid(row=13, column=0, columnspan=3, pady=(4,0), sticky='we')
+    btn_pause = tk.Button(job_buttons, text=MENU_TEXT[LANG]['job_pause'], width=12,
+                          state='disabled', command=toggle_pause_job)
+    btn_pause.pack(side='left')
+    btn_cancel = tk.Button(job_buttons, text=MENU_TEXT[LANG]['job_cancel'], width=12,
+                           state='disabled', command=cancel_job)
+    btn_cancel.pack(side='left', padx=(6,0))
 
     WIDGETS.update({
         'btn_en': btn_en,
@@ -946,11 +1306,18 @@ def build_widgets():
         'btn_update': btn_update,
         'btn_login': btn_login,
         'btn_single': btn_single,
+        'btn_bulk': btn_bulk,
         'btn_range': btn_range,
         'btn_full': btn_full,
+        'btn_dead': btn_dead,
         'btn_exit': btn_exit,
         'hint': hint,
+        'lbl_jobs': lbl_jobs,
+        'jobs': jobs,
+        'btn_pause': btn_pause,
+        'btn_cancel': btn_cancel,
     })
+    show_job_rows()
 
 def switch_language(lang_code):
     """
@@ -971,6 +1338,7 @@ def build_ui():
     MAIN_ROOT = tk.Tk()
     MAIN_ROOT.title(MENU_TEXT[LANG]['title'])
     MAIN_ROOT.resizable(False, False)
+    MAIN_ROOT.protocol('WM_DELETE_WINDOW', close_launcher)
 
     MAIN_FRAME = tk.Frame(MAIN_ROOT, padx=12, pady=12)
     MAIN_FRAME.pack()
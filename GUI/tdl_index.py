@@ -0,0 +1,347 @@
+"""
+Persistent message-ID index for TDL Easy.
+
+Replaces the processed.txt / error_index.txt arrays of the PowerShell
+scripts. IDs are kept in memory as a bitmap (O(1) membership and add) and
+on disk as a checkpoint of (start, end) interval records plus a journal
+of newer adds, so a contiguous million-ID history reloads from a handful
+of records.
+"""
+import json
+import os
+import re
+import struct
+import tempfile
+from contextlib import contextmanager
+
+from tdl_journal import DEFAULT_SYNC_INTERVAL, OP_ADD, Journal
+
+# one on-disk record: inclusive interval start, end as little-endian uint32
+RECORD = struct.Struct('<II')
+
+# journal records allowed on top of the checkpoint size before compacting
+COMPACT_MIN_RECORDS = 65536
+
+# directory inside mediaDir holding index files
+INDEX_DIR_NAME = '.tdl-index'
+
+# a run of full bytes or one partly set byte; empty bytes are skipped
+_RUNS_RE = re.compile(rb'\xff+|[^\x00\xff]')
+
+def _byte_runs(value):
+    # (first bit, last bit) runs of set bits in one byte
+    runs = []
+    for bit in range(8):
+        if value & (1 << bit):
+            if runs and runs[-1][1] == bit - 1:
+                runs[-1] = (runs[-1][0], bit)
+            else:
+                runs.append((bit, bit))
+    return tuple(runs)
+
+_BYTE_RUNS = tuple(_byte_runs(value) for value in range(256))
+
+# ==============================================================================
+# In-memory bitmap
+# ==============================================================================
+
+class IdBitmap:
+    """
+    Growable bitmap of non-negative message IDs.
+    """
+
+    def __init__(self):
+        self._bits = bytearray()
+        self._count = 0
+
+    def __contains__(self, msg_id):
+        byte = msg_id >> 3
+        return 0 <= byte < len(self._bits) and bool(self._bits[byte] & (1 << (msg_id & 7)))
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        for start, end in self.intervals():
+            yield from range(start, end + 1)
+
+    def _grow(self, msg_id):
+        need = (msg_id >> 3) + 1
+        if need > len(self._bits):
+            self._bits.extend(bytes(max(need - len(self._bits), len(self._bits) // 2)))
+
+    def add(self, msg_id):
+        """
+        Add one ID, return True if it was not present yet.
+        """
+        if msg_id < 0:
+            raise ValueError(f"negative message ID: {msg_id}")
+        self._grow(msg_id)
+        byte, mask = msg_id >> 3, 1 << (msg_id & 7)
+        if self._bits[byte] & mask:
+            return False
+        self._bits[byte] |= mask
+        self._count += 1
+        return True
+
+    def add_range(self, start, end):
+        """
+        Add every ID in the inclusive interval start..end.
+        """
+        if start > end:
+            return
+        if start < 0:
+            raise ValueError(f"negative message ID: {start}")
+        self._grow(end)
+        first_full = (start + 7) >> 3
+        last_full = (end + 1) >> 3
+        if first_full >= last_full:
+            for msg_id in range(start, end + 1):
+                self.add(msg_id)
+            return
+        for msg_id in range(start, first_full << 3):
+            self.add(msg_id)
+        for msg_id in range(last_full << 3, end + 1):
+            self.add(msg_id)
+        chunk = self._bits[first_full:last_full]
+        self._count += (last_full - first_full) * 8 - _popcount(chunk)
+        self._bits[first_full:last_full] = b'\xff' * (last_full - first_full)
+
+    def intervals(self, start=0, end=None):
+        """
+        Return the sorted, merged (start, end) intervals of present IDs;
+        with start/end only their parts within start..end, scanning just
+        that part of the bitmap.
+        """
+        last = len(self._bits) if end is None else min(len(self._bits), (end >> 3) + 1)
+        runs = self._runs(start >> 3, last)
+        # only runs in the first and last byte can reach past start..end
+        first, stop = 0, len(runs)
+        while first < stop and runs[first][1] < start:
+            first += 1
+        while end is not None and stop > first and runs[stop - 1][0] > end:
+            stop -= 1
+        if (first, stop) != (0, len(runs)):
+            runs = runs[first:stop]
+        if runs and runs[0][0] < start:
+            runs[0] = (start, runs[0][1])
+        if runs and end is not None and runs[-1][1] > end:
+            runs[-1] = (runs[-1][0], end)
+        return runs
+
+    def _runs(self, first, last):
+        # merged runs of set bits in bytes first..last-1, a byte at a time:
+        # empty bytes are skipped by the regex, full ones taken as a run
+        runs = []
+        run_start = None
+        prev = -2
+        bits = self._bits
+        byte_runs = _BYTE_RUNS
+        for m in _RUNS_RE.finditer(bits, first, last):
+            i, j = m.span()
+            base = i << 3
+            value = bits[i]
+            for lo, hi in ((0, ((j - i) << 3) - 1),) if value == 0xff else byte_runs[value]:
+                if base + lo != prev + 1:
+                    if run_start is not None:
+                        runs.append((run_start, prev))
+                    run_start = base + lo
+                prev = base + hi
+        if run_start is not None:
+            runs.append((run_start, prev))
+        return runs
+
+def _popcount(data):
+    return bin(int.from_bytes(data, 'little')).count('1')
+
+# ==============================================================================
+# On-disk index
+# ==============================================================================
+
+def index_path(media_dir, chat, kind):
+    """
+    Return path of the index file for chat and kind (e.g. 'processed').
+    """
+    safe_chat = re.sub(r'[^A-Za-z0-9_-]', '_', str(chat))
+    return os.path.join(media_dir, INDEX_DIR_NAME, f"{safe_chat}.{kind}.idx")
+
+def journal_path(path):
+    """
+    Return path of the journal that belongs to index file path.
+    """
+    return os.path.splitext(path)[0] + '.journal'
+
+class IdIndex:
+    """
+    Bitmap of message IDs for one chat, persisted as a checkpoint file of
+    merged interval records plus an append-only journal of newer adds.
+
+    add() only sets the bit and queues a journal record; the journal is
+    written and fsynced in batches (see tdl_journal). compact() folds the
+    journal into a new checkpoint through a temp file and atomic rename,
+    then empties the journal. Opening the index replays the journal on top
+    of the checkpoint, so a crash loses at most the last unsynced batch.
+    """
+
+    def __init__(self, path, sync_interval=DEFAULT_SYNC_INTERVAL):
+        self.path = path
+        self.ids = IdBitmap()
+        self.journal = Journal(journal_path(path), sync_interval)
+        self._compacted = 0
+        self._load()
+
+    @classmethod
+    def open(cls, media_dir, chat, kind):
+        return cls(index_path(media_dir, chat, kind))
+
+    def _load(self):
+        if os.path.exists(self.path):
+            with open(self.path, 'rb') as f:
+                data = f.read()
+            usable = len(data) - len(data) % RECORD.size
+            for start, end in RECORD.iter_unpack(data[:usable]):
+                self.ids.add_range(start, end)
+            self._compacted = usable // RECORD.size
+            if usable != len(data):
+                # drop a torn trailing record written by older versions
+                with open(self.path, 'r+b') as f:
+                    f.truncate(usable)
+        for op, start, end in self.journal.replay():
+            if op == OP_ADD:
+                self.ids.add_range(start, end)
+        if self.journal.records:
+            self.compact()
+
+    def __contains__(self, msg_id):
+        return msg_id in self.ids
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    def intervals(self, start=0, end=None):
+        return self.ids.intervals(start, end)
+
+    def _append(self, start, end):
+        self.journal.append(OP_ADD, start, end)
+
+    def _maybe_compact(self):
+        # keep the journal within a constant factor of the checkpoint size
+        if self.journal.records >= self._compacted + COMPACT_MIN_RECORDS:
+            self.compact()
+
+    def add(self, msg_id):
+        """
+        Record one ID; already present IDs are not written again.
+        """
+        if self.ids.add(msg_id):
+            self._append(msg_id, msg_id)
+            self._maybe_compact()
+
+    def update(self, msg_ids):
+        """
+        Record many IDs, writing one record per contiguous run.
+        """
+        run = None
+        for msg_id in sorted(msg_ids):
+            if not self.ids.add(msg_id):
+                continue
+            if run and msg_id == run[1] + 1:
+                run[1] = msg_id
+                continue
+            if run:
+                self._append(*run)
+            run = [msg_id, msg_id]
+        if run:
+            self._append(*run)
+        self._maybe_compact()
+
+    def sync(self):
+        """
+        Make every add so far durable without compacting.
+        """
+        self.journal.sync()
+
+    def compact(self):
+        """
+        Checkpoint: write the merged intervals to a new index file, swap it
+        in atomically and empty the journal.
+        """
+        count = 0
+        with atomic_open(self.path, 'wb', fsync=True) as f:
+            for start, end in self.ids.intervals():
+                f.write(RECORD.pack(start, end))
+                count += 1
+        _fsync_dir(os.path.dirname(self.path))
+        # a crash before this point replays the journal onto the new
+        # checkpoint, which only re-adds IDs that are already there
+        self.journal.reset()
+        self._compacted = count
+
+    def clear(self):
+        """
+        Forget every ID and remove the index and journal files.
+        """
+        self.journal.reset()
+        self.journal.close()
+        self.ids = IdBitmap()
+        self._compacted = 0
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def close(self):
+        self.journal.close()
+
+# mkstemp creates files as 0600; atomic writes get the mode a plain
+# open() would have given them
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+FILE_MODE = 0o666 & ~_UMASK
+
+@contextmanager
+def atomic_open(path, mode='w', fsync=False):
+    """
+    Open a uniquely named temp file in path's directory for writing and
+    rename it over path when the block exits cleanly (removing it
+    otherwise), so writers saving the same file at once never replace or
+    remove each other's temp file. With fsync the data is made durable
+    before the rename.
+    """
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=os.path.basename(path) + '.', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, mode, **({} if 'b' in mode else {'encoding': 'utf-8'})) as f:
+            yield f
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.chmod(tmp, FILE_MODE)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+def write_json_atomic(path, data, fsync=False, **options):
+    """
+    Write data as JSON to path through atomic_open.
+    """
+    with atomic_open(path, fsync=fsync) as f:
+        json.dump(data, f, **options)
+
+def _fsync_dir(path):
+    """
+    Persist a rename in path; not possible (nor needed) on Windows.
+    """
+    if os.name == 'nt':
+        return
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
@@ -0,0 +1,125 @@
+"""
+Message-ID interval sets for TDL Easy.
+
+The range planner works on sorted, disjoint, inclusive (start, end)
+intervals instead of per-ID lists: a job's wanted ranges, minus the IDs
+already processed, dead-lettered or on disk, is a handful of interval
+subtractions, and the result is handed out in ID order without ever
+listing the range. Memory and time grow with the number of intervals,
+not with the length of the range.
+"""
+import bisect
+import heapq
+
+class IntervalSet:
+    """
+    Sorted, disjoint, inclusive (start, end) intervals of message IDs.
+    Overlapping and adjacent intervals are merged.
+    """
+
+    def __init__(self, intervals=()):
+        self._starts = []
+        self._ends = []
+        self._count = 0
+        if intervals:
+            self._extend(sorted(intervals))
+
+    @classmethod
+    def from_sorted(cls, intervals):
+        """
+        Build the set from intervals already sorted by start, such as an
+        IdBitmap's runs, without sorting them again.
+        """
+        result = cls()
+        result._extend(intervals)
+        return result
+
+    @classmethod
+    def from_ids(cls, msg_ids):
+        """
+        Build the set of single IDs, merging runs of consecutive ones.
+        """
+        return cls.from_sorted((msg_id, msg_id) for msg_id in sorted(msg_ids))
+
+    def _extend(self, intervals):
+        # append intervals sorted by start, none below the last one's
+        # start, merging overlapping and adjacent ones
+        starts, ends = self._starts, self._ends
+        last = ends[-1] if ends else None
+        count = self._count
+        for start, end in intervals:
+            if start > end:
+                continue
+            if last is not None and start <= last + 1:
+                if end > last:
+                    count += end - last
+                    ends[-1] = last = end
+                continue
+            starts.append(start)
+            ends.append(end)
+            count += end - start + 1
+            last = end
+        self._count = count
+
+    def intervals(self):
+        """
+        Return the intervals as a list of (start, end).
+        """
+        return list(zip(self._starts, self._ends))
+
+    def bounds(self):
+        """
+        Return (first ID, last ID), or None when empty.
+        """
+        return (self._starts[0], self._ends[-1]) if self._starts else None
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, msg_id):
+        i = bisect.bisect_right(self._starts, msg_id) - 1
+        return i >= 0 and msg_id <= self._ends[i]
+
+    def __iter__(self):
+        for start, end in zip(self._starts, self._ends):
+            yield from range(start, end + 1)
+
+    def __eq__(self, other):
+        return (isinstance(other, IntervalSet) and self._starts == other._starts
+                and self._ends == other._ends)
+
+    def __repr__(self):
+        return f"IntervalSet({self.intervals()!r})"
+
+    def __or__(self, other):
+        return IntervalSet.from_sorted(heapq.merge(zip(self._starts, self._ends),
+                                                   zip(other._starts, other._ends)))
+
+    def __and__(self, other):
+        return IntervalSet.from_sorted(self._intersect(other.intervals()))
+
+    def _intersect(self, spans):
+        j = 0
+        for start, end in zip(self._starts, self._ends):
+            while j < len(spans) and spans[j][1] < start:
+                j += 1
+            k = j
+            while k < len(spans) and spans[k][0] <= end:
+                yield max(start, spans[k][0]), min(end, spans[k][1])
+                k += 1
+
+    def __sub__(self, other):
+        return IntervalSet.from_sorted(self._subtract(other.intervals()))
+
+    def _subtract(self, spans):
+        j = 0
+        for start, end in zip(self._starts, self._ends):
+            while j < len(spans) and spans[j][1] < start:
+                j += 1
+            k = j
+            while k < len(spans) and spans[k][0] <= end and start <= end:
+                if spans[k][0] > start:
+                    yield start, spans[k][0] - 1
+                start = max(start, spans[k][1] + 1)
+                k += 1
+            yield start, end
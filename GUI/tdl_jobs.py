@@ -0,0 +1,425 @@
+"""
+Persistent job queue and scheduler for TDL Easy.
+
+Every job is one JSON file in a jobs directory, so several range and
+full-chat jobs can be queued side by side instead of sharing the single
+tdl_easy.json. The scheduler runs up to max_jobs of them at once, and all
+their tdl processes draw from one ProcessBudget that caps concurrent
+processes and total threads and hands free slots to the chat with the
+fewest running processes first.
+"""
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import ExitStack, contextmanager
+
+from tdl_index import write_json_atomic
+
+JOBS_DIR_NAME = 'jobs'
+
+STATUS_QUEUED = 'queued'
+STATUS_RUNNING = 'running'
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+STATUS_CANCELLED = 'cancelled'
+
+DEFAULT_MAX_JOBS = 2
+DEFAULT_MAX_PROCESSES = 6
+DEFAULT_MAX_THREADS = 24
+
+# ==============================================================================
+# Job store
+# ==============================================================================
+
+class JobStore:
+    """
+    Directory of <job id>.json files.
+
+    A job is a dict with id, mode ('range'/'full'/'single'), config
+    (tdl_easy.json keys) or configPath, the chat it downloads (None when
+    unknown), chats (every chat it downloads, lowercased), priority,
+    status, timestamps, stats and error.
+    """
+
+    def __init__(self, jobs_dir):
+        self.jobs_dir = jobs_dir
+        self._lock = threading.Lock()
+        os.makedirs(jobs_dir, exist_ok=True)
+
+    def _path(self, job_id):
+        return os.path.join(self.jobs_dir, f"{job_id}.json")
+
+    def _write(self, job):
+        write_json_atomic(self._path(job['id']), job, ensure_ascii=False, indent=2)
+
+    def add(self, mode, config=None, config_path=None, priority=0, chat=None, chats=None):
+        """
+        Queue a new job and return it. chat is the chat the job's engine
+        will download (see tdl_cli.job_chat) and chats every chat it
+        touches (tdl_cli.job_chats; defaults to chat); the scheduler runs
+        one job per chat at a time.
+        """
+        if chats is None:
+            chats = [chat] if chat else []
+        job = {
+            'id': time.strftime('%Y%m%d-%H%M%S-') + uuid.uuid4().hex[:6],
+            'mode': mode,
+            'config': config or {},
+            'configPath': os.path.abspath(config_path) if config_path else None,
+            'chat': chat,
+            'chats': sorted({c.lower() for c in chats}),
+            'priority': int(priority),
+            'status': STATUS_QUEUED,
+            'created': time.time(),
+            'started': None,
+            'finished': None,
+            'stats': None,
+            'error': None,
+        }
+        with self._lock:
+            self._write(job)
+        return job
+
+    def get(self, job_id):
+        try:
+            with open(self._path(job_id), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def list(self):
+        """
+        Return all jobs, oldest first.
+        """
+        jobs = []
+        for name in os.listdir(self.jobs_dir):
+            if name.endswith('.json'):
+                job = self.get(name[:-len('.json')])
+                if job:
+                    jobs.append(job)
+        jobs.sort(key=lambda j: j['created'])
+        return jobs
+
+    def update(self, job_id, **fields):
+        with self._lock:
+            job = self.get(job_id)
+            if job is None:
+                return None
+            job.update(fields)
+            self._write(job)
+        return job
+
+    def remove(self, job_id):
+        with self._lock:
+            try:
+                os.remove(self._path(job_id))
+                return True
+            except OSError:
+                return False
+
+    def recover(self):
+        """
+        Re-queue jobs left 'running' by a crashed or killed launcher.
+        """
+        for job in self.list():
+            if job['status'] == STATUS_RUNNING:
+                self.update(job['id'], status=STATUS_QUEUED)
+
+def job_chats(job):
+    """
+    Return the set of lowercased chats a job downloads.
+    """
+    if job.get('chats'):
+        return set(job['chats'])
+    return {job['chat'].lower()} if job.get('chat') else set()
+
+def job_config(job):
+    """
+    Return the job's config, reading configPath fresh if it has one.
+    """
+    if job.get('configPath'):
+        with open(job['configPath'], 'r', encoding='utf-8-sig') as f:
+            return json.load(f)
+    return dict(job.get('config') or {})
+
+# ==============================================================================
+# Global process/thread budget
+# ==============================================================================
+
+class ProcessBudget:
+    """
+    Global cap on concurrent tdl processes and on their summed -t threads.
+
+    When a slot frees up it goes to the waiter whose chat has the fewest
+    running processes, then to the higher job priority, then first come.
+    """
+
+    def __init__(self, max_processes=DEFAULT_MAX_PROCESSES, max_threads=DEFAULT_MAX_THREADS):
+        self.max_processes = max(1, int(max_processes))
+        self.max_threads = max(1, int(max_threads))
+        self.processes = 0
+        self.threads = 0
+        self._by_chat = {}
+        self._waiters = []
+        self._seq = 0
+        self._cond = threading.Condition()
+
+    def _fits(self, threads):
+        return (self.processes < self.max_processes
+                and self.threads + threads <= self.max_threads)
+
+    def _rank(self, waiter):
+        chat, priority, seq, _threads = waiter
+        return (self._by_chat.get(chat, 0), -priority, seq)
+
+    def acquire(self, chat, threads=1, priority=0):
+        threads = min(max(1, int(threads)), self.max_threads)
+        with self._cond:
+            self._seq += 1
+            waiter = (chat, priority, self._seq, threads)
+            self._waiters.append(waiter)
+            try:
+                while not (self._fits(threads)
+                           and min(self._waiters, key=self._rank) is waiter):
+                    self._cond.wait()
+            finally:
+                self._waiters.remove(waiter)
+            self.processes += 1
+            self.threads += threads
+            self._by_chat[chat] = self._by_chat.get(chat, 0) + 1
+            self._cond.notify_all()
+        return threads
+
+    def release(self, chat, threads):
+        with self._cond:
+            self.processes -= 1
+            self.threads -= threads
+            self._by_chat[chat] -= 1
+            if not self._by_chat[chat]:
+                del self._by_chat[chat]
+            self._cond.notify_all()
+
+    def for_job(self, chat, priority=0):
+        return JobBudget(self, chat, priority)
+
+class JobBudget:
+    """
+    View of a ProcessBudget bound to one job's chat and priority; this is
+    what engines receive as their budget.
+    """
+
+    def __init__(self, budget, chat, priority=0):
+        self.budget = budget
+        self.chat = chat
+        self.priority = priority
+
+    @contextmanager
+    def slot(self, threads=1):
+        granted = self.budget.acquire(self.chat, threads, self.priority)
+        try:
+            yield
+        finally:
+            self.budget.release(self.chat, granted)
+
+class ChainedBudget:
+    """
+    Take a slot in each of several budgets in turn, e.g. a bulk job's own
+    process pool and then the launcher-wide cap. None entries are skipped.
+    """
+
+    def __init__(self, *budgets):
+        self.budgets = [budget for budget in budgets if budget is not None]
+
+    @contextmanager
+    def slot(self, threads=1):
+        with ExitStack() as stack:
+            for budget in self.budgets:
+                stack.enter_context(budget.slot(threads))
+            yield
+
+# ==============================================================================
+# Scheduler
+# ==============================================================================
+
+class Scheduler:
+    """
+    Run queued jobs from a JobStore, at most max_jobs at a time.
+
+    engine_factory(mode, config) must return an engine (see tdl_engine);
+    the scheduler attaches the shared budget to it before run(). A queued
+    job waits while a running job shares one of its chats (every chat of
+    a bulk job counts), since both would work on the same processed index
+    and checkpoint; among the others the highest priority wins, then the
+    oldest. on_finish(job) is called from the job's worker thread after
+    its status is saved.
+    """
+
+    def __init__(self, store, engine_factory, max_jobs=DEFAULT_MAX_JOBS,
+                 budget=None, on_finish=None, poll_interval=1.0):
+        self.store = store
+        self.engine_factory = engine_factory
+        self.max_jobs = max(1, int(max_jobs))
+        self.budget = budget or ProcessBudget()
+        self.on_finish = on_finish
+        self.poll_interval = poll_interval
+        self.running = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+        # job id -> thread running it, joined by stop(timeout=...)
+        self._job_threads = {}
+        # job id -> chats of the running job
+        self._job_chats = {}
+
+    def _running_chats(self):
+        return set().union(*self._job_chats.values())
+
+    def _next_job(self):
+        busy = self._running_chats()
+        queued = [j for j in self.store.list()
+                  if j['status'] == STATUS_QUEUED and j['id'] not in self.running
+                  and not job_chats(j) & busy]
+        if not queued:
+            return None
+        return min(queued, key=lambda j: (-j['priority'], j['created']))
+
+    def _run_job(self, job, engine):
+        # the job file may be gone (removed meanwhile): update() returns None
+        job_id = job['id']
+        try:
+            stats = engine.run()
+            status = STATUS_CANCELLED if engine.stopped else STATUS_DONE
+            job = self.store.update(job_id, status=status, stats=stats, finished=time.time())
+        except Exception as e:
+            job = self.store.update(job_id, status=STATUS_FAILED, error=str(e), finished=time.time())
+        finally:
+            with self._lock:
+                self.running.pop(job_id, None)
+                self._job_threads.pop(job_id, None)
+                self._job_chats.pop(job_id, None)
+            self._wake.set()
+        if self.on_finish and job:
+            self.on_finish(job)
+
+    def _start_job(self, job):
+        try:
+            config = job_config(job)
+            engine = self.engine_factory(job['mode'], config)
+        except Exception as e:
+            self.store.update(job['id'], status=STATUS_FAILED, error=str(e), finished=time.time())
+            if self.on_finish:
+                self.on_finish(self.store.get(job['id']))
+            return
+        engine.budget = self.budget.for_job(engine.chat, job['priority'])
+        chats = job_chats(job) or {engine.chat.lower()}
+        job = self.store.update(job['id'], status=STATUS_RUNNING, started=time.time(), chat=engine.chat)
+        thread = threading.Thread(target=self._run_job, args=(job, engine), daemon=True)
+        with self._lock:
+            self.running[job['id']] = engine
+            self._job_chats[job['id']] = chats
+            self._job_threads[job['id']] = thread
+        thread.start()
+
+    def schedule(self):
+        """
+        Start queued jobs while there are free job slots.
+        Returns number of jobs started.
+        """
+        started = 0
+        while not self._stop.is_set():
+            with self._lock:
+                if len(self.running) >= self.max_jobs:
+                    break
+                job = self._next_job()
+            if job is None:
+                break
+            self._start_job(job)
+            started += 1
+        return started
+
+    def cancel(self, job_id, kill=False):
+        """
+        Cancel a queued job or stop a running one; with kill its running
+        tdl processes are terminated too.
+        """
+        with self._lock:
+            engine = self.running.get(job_id)
+        if engine:
+            engine.stop(kill=kill)
+            return True
+        job = self.store.get(job_id)
+        if job and job['status'] == STATUS_QUEUED:
+            self.store.update(job_id, status=STATUS_CANCELLED, finished=time.time())
+            return True
+        return False
+
+    def pause(self, job_id):
+        """
+        Pause a running job: it starts no new tdl processes until resumed.
+        """
+        with self._lock:
+            engine = self.running.get(job_id)
+        if engine is None:
+            return False
+        engine.pause()
+        return True
+
+    def resume(self, job_id):
+        with self._lock:
+            engine = self.running.get(job_id)
+        if engine is None:
+            return False
+        engine.resume()
+        return True
+
+    def wake(self):
+        """
+        Look for new jobs now instead of at the next poll.
+        """
+        self._wake.set()
+
+    def _loop(self, until_empty):
+        self.store.recover()
+        while not self._stop.is_set():
+            self.schedule()
+            with self._lock:
+                idle = not self.running
+            if until_empty and idle and self._next_job() is None:
+                return
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def run_until_empty(self):
+        """
+        Block until every queued job has finished.
+        """
+        self._loop(until_empty=True)
+
+    def start(self):
+        """
+        Keep scheduling in a background thread until stop().
+        """
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, args=(False,), daemon=True)
+            self._thread.start()
+
+    def stop(self, kill=False, timeout=None):
+        """
+        Stop scheduling and every running job; with kill their tdl
+        processes are terminated. With timeout, wait up to that many
+        seconds for the jobs to save their state and end.
+        """
+        self._stop.set()
+        self._wake.set()
+        with self._lock:
+            engines = list(self.running.values())
+            threads = list(self._job_threads.values())
+        for engine in engines:
+            engine.stop(kill=kill)
+        if timeout is not None:
+            deadline = time.monotonic() + timeout
+            for thread in threads:
+                thread.join(max(0, deadline - time.monotonic()))
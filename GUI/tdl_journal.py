@@ -0,0 +1,131 @@
+"""
+Append-only binary journal for TDL Easy state.
+
+Each update is one fixed-width record (op, start, end, crc32). Appends
+only go to an in-memory batch; a background flusher writes the batch and
+fsyncs it every sync_interval seconds or once batch_size records are
+waiting, so the download loop never waits for the disk. On startup
+replay() yields the records back and cuts off a torn or corrupt tail
+left by a crash.
+"""
+import os
+import struct
+import threading
+import zlib
+
+# op (uint8), 3 pad bytes, start, end, crc32 of the first 12 bytes
+RECORD = struct.Struct('<BxxxIII')
+_BODY = struct.Struct('<BxxxII')
+
+OP_ADD = 1
+
+DEFAULT_SYNC_INTERVAL = 0.5
+DEFAULT_BATCH_SIZE = 8192
+
+def pack_record(op, start, end):
+    body = _BODY.pack(op, start, end)
+    return body + struct.pack('<I', zlib.crc32(body))
+
+class Journal:
+    """
+    Batched, fsync'ed append-only record file.
+    """
+
+    def __init__(self, path, sync_interval=DEFAULT_SYNC_INTERVAL, batch_size=DEFAULT_BATCH_SIZE):
+        self.path = path
+        self.sync_interval = sync_interval
+        self.batch_size = batch_size
+        # records on disk plus records waiting in the batch
+        self.records = 0
+        self._pending = []
+        self._fh = None
+        self._lock = threading.Lock()
+        self._io_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = threading.Event()
+        self._flusher = None
+
+    def replay(self):
+        """
+        Yield (op, start, end) for every intact record on disk.
+        """
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        good = 0
+        for offset in range(0, len(data) - RECORD.size + 1, RECORD.size):
+            op, start, end, crc = RECORD.unpack_from(data, offset)
+            if zlib.crc32(data[offset:offset + _BODY.size]) != crc:
+                break
+            good = offset + RECORD.size
+            yield op, start, end
+        self.records = good // RECORD.size
+        if good != len(data):
+            # drop a torn or corrupt tail left by a crash
+            with open(self.path, 'r+b') as f:
+                f.truncate(good)
+
+    def append(self, op, start, end):
+        with self._lock:
+            self._pending.append(pack_record(op, start, end))
+            self.records += 1
+            full = len(self._pending) >= self.batch_size
+            if self._flusher is None:
+                self._closed.clear()
+                self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+                self._flusher.start()
+        if full:
+            self._wake.set()
+
+    def _flush_loop(self):
+        while not self._closed.is_set():
+            self._wake.wait(self.sync_interval)
+            self._wake.clear()
+            self.sync()
+
+    def sync(self):
+        """
+        Write the pending batch and fsync it.
+        """
+        with self._io_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return
+            if self._fh is None:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                self._fh = open(self.path, 'ab')
+            self._fh.write(b''.join(batch))
+            self._fh.flush()
+            os.fsync(self._fh.fileno())
+
+    def reset(self):
+        """
+        Empty the journal after its records were checkpointed elsewhere.
+        """
+        with self._io_lock:
+            with self._lock:
+                self._pending = []
+                self.records = 0
+            if self._fh is not None:
+                self._fh.close()
+                self._fh = None
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+    def close(self):
+        """
+        Flush what is pending and stop the flusher thread.
+        """
+        with self._lock:
+            flusher, self._flusher = self._flusher, None
+        if flusher is not None:
+            self._closed.set()
+            self._wake.set()
+            flusher.join()
+        self.sync()
+        with self._io_lock:
+            if self._fh is not None:
+                self._fh.close()
+                self._fh = None
@@ -0,0 +1,205 @@
+"""
+Telegram message link helpers for TDL Easy.
+
+Every launcher mode reads links through the one model here, TelegramLink,
+so the GUI, the CLI and the engines accept and reject the same URLs:
+
+    https://t.me/username/1234
+    https://t.me/c/12345678/1234
+    https://t.me/c/12345678/166/1234   (message 1234 in topic 166)
+
+Usernames follow Telegram's rule: 5-32 letters, digits or underscores,
+starting with a letter. A trailing slash or query (?single) is ignored.
+
+Kept free of tkinter so the headless CLI and the engines can use them.
+"""
+import contextlib
+import functools
+import gc
+import re
+from dataclasses import dataclass
+from typing import Optional
+
+_USERNAME = r'[A-Za-z][A-Za-z0-9_]{4,31}'
+# groups: private chat ID, topic ID, username
+_CHAT = r'(?:c/(\d+)(?:/(\d+))?|(' + _USERNAME + r'))'
+# a message link; the last group is the message ID
+LINK_RE = re.compile(r'https?://t\.me/' + _CHAT + r'/(\d+)/?(?:\?[^\s#]*)?')
+# a chat (or topic) base URL as the range mode takes it
+BASE_RE = re.compile(r'https?://t\.me/' + _CHAT + r'/')
+# separators between links in a paste, a text file or CSV cells
+_SEPARATORS = r'\s,;"\'<>()\[\]'
+# a message link in a paste, where the scheme may be left out
+_TOKEN = r'(?:https?://)?t\.me/' + _CHAT + r'/(\d+)/?(?:\?[^\s#' + _SEPARATORS[2:] + r']*)?'
+# every t.me token of a whole text in one pass: a link's groups, or the
+# last group for a token that is not a link
+_SCAN_RE = re.compile('(?<![^' + _SEPARATORS + '])(?:' + _TOKEN + '(?![^' + _SEPARATORS + '])'
+                      '|([^' + _SEPARATORS + r']*t\.me/[^' + _SEPARATORS + ']*))')
+
+PARSE_CACHE_SIZE = 4096
+
+@dataclass(frozen=True)
+class TelegramLink:
+    """
+    A Telegram chat, topic or message. chat is the numeric ID of a
+    private chat or a username as written; topic and message are None
+    when the link does not name one.
+    """
+    __slots__ = ('chat', 'topic', 'message')
+    chat: str
+    topic: Optional[int]
+    message: Optional[int]
+
+    @property
+    def is_private(self):
+        return self.chat.isdigit()
+
+    @property
+    def base_url(self):
+        """
+        Base URL of the whole chat. Message IDs are unique per chat, so
+        tdl accepts it with topic messages too.
+        """
+        if self.is_private:
+            return f"https://t.me/c/{self.chat}/"
+        return f"https://t.me/{self.chat}/"
+
+    @property
+    def topic_base_url(self):
+        """
+        Base URL including the topic segment, if any.
+        """
+        if self.topic is None:
+            return self.base_url
+        return f"{self.base_url}{self.topic}/"
+
+    @property
+    def url(self):
+        """
+        Canonical message link (without the topic), or the base URL.
+        """
+        if self.message is None:
+            return self.topic_base_url
+        return f"{self.base_url}{self.message}"
+
+    @property
+    def key(self):
+        """
+        (chat, message) identity: usernames are case-insensitive and a
+        message is the same with or without its topic.
+        """
+        return self.chat.lower(), self.message
+
+def _from_groups(private, topic, username, message=None):
+    return TelegramLink(private or username, int(topic) if topic else None,
+                        int(message) if message else None)
+
+@functools.lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_link(url):
+    """
+    Return the TelegramLink of a message URL, or None.
+    """
+    m = LINK_RE.fullmatch(url)
+    return _from_groups(*m.groups()) if m else None
+
+@functools.lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_base_url(url):
+    """
+    Return the TelegramLink (message None) of a base URL such as
+    https://t.me/c/12345678/ or https://t.me/username/, or None.
+    """
+    m = BASE_RE.fullmatch(url)
+    return _from_groups(*m.groups()) if m else None
+
+def extract_message_id_from_url(url):
+    """
+    Extract message ID from Telegram URL, or None.
+    """
+    link = parse_link(url)
+    return link.message if link else None
+
+def extract_base_url_from_message_url(url):
+    """
+    Extract base URL (with the topic segment, if any) from message URL.
+    """
+    link = parse_link(url)
+    return link.topic_base_url if link else None
+
+def chat_link_base(url):
+    """
+    Return the chat's base URL for a message link, without a topic
+    segment, or None.
+    """
+    link = parse_link(url)
+    return link.base_url if link else None
+
+@contextlib.contextmanager
+def _gc_paused():
+    """
+    Hold off the cyclic garbage collector while building many small
+    objects that cannot form cycles; its passes over a million new
+    links would take longer than parsing them.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+def parse_links(text):
+    """
+    Find message links in a paste, text file or CSV text.
+
+    Returns (links, invalid, duplicates): links is a list of TelegramLink
+    in first-seen order, invalid lists the t.me tokens that are not
+    message links, and duplicates counts links seen more than once (also
+    across topic and plain forms and username case).
+
+    Built for big imports: one compiled pattern finds and splits every
+    t.me token of the text in a single pass, so a million-line file
+    takes seconds. It bypasses parse_link()'s cache, which would only
+    churn on that many distinct links.
+    """
+    links = []
+    invalid = []
+    seen = set()
+    # usernames are case-insensitive: keep the first spelling of each chat
+    chats = {}
+    duplicates = 0
+    with _gc_paused():
+        for private, topic, username, message, other in _SCAN_RE.findall(text or ''):
+            if other:
+                invalid.append(other)
+                continue
+            chat = private or chats.setdefault(username.lower(), username)
+            message = int(message)
+            if (chat, message) in seen:
+                duplicates += 1
+                continue
+            seen.add((chat, message))
+            links.append(TelegramLink(chat, int(topic) if topic else None, message))
+    return links, invalid, duplicates
+
+def read_links_file(path):
+    """
+    parse_links() on a text or CSV file.
+    """
+    with open(path, 'r', encoding='utf-8-sig', errors='replace') as f:
+        return parse_links(f.read())
+
+def group_links(links):
+    """
+    Group message links by chat: {chat base URL: [IDs sorted]}, spelled
+    as the first link of each chat.
+    """
+    groups = {}
+    bases = {}
+    for link in links:
+        chat = link.chat.lower()
+        if chat not in groups:
+            groups[chat] = set()
+            bases[chat] = link.base_url
+        groups[chat].add(link.message)
+    return {bases[chat]: sorted(ids) for chat, ids in groups.items()}
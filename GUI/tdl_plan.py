@@ -0,0 +1,203 @@
+"""
+Pre-flight planning for TDL Easy range jobs.
+
+A range job used to hand every ID between startId and endId to tdl,
+including service messages, deleted posts and text-only posts, which
+only showed up later as "Failed to download index". Planning exports the
+range first (`tdl chat export -T id --raw`) and builds a Manifest of the
+media-bearing message IDs with their sizes, so the engine queues only
+real downloads, in the chosen order, and can report the byte total and an
+ETA before any tdl download starts. The manifest also keeps each
+message's document or photo ID, so dedup can link known files instead
+of queueing them.
+"""
+import json
+import os
+
+from tdl_dedup import document_key, raw_field
+from tdl_export import ExportReader, start_export
+from tdl_index import write_json_atomic
+
+ORDER_ID = 'id'
+ORDER_LARGEST = 'largest'
+ORDER_SMALLEST = 'smallest'
+ORDERS = (ORDER_ID, ORDER_LARGEST, ORDER_SMALLEST)
+
+# intervals closer than this many IDs are exported together; one export
+# of a short gap costs less than another tdl start
+PLAN_MERGE_GAP = 1000
+
+def media_size(msg):
+    """
+    Return the byte size of the message's document or largest photo
+    size from its raw struct, or None if unknown.
+    """
+    media = raw_field(msg.get('raw'), 'media')
+    size = raw_field(raw_field(media, 'document'), 'size')
+    if isinstance(size, int):
+        return size
+    best = None
+    for photo_size in raw_field(raw_field(media, 'photo'), 'sizes') or ():
+        size = raw_field(photo_size, 'size')
+        if not isinstance(size, int):
+            # progressive photo sizes list every step; the last is the full one
+            steps = raw_field(photo_size, 'sizes')
+            size = steps[-1] if isinstance(steps, list) and steps else None
+        if isinstance(size, int) and (best is None or size > best):
+            best = size
+    return best
+
+class Manifest:
+    """
+    Media messages of a planned range: [(msg_id, size or None), ...],
+    plus keys ({msg_id: document key}) and the chat_id of the export.
+    """
+
+    def __init__(self, entries=(), start_id=None, end_id=None, keys=None, chat_id=None):
+        self.entries = sorted(entries)
+        self.start_id = start_id
+        self.end_id = end_id
+        self.keys = keys or {}
+        self.chat_id = chat_id
+
+    def __len__(self):
+        return len(self.entries)
+
+    def ids(self):
+        return {msg_id for msg_id, _size in self.entries}
+
+    @property
+    def total_bytes(self):
+        return sum(size for _id, size in self.entries if size)
+
+    @property
+    def unknown_sizes(self):
+        return sum(1 for _id, size in self.entries if size is None)
+
+    def ordered(self, order=ORDER_ID, skip=()):
+        """
+        Return message IDs in download order, leaving out IDs in any of
+        the skip containers. Unknown sizes count as 0.
+        """
+        entries = [e for e in self.entries if not any(e[0] in ids for ids in skip)]
+        if order == ORDER_LARGEST:
+            entries.sort(key=lambda e: (-(e[1] or 0), e[0]))
+        elif order == ORDER_SMALLEST:
+            entries.sort(key=lambda e: (e[1] or 0, e[0]))
+        return [msg_id for msg_id, _size in entries]
+
+    def size_of(self, msg_ids):
+        sizes = dict(self.entries)
+        return sum(sizes.get(msg_id) or 0 for msg_id in msg_ids)
+
+    def save(self, path):
+        """
+        Write the manifest as JSON through a temp file and atomic rename.
+        """
+        write_json_atomic(path, {'start_id': self.start_id, 'end_id': self.end_id,
+                                 'total_bytes': self.total_bytes, 'messages': self.entries},
+                          separators=(',', ':'))
+
+def build_manifest(messages, start_id=None, end_id=None):
+    """
+    Build a Manifest from export messages, keeping those with a file.
+    """
+    entries = []
+    keys = {}
+    for msg in messages:
+        msg_id = msg.get('id')
+        if not isinstance(msg_id, int) or not msg.get('file'):
+            continue
+        if start_id is not None and not start_id <= msg_id <= end_id:
+            continue
+        entries.append((msg_id, media_size(msg)))
+        key = document_key(msg)
+        if key:
+            keys[msg_id] = key
+    return Manifest(entries, start_id, end_id, keys)
+
+def export_range(tdl_exe, chat, start_id, end_id, export_file, cwd=None, log_file=None):
+    """
+    Export messages start_id..end_id of chat with raw structs; returns
+    the tdl exit code.
+    """
+    os.makedirs(os.path.dirname(export_file), exist_ok=True)
+    proc = start_export(tdl_exe, chat, export_file, cwd=cwd, log_file=log_file,
+                        with_content=False,
+                        extra_args=('-T', 'id', '-i', f"{start_id},{end_id}", '--raw'))
+    return proc.wait()
+
+def plan_range(tdl_exe, chat, start_id, end_id, export_file, cwd=None, log_file=None):
+    """
+    Export the range and return its Manifest, or None if the export failed.
+    """
+    code = export_range(tdl_exe, chat, start_id, end_id, export_file, cwd, log_file)
+    if code != 0 or not os.path.exists(export_file):
+        return None
+    try:
+        reader = ExportReader(export_file)
+        manifest = build_manifest(reader, start_id, end_id)
+        manifest.chat_id = reader.chat_id
+        return manifest
+    finally:
+        os.remove(export_file)
+
+def export_spans(intervals, gap=PLAN_MERGE_GAP):
+    """
+    Return the (start, end) spans to export for sorted intervals: each
+    interval, with those less than gap IDs apart joined into one span.
+    """
+    spans = []
+    for start, end in intervals:
+        if spans and start - spans[-1][1] <= gap:
+            spans[-1] = (spans[-1][0], max(spans[-1][1], end))
+        else:
+            spans.append((start, end))
+    return spans
+
+def plan_intervals(tdl_exe, chat, intervals, export_file, cwd=None, log_file=None):
+    """
+    plan_range() for each export span of sorted intervals, merged into
+    one Manifest; None if any export failed. Messages in the short gaps
+    joined into a span are included.
+    """
+    intervals = list(intervals)
+    entries = []
+    keys = {}
+    chat_id = None
+    for start, end in export_spans(intervals):
+        manifest = plan_range(tdl_exe, chat, start, end, export_file, cwd, log_file)
+        if manifest is None:
+            return None
+        entries += manifest.entries
+        keys.update(manifest.keys)
+        chat_id = chat_id or manifest.chat_id
+    if not intervals:
+        return Manifest()
+    return Manifest(entries, intervals[0][0], intervals[-1][1], keys, chat_id)
+
+def previous_rate(metrics_path):
+    """
+    Return (bytes/s, files/s) averaged over the run recorded in a
+    metrics file, or (0, 0) if there is none.
+    """
+    try:
+        with open(metrics_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        elapsed = float(data.get('elapsed') or 0)
+        if elapsed <= 0:
+            return 0, 0
+        return data.get('bytes', 0) / elapsed, data.get('downloaded', 0) / elapsed
+    except (OSError, ValueError, TypeError, AttributeError):
+        return 0, 0
+
+def estimate_seconds(total_bytes, count, rate):
+    """
+    Estimate download time from (bytes/s, files/s); None without a rate.
+    """
+    bytes_per_s, files_per_s = rate
+    if total_bytes and bytes_per_s:
+        return total_bytes / bytes_per_s
+    if count and files_per_s:
+        return count / files_per_s
+    return None
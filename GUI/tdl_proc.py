@@ -0,0 +1,256 @@
+"""
+asyncio process manager for tdl invocations.
+
+Every tdl download the engines start goes through one ProcessManager per
+launcher process. It runs an asyncio event loop on a background thread,
+starts tdl with create_subprocess_exec under a semaphore that bounds how
+many run at once, and streams the merged stdout/stderr through a
+LineSplitter into the caller's parser callback as it arrives. Only a tail
+of the output is kept (the last lines plus every error or FLOOD_WAIT
+line), never the whole of it. Each invocation ends in a ProcessResult
+with exit code and wall time, and can be cancelled from any thread: tdl
+gets terminate() and, after a grace period, kill().
+
+Engines stay thread based; a worker thread calls start() and waits on
+the returned handle.
+"""
+import asyncio
+import collections
+import re
+import subprocess
+import threading
+import time
+
+from tdl_progress import LineSplitter
+
+# tdl processes running at once across all engines of the launcher
+DEFAULT_MAX_PROCESSES = 32
+# output lines kept per invocation besides the error lines
+DEFAULT_TAIL_LINES = 200
+# seconds a cancelled tdl gets to exit after terminate() before kill()
+TERMINATE_GRACE = 5.0
+
+_READ_SIZE = 1 << 16
+# lines kept even when they scroll out of the tail: what error_reason()
+# and parse_flood_wait() look for
+_KEEP_RE = re.compile(r'rror|FLOOD|flood wait|wait of \d+ seconds|rate limit|too many requests',
+                      re.IGNORECASE)
+
+class OutputTail:
+    """
+    Bounded record of a process's output lines: the last `limit` lines
+    plus up to `limit` earlier lines that look like errors.
+    """
+
+    def __init__(self, limit=DEFAULT_TAIL_LINES):
+        self._tail = collections.deque(maxlen=limit)
+        self._kept = collections.deque(maxlen=limit)
+        self.lines = 0
+
+    def add(self, line):
+        if len(self._tail) == self._tail.maxlen and _KEEP_RE.search(self._tail[0]):
+            self._kept.append(self._tail[0])
+        self._tail.append(line)
+        self.lines += 1
+
+    def text(self):
+        return '\n'.join(list(self._kept) + list(self._tail))
+
+class ProcessResult:
+    """
+    Outcome of one tdl invocation.
+
+    returncode is None when the process never started (cancelled while
+    waiting for the semaphore). wall is seconds from spawn to exit, lines
+    the number of output lines seen, output the kept tail.
+    """
+
+    def __init__(self, cmd, returncode, wall, output='', lines=0, cancelled=False):
+        self.cmd = cmd
+        self.returncode = returncode
+        self.wall = wall
+        self.output = output
+        self.lines = lines
+        self.cancelled = cancelled
+
+class ProcessHandle:
+    """
+    A tdl invocation submitted to a ProcessManager. Has the pid, poll()
+    and kill() that the stall supervisor uses on a Popen, plus cancel()
+    and result().
+    """
+
+    def __init__(self, manager, cmd):
+        self.cmd = cmd
+        self.pid = None
+        self.returncode = None
+        # set once tdl is spawned, or once the invocation ends without it
+        self.started = threading.Event()
+        self._manager = manager
+        self._proc = None
+        self._task = None
+        self._cancel_requested = False
+        self._future = None
+
+    def poll(self):
+        return self.returncode
+
+    def kill(self):
+        """
+        Kill the running process (thread-safe); a no-op before spawn.
+        """
+        self._manager._call(self._signal, 'kill')
+
+    def cancel(self):
+        """
+        Terminate the process, or drop the invocation if it has not started.
+        """
+        self._manager._call(self._cancel_in_loop)
+
+    def result(self, timeout=None):
+        """
+        Wait for the invocation to end and return its ProcessResult.
+        """
+        return self._future.result(timeout)
+
+    def _signal(self, name):
+        if self._proc is not None and self._proc.returncode is None:
+            try:
+                getattr(self._proc, name)()
+            except ProcessLookupError:
+                pass
+
+    def _cancel_in_loop(self):
+        self._cancel_requested = True
+        if self._task is not None:
+            self._task.cancel()
+
+class ProcessManager:
+    """
+    Start tdl processes on a private asyncio loop, at most max_processes
+    at a time.
+    """
+
+    def __init__(self, max_processes=DEFAULT_MAX_PROCESSES, tail_lines=DEFAULT_TAIL_LINES):
+        self.max_processes = max(1, int(max_processes))
+        self.tail_lines = tail_lines
+        self._loop = None
+        self._semaphore = None
+        self._lock = threading.Lock()
+
+    def _ensure_loop(self):
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                ready = threading.Event()
+
+                def run():
+                    asyncio.set_event_loop(loop)
+                    self._semaphore = asyncio.Semaphore(self.max_processes)
+                    loop.call_soon(ready.set)
+                    loop.run_forever()
+
+                threading.Thread(target=run, name='tdl-processes', daemon=True).start()
+                ready.wait()
+                self._loop = loop
+            return self._loop
+
+    def _call(self, func, *args):
+        self._ensure_loop().call_soon_threadsafe(func, *args)
+
+    def start(self, cmd, cwd=None, on_line=None, stdin_data=None):
+        """
+        Submit cmd and return its ProcessHandle right away. on_line(line)
+        is called on the manager's loop thread for every output line,
+        including progress bar redraws, so it must be quick.
+        """
+        handle = ProcessHandle(self, list(cmd))
+        handle._future = asyncio.run_coroutine_threadsafe(
+            self._run(handle, cwd, on_line, stdin_data), self._ensure_loop())
+        return handle
+
+    def run(self, cmd, cwd=None, on_line=None, stdin_data=None):
+        """
+        Run cmd to completion and return its ProcessResult.
+        """
+        return self.start(cmd, cwd, on_line, stdin_data).result()
+
+    async def _run(self, handle, cwd, on_line, stdin_data):
+        handle._task = asyncio.current_task()
+        try:
+            if handle._cancel_requested:
+                raise asyncio.CancelledError()
+            async with self._semaphore:
+                return await self._exec(handle, cwd, on_line, stdin_data)
+        except asyncio.CancelledError:
+            return ProcessResult(handle.cmd, None, 0.0, cancelled=True)
+        finally:
+            handle.started.set()
+
+    async def _exec(self, handle, cwd, on_line, stdin_data):
+        proc = await asyncio.create_subprocess_exec(
+            *handle.cmd, cwd=cwd,
+            stdin=subprocess.PIPE if stdin_data is not None else subprocess.DEVNULL,
+            stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        started = time.monotonic()
+        handle._proc = proc
+        handle.pid = proc.pid
+        handle.started.set()
+        tail = OutputTail(self.tail_lines)
+        cancelled = False
+        try:
+            if stdin_data is not None:
+                try:
+                    proc.stdin.write(stdin_data)
+                    await proc.stdin.drain()
+                    proc.stdin.close()
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+            splitter = LineSplitter()
+            while True:
+                data = await proc.stdout.read(_READ_SIZE)
+                if not data:
+                    break
+                for line in splitter.feed(data):
+                    tail.add(line)
+                    if on_line:
+                        on_line(line)
+            for line in splitter.close():
+                tail.add(line)
+                if on_line:
+                    on_line(line)
+            await proc.wait()
+        except asyncio.CancelledError:
+            cancelled = True
+            await self._terminate(proc)
+        handle.returncode = proc.returncode
+        return ProcessResult(handle.cmd, proc.returncode, time.monotonic() - started,
+                             tail.text(), tail.lines, cancelled)
+
+    async def _terminate(self, proc):
+        if proc.returncode is not None:
+            return
+        try:
+            proc.terminate()
+            await asyncio.wait_for(proc.wait(), TERMINATE_GRACE)
+        except ProcessLookupError:
+            pass
+        except asyncio.TimeoutError:
+            try:
+                proc.kill()
+            except ProcessLookupError:
+                pass
+            await proc.wait()
+
+_manager = None
+_manager_lock = threading.Lock()
+
+def default_manager():
+    """
+    Return the process-wide manager shared by every engine.
+    """
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = ProcessManager()
+        return _manager
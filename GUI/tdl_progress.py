@@ -0,0 +1,304 @@
+"""
+Live progress and throughput telemetry for TDL Easy engines.
+
+tdl output is streamed line by line through ProgressTracker.feed(), which
+picks up per-file percent and speed from tdl's progress bars. Engines
+report finished, failed and skipped messages. snapshot() turns all of
+that into bytes/s, files/s, ETA and per-message status. The snapshot is
+also written to a JSON metrics file so runs with different downloadLimit
+and threads values can be compared. feed() runs on the process manager's
+event loop, so the periodic writes happen on a short-lived thread of
+their own, never on the caller's.
+"""
+import codecs
+import collections
+import json
+import os
+import re
+import threading
+import time
+
+from tdl_scanner import MESSAGE_FILE_RE
+
+# completions older than this many seconds drop out of the rate window
+DEFAULT_RATE_WINDOW = 30.0
+# metrics file is rewritten at most this often
+DEFAULT_WRITE_INTERVAL = 1.0
+# a parsed progress bar without updates for this long is considered gone
+ACTIVE_TIMEOUT = 10.0
+RECENT_EVENTS = 20
+
+_ANSI_RE = re.compile(r'\x1b\[[0-9;?]*[A-Za-z]')
+_PERCENT_RE = re.compile(r'(\d{1,3}(?:\.\d+)?)\s*%')
+_SPEED_RE = re.compile(r'(\d+(?:\.\d+)?)\s*([KMGT]?i?B)/s', re.IGNORECASE)
+_FLOOD_RE = re.compile(r'FLOOD_WAIT|flood wait', re.IGNORECASE)
+_UNITS = {'': 1, 'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30, 'T': 1 << 40}
+
+def parse_size(number, unit):
+    """
+    Convert '1.5', 'MiB' (or 'MB') into bytes; tdl uses binary units.
+    """
+    return int(float(number) * _UNITS[unit[:-1].rstrip('iI').upper()])
+
+def format_size(value):
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if value < 1024:
+            return f"{value:.1f} {unit}" if unit != 'B' else f"{int(value)} B"
+        value /= 1024
+    return f"{value:.1f} TB"
+
+def format_duration(seconds):
+    if seconds is None:
+        return '--:--'
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    if hours:
+        return f"{hours}:{rest // 60:02d}:{rest % 60:02d}"
+    return f"{rest // 60:02d}:{rest % 60:02d}"
+
+class LineSplitter:
+    """
+    Split a byte stream into lines on \\n and on the \\r that progress
+    bars use to redraw themselves.
+    """
+
+    def __init__(self, encoding='utf-8'):
+        self._decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+        self._partial = ''
+
+    def feed(self, data):
+        text = self._partial + self._decoder.decode(data)
+        parts = re.split(r'[\r\n]', text)
+        self._partial = parts.pop()
+        return [p for p in parts if p.strip()]
+
+    def close(self):
+        rest = self._partial + self._decoder.decode(b'', final=True)
+        self._partial = ''
+        return [rest] if rest.strip() else []
+
+class ProgressTracker:
+    """
+    Thread-safe progress counters for one engine run.
+
+    total grows as work is discovered (range size, exported shards). Rates
+    come from a sliding window of finished messages; while tdl is still in
+    the middle of large files, the speeds parsed from its progress bars
+    are used instead.
+    """
+
+    def __init__(self, metrics_path=None, window=DEFAULT_RATE_WINDOW,
+                 write_interval=DEFAULT_WRITE_INTERVAL):
+        self.metrics_path = metrics_path
+        self.window = window
+        self.write_interval = write_interval
+        self.started = time.time()
+        self.total = 0
+        # bytes of planned work, when the engine knows file sizes up front
+        self.total_bytes = 0
+        self.downloaded = 0
+        self.failed = 0
+        self.skipped = 0
+        self.bytes = 0
+        self.flood_waits = 0
+        # tdl processes started, messages handed to them, and the seconds
+        # from each start to its first progress line (session load, connect)
+        self.spawns = 0
+        self.spawn_messages = 0
+        self.startup_seconds = 0.0
+        self.startup_samples = 0
+        self.last_error = None
+        # msg_id -> dict(percent, speed, updated) for files tdl is working on
+        self.active = {}
+        self.recent = collections.deque(maxlen=RECENT_EVENTS)
+        self._samples = collections.deque()
+        self._lock = threading.Lock()
+        self._written = 0.0
+        self._writing = False
+        # serializes metrics file writes; extra fields stay in later writes
+        self._file_lock = threading.Lock()
+        self._extra = {}
+
+    def add_total(self, count, size=0):
+        with self._lock:
+            self.total += count
+            self.total_bytes += size
+
+    def feed(self, line):
+        """
+        Parse one line of tdl output.
+        """
+        line = _ANSI_RE.sub('', line).strip()
+        if not line:
+            return
+        now = time.time()
+        with self._lock:
+            if line.lower().startswith('error'):
+                self.last_error = line
+            if _FLOOD_RE.search(line):
+                self.flood_waits += 1
+                self.last_error = line
+            m = MESSAGE_FILE_RE.search(line)
+            if not m:
+                return
+            msg_id = int(m.group(1))
+            percent = _PERCENT_RE.search(line)
+            speed = _SPEED_RE.search(line)
+            if percent and float(percent.group(1)) >= 100:
+                self.active.pop(msg_id, None)
+                return
+            entry = self.active.setdefault(msg_id, {'percent': 0.0, 'speed': 0})
+            if percent:
+                entry['percent'] = float(percent.group(1))
+            if speed:
+                entry['speed'] = parse_size(speed.group(1), speed.group(2))
+            entry['updated'] = now
+        self._maybe_write()
+
+    def _event(self, msg_id, status):
+        self.active.pop(msg_id, None)
+        self.recent.append({'id': msg_id, 'status': status, 'time': time.time()})
+
+    def message_done(self, msg_id, size=0):
+        now = time.time()
+        with self._lock:
+            self.downloaded += 1
+            self.bytes += size
+            self._samples.append((now, size))
+            self._event(msg_id, 'done')
+        self._maybe_write()
+
+    def message_failed(self, msg_id):
+        with self._lock:
+            self.failed += 1
+            self._event(msg_id, 'failed')
+        self._maybe_write()
+
+    def spawned(self, messages, startup=None):
+        """
+        Record one tdl process for `messages` messages that took `startup`
+        seconds to show progress (None if it never did).
+        """
+        with self._lock:
+            self.spawns += 1
+            self.spawn_messages += messages
+            if startup is not None:
+                self.startup_seconds += startup
+                self.startup_samples += 1
+
+    def message_skipped(self, count=1):
+        with self._lock:
+            self.skipped += count
+
+    def snapshot(self):
+        """
+        Return current progress as a plain dict.
+        """
+        now = time.time()
+        with self._lock:
+            while self._samples and self._samples[0][0] < now - self.window:
+                self._samples.popleft()
+            for msg_id in [i for i, a in self.active.items() if a['updated'] < now - ACTIVE_TIMEOUT]:
+                del self.active[msg_id]
+            elapsed = now - self.started
+            span = min(self.window, elapsed) or 1e-9
+            files_per_s = len(self._samples) / span
+            bytes_per_s = sum(size for _t, size in self._samples) / span
+            live_speed = sum(a['speed'] for a in self.active.values())
+            if live_speed > bytes_per_s:
+                bytes_per_s = live_speed
+            if not files_per_s and self.downloaded and elapsed:
+                files_per_s = self.downloaded / elapsed
+            remaining = max(0, self.total - self.downloaded - self.failed)
+            if self.total_bytes and bytes_per_s:
+                eta = max(0, self.total_bytes - self.bytes) / bytes_per_s
+            else:
+                eta = remaining / files_per_s if files_per_s else None
+            return {
+                'time': now,
+                'elapsed': elapsed,
+                'total': self.total,
+                'downloaded': self.downloaded,
+                'failed': self.failed,
+                'skipped': self.skipped,
+                'remaining': remaining,
+                'bytes': self.bytes,
+                'total_bytes': self.total_bytes,
+                'flood_waits': self.flood_waits,
+                'spawns': self.spawns,
+                'spawn_messages': self.spawn_messages,
+                'avg_startup': (self.startup_seconds / self.startup_samples
+                                if self.startup_samples else None),
+                'bytes_per_s': bytes_per_s,
+                'files_per_s': files_per_s,
+                'eta': eta,
+                'active': {str(i): a['percent'] for i, a in self.active.items()},
+                'recent': list(self.recent),
+                'last_error': self.last_error,
+            }
+
+    def _maybe_write(self):
+        # at most one write per write_interval, on a thread of its own
+        if not self.metrics_path:
+            return
+        now = time.time()
+        with self._lock:
+            if self._writing or now - self._written < self.write_interval:
+                return
+            self._written = now
+            self._writing = True
+        threading.Thread(target=self._write_due, daemon=True).start()
+
+    def _write_due(self):
+        try:
+            self.write_metrics()
+        finally:
+            with self._lock:
+                self._writing = False
+
+    def write_metrics(self, extra=None):
+        """
+        Write the snapshot (plus extra fields, kept for later writes too)
+        to the metrics file.
+        """
+        if not self.metrics_path:
+            return
+        with self._file_lock:
+            if extra:
+                self._extra.update(extra)
+            data = self.snapshot()
+            data.update(self._extra)
+            tmp = f"{self.metrics_path}.{threading.get_ident()}.tmp"
+            try:
+                os.makedirs(os.path.dirname(self.metrics_path), exist_ok=True)
+                with open(tmp, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, ensure_ascii=False, indent=2)
+                os.replace(tmp, self.metrics_path)
+            except OSError:
+                pass
+
+def format_progress(snap):
+    """
+    One-line human readable summary of a snapshot.
+    """
+    done = snap['downloaded'] + snap['failed']
+    text = (f"{done}/{snap['total']} ({snap['failed']} failed) | "
+            f"{format_size(snap['bytes_per_s'])}/s | {snap['files_per_s']:.2f} files/s | "
+            f"ETA {format_duration(snap['eta'])}")
+    if snap['active']:
+        text += f" | {len(snap['active'])} in progress"
+    return text
+
+def format_spawn_report(snap):
+    """
+    Summary of tdl process starts and the startup time batching saved.
+    """
+    spawns, messages, startup = snap['spawns'], snap['spawn_messages'], snap['avg_startup']
+    text = f"{spawns} tdl starts for {messages} messages"
+    if startup is None:
+        return text
+    text += f", {startup:.1f}s each before the first transfer"
+    saved = (messages - spawns) * startup
+    if saved > 0:
+        text += f"; batching saved about {format_duration(saved)} of startups"
+    return text
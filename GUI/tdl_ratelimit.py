@@ -0,0 +1,247 @@
+"""
+FLOOD_WAIT-aware rate limiting for tdl invocations.
+
+Telegram answers too many requests with FLOOD_WAIT_<seconds>, and tdl
+prints that wait in its output. Instead of retrying the whole range or
+chat, engines read the wait with parse_flood_wait(), park only the
+affected messages in a DelayQueue until it has passed and keep the other
+workers going. A TokenBucket per chat spaces out tdl starts, so jobs
+downloading the same chat share one budget.
+"""
+import heapq
+import itertools
+import re
+import threading
+import time
+
+# tdl process starts per second per chat, and how many may start at once
+DEFAULT_RATE = 5.0
+DEFAULT_BURST = 10
+# wait assumed when tdl reports a flood/rate limit without a number
+DEFAULT_FLOOD_WAIT = 30
+# longest time a worker sleeps before re-checking its stop flag
+_POLL = 0.5
+# marks 'no item' in DelayQueue, where None means closed
+_EMPTY = object()
+
+_FLOOD_WAIT_RES = (
+    re.compile(r'FLOOD_(?:PREMIUM_)?WAIT_(\d+)'),
+    re.compile(r'FLOOD_WAIT\s*\((\d+)\)'),
+    re.compile(r'flood wait\D{0,20}(\d+)', re.IGNORECASE),
+    re.compile(r'wait of (\d+) seconds', re.IGNORECASE),
+    re.compile(r'retry after (\d+)', re.IGNORECASE),
+)
+_RATE_LIMIT_RE = re.compile(r'FLOOD_WAIT|flood wait|wait of \d+ seconds|rate limit|too many requests',
+                            re.IGNORECASE)
+
+def parse_flood_wait(output):
+    """
+    Return seconds to wait if tdl output reports a flood/rate limit
+    (the longest wait when there are several), else None.
+    """
+    if not output or not _RATE_LIMIT_RE.search(output):
+        return None
+    waits = [int(m.group(1)) for regex in _FLOOD_WAIT_RES for m in regex.finditer(output)]
+    return max(waits) if waits else DEFAULT_FLOOD_WAIT
+
+class TokenBucket:
+    """
+    Classic token bucket: acquire() takes one token, waiting for the
+    bucket to refill at `rate` tokens per second up to `burst`.
+    """
+
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST):
+        self.rate = float(rate)
+        self.burst = max(1, int(burst))
+        self._tokens = float(self.burst)
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate)
+        self._stamp = now
+
+    def acquire(self, stop=None):
+        """
+        Take one token. Returns False if stop (an Event) got set first.
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if stop is not None:
+                if stop.wait(min(wait, _POLL)):
+                    return False
+            else:
+                time.sleep(wait)
+
+    def drain(self):
+        """
+        Drop saved-up tokens so a flood is not followed by a burst.
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self._tokens, 0.0)
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+def bucket_for(chat, rate=DEFAULT_RATE, burst=DEFAULT_BURST):
+    """
+    Return the process-wide token bucket for chat.
+    """
+    with _buckets_lock:
+        bucket = _buckets.get(chat)
+        if bucket is None:
+            bucket = _buckets[chat] = TokenBucket(rate, burst)
+        return bucket
+
+class DelayQueue:
+    """
+    Work queue whose items can be parked until a given time.
+
+    get() returns the next item that is ready, sleeping until the earliest
+    parked item is due. Ready items come out in put() order, or highest
+    priority(item) first when a priority function is given. After close(),
+    get() returns None once nothing is left, so workers can exit.
+    """
+
+    def __init__(self, items=(), priority=None):
+        # (due, seq, item) parked items and (-priority, seq, item) ready ones
+        self._delayed = []
+        self._ready = []
+        self._priority = priority
+        self._seq = itertools.count()
+        self._closed = False
+        self._cond = threading.Condition()
+        for item in items:
+            self.put(item)
+
+    def _push_ready(self, item):
+        priority = self._priority(item) if self._priority else 0
+        heapq.heappush(self._ready, (-priority, next(self._seq), item))
+
+    def put(self, item, delay=0):
+        with self._cond:
+            if delay > 0:
+                heapq.heappush(self._delayed, (time.monotonic() + delay, next(self._seq), item))
+            else:
+                self._push_ready(item)
+            self._cond.notify()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def _take(self, accept):
+        """
+        Pop the first ready item that accept() takes; _EMPTY if none.
+        """
+        rejected = []
+        found = _EMPTY
+        while self._ready:
+            entry = heapq.heappop(self._ready)
+            if accept is None or accept(entry[2]):
+                found = entry[2]
+                break
+            rejected.append(entry)
+        for entry in rejected:
+            heapq.heappush(self._ready, entry)
+        return found
+
+    def get(self, stop=None, accept=None):
+        """
+        Return the next ready item, or None once stopped or closed and
+        empty. With accept, items it returns False for are left queued
+        for other callers.
+        """
+        with self._cond:
+            while True:
+                if stop is not None and stop.is_set():
+                    return None
+                now = time.monotonic()
+                while self._delayed and self._delayed[0][0] <= now:
+                    self._push_ready(heapq.heappop(self._delayed)[2])
+                item = self._take(accept)
+                if item is not _EMPTY:
+                    return item
+                if self._closed and self._drained():
+                    return None
+                wait = _POLL
+                if self._delayed:
+                    wait = min(wait, self._delayed[0][0] - now)
+                self._cond.wait(wait)
+
+    def get_ready(self, limit, accept=None):
+        """
+        Return up to limit items that are ready now, without waiting.
+        """
+        items = []
+        with self._cond:
+            now = time.monotonic()
+            while self._delayed and self._delayed[0][0] <= now:
+                self._push_ready(heapq.heappop(self._delayed)[2])
+            while len(items) < limit:
+                item = self._take(accept)
+                if item is _EMPTY:
+                    break
+                items.append(item)
+        return items
+
+    def _drained(self):
+        return not self._ready and not self._delayed
+
+    def __len__(self):
+        with self._cond:
+            return len(self._ready) + len(self._delayed)
+
+class IntervalQueue(DelayQueue):
+    """
+    DelayQueue over a range of fresh work given as sorted, disjoint
+    (start, end) intervals, e.g. tdl_intervals.IntervalSet.intervals().
+
+    The intervals are handed out one ID at a time in ID order, so a
+    10M-ID range costs no more memory than its intervals. Items put()
+    later (retries, parked IDs) are served before the fresh ones.
+    """
+
+    def __init__(self, intervals, priority=None):
+        super().__init__(priority=priority)
+        self._spans = list(intervals)
+        self._span = 0
+        self._cursor = self._spans[0][0] if self._spans else 0
+        self._left = sum(end - start + 1 for start, end in self._spans)
+
+    def _next_fresh(self):
+        msg_id = self._cursor
+        self._left -= 1
+        if msg_id < self._spans[self._span][1]:
+            self._cursor = msg_id + 1
+        elif self._left:
+            self._span += 1
+            self._cursor = self._spans[self._span][0]
+        return msg_id
+
+    def _take(self, accept):
+        item = super()._take(accept)
+        if item is not _EMPTY or not self._left:
+            return item
+        msg_id = self._next_fresh()
+        if accept is None or accept(msg_id):
+            return msg_id
+        # not taken now: it waits with the ready items instead
+        self._push_ready(msg_id)
+        return _EMPTY
+
+    def _drained(self):
+        return super()._drained() and not self._left
+
+    def __len__(self):
+        with self._cond:
+            return len(self._ready) + len(self._delayed) + self._left
+
@@ -0,0 +1,173 @@
+"""
+Retry policy and dead-letter list for TDL Easy engines.
+
+Failed messages are retried one by one with exponential backoff instead
+of re-walking the whole range. A message that runs out of attempts goes
+to the chat's dead-letter list together with its attempt count and the
+last tdl error. Dead letters are skipped by later runs until they are
+re-queued from the launcher or with `python -m tdl_gui dead requeue`;
+re-queued IDs are remembered until a full-chat run has exported them,
+even when they lie below the chat's high-water mark.
+"""
+import json
+import os
+import random
+import re
+import threading
+import time
+
+from tdl_index import INDEX_DIR_NAME, write_json_atomic
+
+# delay before retry n is BACKOFF_BASE * 2**(n-1) seconds, at most BACKOFF_MAX
+BACKOFF_BASE = 2.0
+BACKOFF_MAX = 300.0
+# random spread so retries of a failed batch don't all start together
+BACKOFF_JITTER = 0.2
+# file key of the re-queued IDs; every other key is a message ID
+REQUEUED_KEY = 'requeued'
+
+# serializes the read-merge-write of DeadLetters.save() in this process
+_save_lock = threading.Lock()
+
+def backoff_delay(attempt, base=BACKOFF_BASE, cap=BACKOFF_MAX):
+    """
+    Seconds to wait before retrying after `attempt` failed attempts.
+    """
+    delay = min(cap, base * 2 ** max(0, attempt - 1))
+    return delay * random.uniform(1 - BACKOFF_JITTER, 1 + BACKOFF_JITTER)
+
+def error_reason(output, msg_id=None):
+    """
+    Pick the tdl error line that explains why msg_id failed.
+    """
+    lines = [line.strip() for line in (output or '').splitlines() if 'rror' in line]
+    if msg_id is not None:
+        own = re.compile(rf'\b{msg_id}\b')
+        for line in reversed(lines):
+            if own.search(line):
+                return line
+    return lines[-1] if lines else ''
+
+def dead_letters_path(media_dir, chat):
+    safe_chat = re.sub(r'[^A-Za-z0-9_-]', '_', str(chat))
+    return os.path.join(media_dir, INDEX_DIR_NAME, f"{safe_chat}.dead-letters.json")
+
+class DeadLetters:
+    """
+    Messages of one chat that failed every attempt, with details:
+    {msg_id: {'attempts': n, 'error': '...', 'time': unix time}}.
+
+    Several lists may be open on the same file at once (a running job and
+    the launcher's re-queue dialog), so save() merges this list's own
+    changes into what is on disk instead of overwriting it.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries, self._requeued = self._read()
+        # msg_id -> entry, or None for a removal, since the last save
+        self._changes = {}
+        # re-queued IDs added (True) or cleared (False) since the last save
+        self._requeued_changes = {}
+
+    @classmethod
+    def open(cls, media_dir, chat):
+        return cls(dead_letters_path(media_dir, chat))
+
+    def _read(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}, set()
+        requeued = set(data.pop(REQUEUED_KEY, None) or ())
+        return {int(k): v for k, v in data.items()}, requeued
+
+    def __contains__(self, msg_id):
+        return msg_id in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __iter__(self):
+        return iter(sorted(self._entries))
+
+    def get(self, msg_id):
+        return self._entries.get(msg_id)
+
+    def entries(self):
+        """
+        Return [(msg_id, entry), ...] sorted by message ID.
+        """
+        with self._lock:
+            return sorted(self._entries.items())
+
+    def add(self, msg_id, attempts=1, error=''):
+        with self._lock:
+            entry = {'attempts': attempts, 'error': error, 'time': time.time()}
+            self._entries[msg_id] = self._changes[msg_id] = entry
+
+    def update(self, msg_ids, attempts=1, error=''):
+        for msg_id in msg_ids:
+            self.add(msg_id, attempts, error)
+
+    def requeue(self, msg_ids=None):
+        """
+        Remove msg_ids (all when None) so the next run downloads them
+        again. Returns the removed IDs.
+        """
+        with self._lock:
+            if msg_ids is None:
+                msg_ids = sorted(self._entries)
+            removed = [i for i in msg_ids if self._entries.pop(i, None) is not None]
+            for msg_id in removed:
+                self._changes[msg_id] = None
+                self._requeued.add(msg_id)
+                self._requeued_changes[msg_id] = True
+        return removed
+
+    def requeued(self):
+        """
+        Return the sorted IDs re-queued since a full-chat run last
+        exported them.
+        """
+        with self._lock:
+            return sorted(self._requeued)
+
+    def clear_requeued(self, msg_ids):
+        """
+        Forget re-queued msg_ids once a run has exported them.
+        """
+        with self._lock:
+            for msg_id in msg_ids:
+                if msg_id in self._requeued:
+                    self._requeued.discard(msg_id)
+                    self._requeued_changes[msg_id] = False
+
+    def save(self):
+        """
+        Merge the changes since the last save into the list on disk and
+        write it through a temp file and atomic rename.
+        """
+        with _save_lock, self._lock:
+            if not self._changes and not self._requeued_changes:
+                return
+            entries, requeued = self._read()
+            for msg_id, entry in self._changes.items():
+                if entry is None:
+                    entries.pop(msg_id, None)
+                else:
+                    entries[msg_id] = entry
+            for msg_id, added in self._requeued_changes.items():
+                if added:
+                    requeued.add(msg_id)
+                else:
+                    requeued.discard(msg_id)
+            self._entries, self._requeued = entries, requeued
+            self._changes = {}
+            self._requeued_changes = {}
+            data = {str(k): v for k, v in sorted(entries.items())}
+            if requeued:
+                data[REQUEUED_KEY] = sorted(requeued)
+            write_json_atomic(self.path, data, ensure_ascii=False, indent=1)
@@ -0,0 +1,311 @@
+"""
+Incremental media-directory scanner for TDL Easy.
+
+Keeps a cached message ID -> file map for mediaDir together with the
+mtime of every scanned directory. refresh() only lists directories whose
+mtime changed, and has() answers from memory, replacing the per-ID
+Get-ChildItem -Recurse of the PowerShell scripts. A directory that is
+still being written to stays within the racy window and is listed on
+every pass, so engines refresh once per finished tdl process, and
+workers finishing together share one pass (refresh(since=...)).
+"""
+import json
+import os
+import re
+import threading
+import time
+
+from tdl_index import INDEX_DIR_NAME, write_json_atomic
+
+# tdl names downloaded files like <chat>_<message>_<name>
+MESSAGE_FILE_RE = re.compile(r'_(\d+)_')
+
+# cache file inside the index directory
+SCAN_CACHE_NAME = 'media-scan.json'
+
+# directories modified this close to their scan are re-listed next time,
+# since a later change within the same mtime tick would go unnoticed
+RACY_WINDOW_NS = 2 * 10**9
+
+def message_id_from_name(name):
+    """
+    Return message ID encoded in a tdl file name, or None.
+    """
+    if name.endswith('.tmp'):
+        return None
+    m = MESSAGE_FILE_RE.search(name)
+    return int(m.group(1)) if m else None
+
+def chat_prefix_from_name(name):
+    """
+    Return the chat part before _<message>_ in a tdl file name.
+    """
+    m = MESSAGE_FILE_RE.search(name)
+    return name[:m.start()] if m else None
+
+class MediaScanner:
+    """
+    Cached map of downloaded message IDs in a media directory.
+    """
+
+    def __init__(self, media_dir, cache_path=None):
+        self.media_dir = os.path.abspath(media_dir)
+        self.cache_path = cache_path or os.path.join(self.media_dir, INDEX_DIR_NAME, SCAN_CACHE_NAME)
+        # relative dir -> {'mtime', 'scanned', 'files': {name: id}, 'subdirs'}
+        self._dirs = {}
+        self._ids = {}
+        # (chat prefix, message ID) -> number of files, and the latest one
+        self._chat_ids = {}
+        self._chat_files = {}
+        self._lock = threading.Lock()
+        self._observer = None
+        # time.monotonic() at the start of the last finished refresh()
+        self._last_pass = None
+
+    # --------------------------------------------------------------------------
+    # Queries
+    # --------------------------------------------------------------------------
+
+    def has(self, msg_id, chat=None):
+        """
+        Return True if a complete file for msg_id was seen; with chat,
+        only files named <chat>_<msg_id>_... count.
+        """
+        if chat is None:
+            return msg_id in self._ids
+        return (chat, msg_id) in self._chat_ids
+
+    def path_for(self, msg_id, chat=None):
+        """
+        Return absolute path of the file for msg_id, or None; with chat,
+        only files named <chat>_<msg_id>_... count.
+        """
+        rel = self._ids.get(msg_id) if chat is None else self._chat_files.get((chat, msg_id))
+        return os.path.join(self.media_dir, rel) if rel else None
+
+    def ids(self, chat=None):
+        """
+        Return the set of message IDs with a file; with chat, only IDs of
+        files named <chat>_<msg_id>_...
+        """
+        if chat is None:
+            return set(self._ids)
+        return {msg_id for prefix, msg_id in list(self._chat_ids) if prefix == chat}
+
+    def __len__(self):
+        return len(self._ids)
+
+    # --------------------------------------------------------------------------
+    # Scanning
+    # --------------------------------------------------------------------------
+
+    def _add_file(self, rel, msg_id):
+        self._ids[msg_id] = rel
+        key = (chat_prefix_from_name(os.path.basename(rel)), msg_id)
+        self._chat_ids[key] = self._chat_ids.get(key, 0) + 1
+        self._chat_files[key] = rel
+
+    def _drop_file(self, rel, msg_id):
+        if self._ids.get(msg_id) == rel:
+            del self._ids[msg_id]
+        key = (chat_prefix_from_name(os.path.basename(rel)), msg_id)
+        if self._chat_files.get(key) == rel:
+            del self._chat_files[key]
+        count = self._chat_ids.get(key, 0) - 1
+        if count > 0:
+            self._chat_ids[key] = count
+        else:
+            self._chat_ids.pop(key, None)
+
+    def _forget_dir(self, rel_dir):
+        entry = self._dirs.pop(rel_dir, None)
+        if not entry:
+            return
+        for name, msg_id in entry['files'].items():
+            self._drop_file(os.path.join(rel_dir, name), msg_id)
+
+    def _scan_dir(self, rel_dir, mtime):
+        # known names are kept as-is, only new names are parsed and stat'ed
+        old = self._dirs.get(rel_dir, {}).get('files', {})
+        files = {}
+        subdirs = []
+        abs_dir = os.path.join(self.media_dir, rel_dir)
+        try:
+            with os.scandir(abs_dir) as it:
+                for entry in it:
+                    name = entry.name
+                    if name in old:
+                        files[name] = old[name]
+                        continue
+                    if entry.is_dir(follow_symlinks=False):
+                        if name != INDEX_DIR_NAME:
+                            subdirs.append(os.path.join(rel_dir, name))
+                        continue
+                    msg_id = message_id_from_name(name)
+                    if msg_id is None:
+                        continue
+                    try:
+                        if entry.stat().st_size <= 0:
+                            continue
+                    except OSError:
+                        continue
+                    files[name] = msg_id
+                    self._add_file(os.path.join(rel_dir, name), msg_id)
+        except OSError:
+            self._forget_dir(rel_dir)
+            return []
+        for name, msg_id in old.items():
+            if name not in files:
+                self._drop_file(os.path.join(rel_dir, name), msg_id)
+        self._dirs[rel_dir] = {'mtime': mtime, 'scanned': time.time_ns(),
+                               'files': files, 'subdirs': subdirs}
+        return subdirs
+
+    def refresh(self, since=None):
+        """
+        Re-list only directories that changed since the last pass.
+        With since (a time.monotonic() value), skip the pass when one
+        that started after since has finished: it saw every file written
+        before then. Returns number of directories scanned.
+        """
+        scanned = 0
+        with self._lock:
+            if since is not None and self._last_pass is not None and self._last_pass >= since:
+                return 0
+            started = time.monotonic()
+            seen = set()
+            pending = ['']
+            while pending:
+                rel_dir = pending.pop()
+                seen.add(rel_dir)
+                try:
+                    mtime = os.stat(os.path.join(self.media_dir, rel_dir)).st_mtime_ns
+                except OSError:
+                    continue
+                entry = self._dirs.get(rel_dir)
+                if (entry is None or entry['mtime'] != mtime
+                        or entry['scanned'] - mtime < RACY_WINDOW_NS):
+                    pending.extend(self._scan_dir(rel_dir, mtime))
+                    scanned += 1
+                else:
+                    pending.extend(entry['subdirs'])
+            for rel_dir in list(self._dirs):
+                if rel_dir not in seen:
+                    self._forget_dir(rel_dir)
+            self._last_pass = started
+        return scanned
+
+    @property
+    def watching(self):
+        return self._observer is not None
+
+    # --------------------------------------------------------------------------
+    # Persistence
+    # --------------------------------------------------------------------------
+
+    def load(self):
+        """
+        Load cached map from disk; returns False if there is none.
+        """
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        with self._lock:
+            self._dirs = data.get('dirs', {})
+            self._ids = {}
+            self._chat_ids = {}
+            self._chat_files = {}
+            for rel_dir, entry in self._dirs.items():
+                for name, msg_id in entry['files'].items():
+                    self._add_file(os.path.join(rel_dir, name), msg_id)
+        return True
+
+    def save(self):
+        """
+        Write cached map to disk through a temp file and atomic rename.
+        """
+        with self._lock:
+            write_json_atomic(self.cache_path, {'dirs': self._dirs}, separators=(',', ':'))
+
+    # --------------------------------------------------------------------------
+    # Filesystem events
+    # --------------------------------------------------------------------------
+
+    def note_created(self, path):
+        """
+        Record a file reported by a watcher or by the engine itself.
+        """
+        name = os.path.basename(path)
+        msg_id = message_id_from_name(name)
+        if msg_id is None:
+            return
+        try:
+            if os.path.getsize(path) <= 0:
+                return
+        except OSError:
+            return
+        rel = os.path.relpath(path, self.media_dir)
+        with self._lock:
+            entry = self._dirs.get(os.path.dirname(rel))
+            if entry is not None:
+                if entry['files'].get(name) == msg_id:
+                    return
+                entry['files'][name] = msg_id
+            self._add_file(rel, msg_id)
+
+    def note_deleted(self, path):
+        rel = os.path.relpath(path, self.media_dir)
+        with self._lock:
+            entry = self._dirs.get(os.path.dirname(rel))
+            if entry is not None and os.path.basename(rel) not in entry['files']:
+                return
+            if entry is not None:
+                entry['files'].pop(os.path.basename(rel))
+            msg_id = message_id_from_name(os.path.basename(rel))
+            if msg_id is not None:
+                self._drop_file(rel, msg_id)
+
+    def start_watching(self):
+        """
+        Follow changes with watchdog if it is installed.
+        Returns False when watchdog is unavailable; refresh() still works.
+        """
+        try:
+            from watchdog.observers import Observer
+            from watchdog.events import FileSystemEventHandler
+        except ImportError:
+            return False
+
+        scanner = self
+
+        class Handler(FileSystemEventHandler):
+            def on_created(self, event):
+                if not event.is_directory:
+                    scanner.note_created(event.src_path)
+
+            def on_modified(self, event):
+                if not event.is_directory:
+                    scanner.note_created(event.src_path)
+
+            def on_moved(self, event):
+                if not event.is_directory:
+                    scanner.note_deleted(event.src_path)
+                    scanner.note_created(event.dest_path)
+
+            def on_deleted(self, event):
+                if not event.is_directory:
+                    scanner.note_deleted(event.src_path)
+
+        self._observer = Observer()
+        self._observer.schedule(Handler(), self.media_dir, recursive=True)
+        self._observer.daemon = True
+        self._observer.start()
+        return True
+
+    def stop_watching(self):
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+            self._observer = None
@@ -0,0 +1,156 @@
+"""
+Progress-based stall detection for tdl processes.
+
+The PowerShell scripts killed every tdl.exe after a fixed 120 s / 300 s,
+cutting big videos off mid-transfer and taking unrelated tdl instances
+with them. The Supervisor only watches the processes an engine started
+itself. A process counts as making progress while its output says
+something new (a progress bar percent that moves, or any other line) or
+while the files of its messages grow in the media directory. Only a
+process that shows neither for idle_timeout seconds is killed, and the
+engine then re-queues its messages.
+"""
+import os
+import re
+import threading
+import time
+
+from tdl_scanner import MESSAGE_FILE_RE
+
+DEFAULT_IDLE_TIMEOUT = 120
+DEFAULT_POLL_INTERVAL = 5.0
+
+_ANSI_RE = re.compile(r'\x1b\[[0-9;?]*[A-Za-z]')
+_PERCENT_RE = re.compile(r'(\d{1,3}(?:\.\d+)?)\s*%')
+
+class Watch:
+    """
+    One supervised tdl process and the message IDs it is downloading.
+    """
+
+    def __init__(self, proc, msg_ids):
+        self.proc = proc
+        self.msg_ids = set(msg_ids)
+        self.started = self.last_activity = time.monotonic()
+        self.stalled = False
+        self._bars = {}
+        self._disk = None
+
+    def touch(self):
+        self.last_activity = time.monotonic()
+
+    def feed(self, line):
+        """
+        Count a line of output as activity unless it is a progress bar
+        redraw whose percent did not move.
+        """
+        line = _ANSI_RE.sub('', line).strip()
+        if not line:
+            return
+        percent = _PERCENT_RE.search(line)
+        if percent is None:
+            self.touch()
+            return
+        # one bar per message file; bars without one share a single slot,
+        # so _bars never grows past the process's own messages
+        m = MESSAGE_FILE_RE.search(line)
+        key = m.group(1) if m else None
+        if self._bars.get(key) != percent.group(1):
+            self._bars[key] = percent.group(1)
+            self.touch()
+
+    def note_disk(self, state):
+        if state != self._disk:
+            if self._disk is not None:
+                self.touch()
+            self._disk = state
+
+    @property
+    def idle(self):
+        return time.monotonic() - self.last_activity
+
+class Supervisor:
+    """
+    Kill engine-owned tdl processes that stop making progress.
+
+    Processes are registered by run_tdl with the IDs they work on. A
+    background thread wakes every poll_interval seconds, takes one listing
+    of the media directory to see whose files grew, and kills any process
+    idle for longer than idle_timeout (its Watch is then marked stalled).
+    """
+
+    def __init__(self, media_dir, idle_timeout=DEFAULT_IDLE_TIMEOUT,
+                 poll_interval=DEFAULT_POLL_INTERVAL, log=None):
+        self.media_dir = media_dir
+        self.idle_timeout = idle_timeout
+        self.poll_interval = poll_interval
+        self.log = log or (lambda text: None)
+        self._watches = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def watch(self, proc, msg_ids=()):
+        watch = Watch(proc, msg_ids)
+        with self._lock:
+            self._watches.add(watch)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, daemon=True)
+                self._thread.start()
+        return watch
+
+    def release(self, watch):
+        with self._lock:
+            self._watches.discard(watch)
+
+    def close(self):
+        self._stop.set()
+
+    def _disk_state(self, watches):
+        """
+        Map message ID -> (bytes in .tmp files, finished files) for the
+        IDs of the given watches.
+        """
+        wanted = set()
+        for watch in watches:
+            wanted |= watch.msg_ids
+        state = {}
+        if not wanted:
+            return state
+        try:
+            entries = os.scandir(self.media_dir)
+        except OSError:
+            return state
+        with entries:
+            for entry in entries:
+                m = MESSAGE_FILE_RE.search(entry.name)
+                if not m or int(m.group(1)) not in wanted:
+                    continue
+                msg_id = int(m.group(1))
+                partial, done = state.get(msg_id, (0, 0))
+                try:
+                    if entry.name.endswith('.tmp'):
+                        partial += entry.stat().st_size
+                    else:
+                        done += 1
+                except OSError:
+                    continue
+                state[msg_id] = (partial, done)
+        return state
+
+    def _loop(self):
+        while not self._stop.wait(self.poll_interval):
+            with self._lock:
+                watches = list(self._watches)
+            disk = self._disk_state(watches)
+            for watch in watches:
+                watch.note_disk(tuple(sorted((i, disk[i]) for i in watch.msg_ids if i in disk)))
+                if watch.idle < self.idle_timeout or watch.proc.poll() is not None:
+                    continue
+                watch.stalled = True
+                self.log(f"[!] tdl made no progress for {int(watch.idle)}s, stopping it "
+                         f"(pid {watch.proc.pid})")
+                try:
+                    watch.proc.kill()
+                except OSError:
+                    pass
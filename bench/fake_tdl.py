@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Simulated tdl executable for the TDL Easy benchmarks.
+
+Understands the two commands the launcher uses:
+
+    tdl chat export -c CHAT -o FILE [-T id -i FROM,TO] [--raw] [--all] [--with-content]
+    tdl download --dir DIR [--url URL ...] [--file EXPORT ...] [-l N] [-t N] ...
+
+Downloads write <chat>_<msg>_<name> files through a .tmp file while
+printing tdl-like progress bars. Behaviour is set with environment
+variables (all optional):
+
+    FAKE_TDL_MESSAGES     messages in every chat (default 1000)
+    FAKE_TDL_STARTUP      seconds before a process starts working (0.2)
+    FAKE_TDL_LATENCY      extra seconds per file (0.01)
+    FAKE_TDL_SPEED        bytes per second per file (50 MiB)
+    FAKE_TDL_MIN_SIZE     smallest file in bytes (1 KiB)
+    FAKE_TDL_MAX_SIZE     largest file in bytes (4 MiB)
+    FAKE_TDL_EMPTY_RATE   share of messages without media (0.1)
+    FAKE_TDL_ERROR_RATE   chance a download fails (0.02)
+    FAKE_TDL_FLOOD_RATE   chance a process hits FLOOD_WAIT (0)
+    FAKE_TDL_FLOOD_WAIT   seconds reported in FLOOD_WAIT (2)
+    FAKE_TDL_SEED         seed for sizes and empty messages (1)
+
+File sizes and empty messages depend only on the seed and the message
+ID, so every run and every mode sees the same chat. File bytes are not
+written out in full unless FAKE_TDL_WRITE_DATA=1; the files are sparse
+so large simulated chats do not fill the disk.
+"""
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+def _env(name, default, kind=float):
+    value = os.environ.get(name)
+    return kind(value) if value not in (None, '') else default
+
+MESSAGES = _env('FAKE_TDL_MESSAGES', 1000, int)
+STARTUP = _env('FAKE_TDL_STARTUP', 0.2)
+LATENCY = _env('FAKE_TDL_LATENCY', 0.01)
+SPEED = _env('FAKE_TDL_SPEED', 50 << 20)
+MIN_SIZE = _env('FAKE_TDL_MIN_SIZE', 1 << 10, int)
+MAX_SIZE = _env('FAKE_TDL_MAX_SIZE', 4 << 20, int)
+EMPTY_RATE = _env('FAKE_TDL_EMPTY_RATE', 0.1)
+ERROR_RATE = _env('FAKE_TDL_ERROR_RATE', 0.02)
+FLOOD_RATE = _env('FAKE_TDL_FLOOD_RATE', 0.0)
+FLOOD_WAIT = _env('FAKE_TDL_FLOOD_WAIT', 2, int)
+SEED = _env('FAKE_TDL_SEED', 1, int)
+WRITE_DATA = os.environ.get('FAKE_TDL_WRITE_DATA') == '1'
+
+_print_lock = threading.Lock()
+
+def say(text, end='\n'):
+    with _print_lock:
+        sys.stdout.write(text + end)
+        sys.stdout.flush()
+
+def option(args, name, default=None):
+    return args[args.index(name) + 1] if name in args else default
+
+def options(args, name):
+    return [args[i + 1] for i, arg in enumerate(args[:-1]) if arg == name]
+
+def message_info(chat, msg_id):
+    """
+    Return (size, document ID) for a media message, or None if the
+    message has no media. Same answer for every process.
+    """
+    rng = random.Random(f"{SEED}:{chat}:{msg_id}")
+    if rng.random() < EMPTY_RATE:
+        return None
+    # mostly small files with a long tail of big ones, like real chats
+    size = int(MIN_SIZE + (MAX_SIZE - MIN_SIZE) * rng.random() ** 4)
+    return size, rng.getrandbits(48)
+
+# ==============================================================================
+# chat export
+# ==============================================================================
+
+def chat_export(args):
+    chat = option(args, '-c')
+    out = option(args, '-o', 'tdl-export.json')
+    low, high = 1, MESSAGES
+    if option(args, '-T') == 'id' and option(args, '-i'):
+        low, high = (int(x) for x in option(args, '-i').split(','))
+    raw = '--raw' in args
+    time.sleep(STARTUP)
+    chat_id = int(chat) if chat.lstrip('-').isdigit() else 777
+    with open(out, 'w', encoding='utf-8') as f:
+        f.write('{"id":%d,"messages":[' % chat_id)
+        first = True
+        for msg_id in range(min(high, MESSAGES), max(low, 1) - 1, -1):
+            info = message_info(chat_id, msg_id)
+            if info is None and '--all' not in args:
+                # like tdl, export only messages with media unless --all
+                continue
+            msg = {'id': msg_id, 'type': 'message', 'file': f"file{msg_id}.bin" if info else ''}
+            if raw and info:
+                msg['raw'] = {'Media': {'Document': {'ID': info[1], 'Size': info[0]}}}
+            f.write(('' if first else ',') + json.dumps(msg, separators=(',', ':')))
+            first = False
+            if msg_id % 500 == 0:
+                f.flush()
+        f.write(']}')
+    say('Export done!')
+    return 0
+
+# ==============================================================================
+# download
+# ==============================================================================
+
+def download_one(media_dir, chat, msg_id, threads):
+    info = message_info(chat, msg_id)
+    if info is None:
+        say(f"Error: message {chat}/{msg_id} has no media")
+        return
+    if random.random() < ERROR_RATE:
+        say(f"Error: failed to get the message {chat}/{msg_id}: rpc error code 400: MEDIA_EMPTY")
+        return
+    size = info[0]
+    name = f"{chat}_{msg_id}_file{msg_id}.bin"
+    path = os.path.join(media_dir, name)
+    tmp = path + '.tmp'
+    duration = LATENCY + size / (SPEED * max(1, min(threads, 4)) / 2)
+    steps = max(1, min(10, int(duration / 0.05)))
+    with open(tmp, 'wb') as f:
+        for step in range(1, steps + 1):
+            time.sleep(duration / steps)
+            done = size * step // steps
+            if WRITE_DATA:
+                f.write(b'\0' * (done - f.tell()))
+            else:
+                f.truncate(done)
+            say(f"{name} {done * 100 / size:5.1f}% [{'#' * step}{'.' * (steps - step)}] "
+                f"[{SPEED / 2**20:.1f} MiB/s]", end='\r')
+    os.replace(tmp, path)
+    say(f"{name} 100.0% done")
+
+def download(args):
+    media_dir = option(args, '--dir', '.')
+    limit = max(1, int(option(args, '-l', '2')))
+    threads = max(1, int(option(args, '-t', '4')))
+    items = []
+    for url in options(args, '--url'):
+        parts = url.rstrip('/').split('/')
+        items.append((parts[-2], int(parts[-1])))
+    for export in options(args, '--file'):
+        with open(export, encoding='utf-8') as f:
+            doc = json.load(f)
+        items += [(str(doc['id']), msg['id']) for msg in doc['messages']]
+    time.sleep(STARTUP)
+    if items and random.random() < FLOOD_RATE:
+        say(f"Error: rpc error code 420: FLOOD_WAIT ({FLOOD_WAIT})")
+        return 1
+    skip_same = '--skip-same' in args
+    pending = list(items)
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            with lock:
+                if not pending:
+                    return
+                chat, msg_id = pending.pop(0)
+            chat_id = int(chat) if chat.lstrip('-').isdigit() else 777
+            name = f"{chat_id}_{msg_id}_file{msg_id}.bin"
+            if skip_same and os.path.exists(os.path.join(media_dir, name)):
+                continue
+            download_one(media_dir, chat_id, msg_id, threads)
+
+    workers = [threading.Thread(target=worker) for _ in range(min(limit, len(items)) or 1)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return 0
+
+def main(argv):
+    if argv[:2] == ['chat', 'export']:
+        return chat_export(argv[2:])
+    if argv[:1] == ['download']:
+        return download(argv[1:])
+    say(f"fake tdl: unsupported command: {' '.join(argv)}")
+    return 2
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmarks for the TDL Easy download pipelines.
+
+Runs the range, full-chat, single-file and bulk engines from GUI/ against the
+simulated tdl in fake_tdl.py, each scenario in its own process, and
+reports wall-clock time, throughput, tdl spawn count and peak memory.
+Needs no Telegram account or network, so it runs on a plain Linux box:
+
+    python bench/run_bench.py                      # all scenarios
+    python bench/run_bench.py -s range-batch -m 5000
+    python bench/run_bench.py --json out.json
+    python bench/run_bench.py --baseline out.json  # fail on regressions
+
+With --baseline the exit code is 1 when a scenario is slower, spawns more
+tdl processes or uses more memory than the baseline by more than
+--tolerance.
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+GUI_DIR = os.path.join(os.path.dirname(BENCH_DIR), 'GUI')
+FAKE_TDL = os.path.join(BENCH_DIR, 'fake_tdl.py')
+
+# name -> (mode, engine options); range/full IDs run 1..messages, bulk
+# spreads as many message links over BULK_CHATS chats. 'auto' gives the
+# engine an AimdController that updates every AUTO_INTERVAL s
+SCENARIOS = {
+    'range': ('range', {'download_limit': 4}),
+    'range-batch': ('range', {'download_limit': 4, 'batch_size': 10}),
+    'range-plan': ('range', {'download_limit': 4, 'batch_size': 10, 'plan': True}),
+    'full': ('full', {'workers': 2, 'download_limit': 4}),
+    'full-pack': ('full', {'workers': 3, 'download_limit': 4, 'pack': True}),
+    'single': ('single', {}),
+    'auto': ('range', {'batch_size': 10, 'auto': True}),
+    'bulk': ('bulk', {'download_limit': 4, 'batch_size': 10}),
+}
+
+BULK_CHATS = 4
+
+# short enough for the controller to probe within a benchmark run
+AUTO_INTERVAL = 0.5
+
+# metrics compared against a baseline: higher is worse for all of them
+REGRESSION_KEYS = ('wall_s', 'spawns', 'peak_rss_kb')
+
+def install_fake_tdl(tdl_dir):
+    """
+    Put an executable `tdl` that runs fake_tdl.py with this Python into
+    tdl_dir and return its path.
+    """
+    path = os.path.join(tdl_dir, 'tdl')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(f"#!/bin/sh\nexec '{sys.executable}' '{FAKE_TDL}' \"$@\"\n")
+    os.chmod(path, 0o755)
+    return path
+
+def peak_rss_kb(children=False):
+    """
+    Peak resident memory of this process (or its finished children) in KiB.
+    """
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    return resource.getrusage(resource.RUSAGE_CHILDREN if children
+                              else resource.RUSAGE_SELF).ru_maxrss
+
+# ==============================================================================
+# One scenario (child process)
+# ==============================================================================
+
+def _quiet(text):
+    pass
+
+def run_scenario(name, messages, rate_limit):
+    sys.path.insert(0, GUI_DIR)
+    import tdl_engine
+    from tdl_adaptive import AimdController
+    from tdl_links import parse_links
+
+    mode, opts = SCENARIOS[name]
+    opts = dict(opts)
+    if opts.pop('auto', False):
+        opts['controller'] = AimdController(interval=AUTO_INTERVAL)
+    work = tempfile.mkdtemp(prefix=f"tdl-bench-{name}-")
+    try:
+        tdl_dir = os.path.join(work, 'tdl')
+        media_dir = os.path.join(work, 'media')
+        os.makedirs(tdl_dir)
+        os.makedirs(media_dir)
+        tdl_exe = install_fake_tdl(tdl_dir)
+        chat = '1001'
+        common = {'tdl_exe': tdl_exe, 'log': _quiet, 'rate_limit': rate_limit}
+        if mode == 'full':
+            engine = tdl_engine.FullChatEngine(tdl_dir, media_dir, chat, **common, **opts)
+        elif mode == 'bulk':
+            urls = [f"https://t.me/c/{int(chat) + i % BULK_CHATS}/{i // BULK_CHATS + 1}"
+                    for i in range(messages)]
+            links, _invalid, _duplicates = parse_links('\n'.join(urls))
+            engine = tdl_engine.BulkEngine(tdl_dir, media_dir, links, **common, **opts)
+        else:
+            end_id = 1 if mode == 'single' else messages
+            engine = tdl_engine.RangeEngine(tdl_dir, media_dir, f"https://t.me/c/{chat}/", 1,
+                                            end_id, **common, **opts)
+        started = time.perf_counter()
+        stats = engine.run()
+        wall = time.perf_counter() - started
+        snap = engine.progress.snapshot()
+        return {
+            'scenario': name,
+            'messages': 1 if mode == 'single' else messages,
+            'wall_s': round(wall, 3),
+            'downloaded': stats['downloaded'],
+            'failed': stats['failed'],
+            'bytes': snap['bytes'],
+            'files_per_s': round(stats['downloaded'] / wall, 2) if wall else None,
+            'mib_per_s': round(snap['bytes'] / wall / 2**20, 2) if wall else None,
+            'spawns': snap['spawns'],
+            'avg_startup_s': round(snap['avg_startup'], 3) if snap['avg_startup'] else None,
+            'peak_rss_kb': peak_rss_kb(),
+            'tdl_peak_rss_kb': peak_rss_kb(children=True),
+        }
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+# ==============================================================================
+# Driver
+# ==============================================================================
+
+def run_child(name, messages, rate_limit, env):
+    proc = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', name,
+                           '-m', str(messages), '--rate-limit', str(rate_limit)],
+                          env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"scenario {name} failed:\n{proc.stderr}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+def print_table(results):
+    columns = ('scenario', 'messages', 'wall_s', 'downloaded', 'failed', 'files_per_s',
+               'mib_per_s', 'spawns', 'avg_startup_s', 'peak_rss_kb')
+    widths = [max(len(c), *(len(str(r.get(c))) for r in results)) for c in columns]
+    print('  '.join(c.ljust(w) for c, w in zip(columns, widths)))
+    for r in results:
+        print('  '.join(str(r.get(c)).ljust(w) for c, w in zip(columns, widths)))
+
+def compare(results, baseline, tolerance):
+    """
+    Return a list of regression messages against baseline results.
+    """
+    previous = {r['scenario']: r for r in baseline}
+    problems = []
+    for r in results:
+        old = previous.get(r['scenario'])
+        if not old or old.get('messages') != r['messages']:
+            continue
+        for key in REGRESSION_KEYS:
+            if old.get(key) and r.get(key) and r[key] > old[key] * (1 + tolerance):
+                problems.append(f"{r['scenario']}: {key} {old[key]} -> {r[key]}")
+    return problems
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='TDL Easy pipeline benchmarks (fake tdl)')
+    parser.add_argument('-s', '--scenario', action='append', choices=sorted(SCENARIOS),
+                        help='scenario to run (repeatable, default: all)')
+    parser.add_argument('-m', '--messages', type=int, default=1000,
+                        help='messages per chat (default 1000)')
+    parser.add_argument('--rate-limit', type=float, default=100.0,
+                        help='tdl starts per second allowed by the engines (default 100)')
+    parser.add_argument('--startup', type=float, help='fake tdl startup seconds per process')
+    parser.add_argument('--latency', type=float, help='fake tdl extra seconds per file')
+    parser.add_argument('--error-rate', type=float, help='chance a download fails')
+    parser.add_argument('--flood-rate', type=float, help='chance a tdl process hits FLOOD_WAIT')
+    parser.add_argument('--max-size', type=int, help='largest simulated file in bytes')
+    parser.add_argument('--json', help='write results to this file')
+    parser.add_argument('--baseline', help='compare with results written by --json earlier')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed slowdown/growth against the baseline (default 0.25)')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.child:
+        print(json.dumps(run_scenario(args.child, args.messages, args.rate_limit)))
+        return 0
+
+    env = dict(os.environ, FAKE_TDL_MESSAGES=str(args.messages))
+    for option, var in (('startup', 'FAKE_TDL_STARTUP'), ('latency', 'FAKE_TDL_LATENCY'),
+                        ('error_rate', 'FAKE_TDL_ERROR_RATE'), ('flood_rate', 'FAKE_TDL_FLOOD_RATE'),
+                        ('max_size', 'FAKE_TDL_MAX_SIZE')):
+        if getattr(args, option) is not None:
+            env[var] = str(getattr(args, option))
+    results = []
+    for name in args.scenario or list(SCENARIOS):
+        print(f"[bench] {name}...", file=sys.stderr, flush=True)
+        results.append(run_child(name, args.messages, args.rate_limit, env))
+    print_table(results)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            problems = compare(results, json.load(f), args.tolerance)
+        for problem in problems:
+            print(f"[regression] {problem}")
+        return 1 if problems else 0
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -163,7 +163,7 @@ if (-not $useSaved) {
             }
             $input = $input.TrimEnd('/')
 
-            if ($input -notmatch '^https?://t\.me/(?:(?:c/\d+/\d+/\d+)|(?:c/\d+/\d+)|(?:[A-Za-z0-9_]{5,32}/\d+))$') {
+            if ($input -notmatch '^https?://t\.me/(?:(?:c/\d+/\d+/\d+)|(?:c/\d+/\d+)|(?:[A-Za-z][A-Za-z0-9_]{4,31}/\d+))$') {
                 Write-Emoji "[x] Error: URL must be of form https://t.me/c/12345678/123 or https://t.me/username/123 or topic message like https://t.me/c/2267448302/166/4857." "Red"
                 continue
             }
@@ -243,7 +243,7 @@ $errorFile = "${mediaDir}\error_index.txt"
 $channelId = $null
 if ($telegramMessageUrl -match '^https?://t\.me/c/(\d+)(?:/\d+){1,2}$') {
     $channelId = $Matches[1]
-} elseif ($telegramMessageUrl -match '^https?://t\.me/([A-Za-z0-9_]{5,32})/\d+$') {
+} elseif ($telegramMessageUrl -match '^https?://t\.me/([A-Za-z][A-Za-z0-9_]{4,31})/\d+$') {
     $channelId = $Matches[1]
 }
 if ([string]::IsNullOrWhiteSpace($channelId)) {
@@ -255,7 +255,7 @@ if ([string]::IsNullOrWhiteSpace($channelId)) {
             $telegramMessageUrl = $resp
             $channelId = $Matches[1]
             break
-        } elseif ($resp -match '^https?://t\.me/([A-Za-z0-9_]{5,32})/\d+$') {
+        } elseif ($resp -match '^https?://t\.me/([A-Za-z][A-Za-z0-9_]{4,31})/\d+$') {
             $telegramMessageUrl = $resp
             $channelId = $Matches[1]
             break
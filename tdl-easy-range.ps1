@@ -186,7 +186,7 @@ if (-not $useSaved) {
             $segments = $parsedUri.AbsolutePath.Trim('/').Split('/')
             $messageId = $null
             
-            if ($segments.Length -eq 2 -and $segments[0] -match '^[A-Za-z0-9_]{5,32}$' -and $segments[1] -match '^\d+$') {
+            if ($segments.Length -eq 2 -and $segments[0] -match '^[A-Za-z][A-Za-z0-9_]{4,31}$' -and $segments[1] -match '^\d+$') {
                 # public username format: https://t.me/username/1234
                 $messageId = [int]$segments[1]
             } elseif ($segments.Length -eq 3 -and $segments[0] -eq 'c' -and $segments[1] -match '^\d+$' -and $segments[2] -match '^\d+$') {
@@ -237,7 +237,7 @@ if (-not $useSaved) {
             $segments = $parsedUri.AbsolutePath.Trim('/').Split('/')
             $messageId = $null
             
-            if ($segments.Length -eq 2 -and $segments[0] -match '^[A-Za-z0-9_]{5,32}$' -and $segments[1] -match '^\d+$') {
+            if ($segments.Length -eq 2 -and $segments[0] -match '^[A-Za-z][A-Za-z0-9_]{4,31}$' -and $segments[1] -match '^\d+$') {
                 # public username format: https://t.me/username/1234
                 $messageId = [int]$segments[1]
             } elseif ($segments.Length -eq 3 -and $segments[0] -eq 'c' -and $segments[1] -match '^\d+$' -and $segments[2] -match '^\d+$') {
@@ -342,7 +342,7 @@ function Get-BaseUrl {
         $parsedUri = [uri]$messageUrl
         $segments = $parsedUri.AbsolutePath.Trim('/').Split('/')
         
-        if ($segments.Length -eq 2 -and $segments[0] -match '^[A-Za-z0-9_]{5,32}$') {
+        if ($segments.Length -eq 2 -and $segments[0] -match '^[A-Za-z][A-Za-z0-9_]{4,31}$') {
             # public username format: https://t.me/username/1234
             return "https://t.me/$($segments[0])/"
         } elseif ($segments.Length -eq 3 -and $segments[0] -eq 'c' -and $segments[1] -match '^\d+$') {
@@ -369,7 +369,7 @@ if ([string]::IsNullOrWhiteSpace($telegramUrl)) {
 $channelId = $null
 if ($telegramUrl -match '^https?://t\.me/c/(\d+)(?:/\d+)?/$') {
     $channelId = $Matches[1]
-} elseif ($telegramUrl -match '^https?://t\.me/([A-Za-z0-9_]{5,32})/$') {
+} elseif ($telegramUrl -match '^https?://t\.me/([A-Za-z][A-Za-z0-9_]{4,31})/$') {
     $channelId = $Matches[1]
 }
 if ([string]::IsNullOrWhiteSpace($channelId)) {
@@ -49,7 +49,7 @@ do {
     # - public username message: https://t.me/username/123
     # - internal channel message: https://t.me/c/12345678/123
     # - forum topic message: https://t.me/c/12345678/<topic_id>/<message_id>
-    if ($telegramUrl -notmatch '^https?://t\.me/(?:c/\d+/\d+(?:/\d+)?|[A-Za-z0-9_]+/\d+)$') {
+    if ($telegramUrl -notmatch '^https?://t\.me/(?:c/\d+/\d+(?:/\d+)?|[A-Za-z][A-Za-z0-9_]{4,31}/\d+)$') {
         Write-Emoji "[x] Error: URL must be one of forms: https://t.me/c/12345678/123 , https://t.me/abc/123 or topic link like https://t.me/c/2267448302/166/4857" "Red"
         continue
     }
@@ -0,0 +1,46 @@
+import json
+
+import pytest
+
+from tdl_export import ExportFormatError, ExportReader, filter_export
+
+
+def write_export(path, chat_id, ids):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'id': chat_id, 'messages': [{'id': i, 'file': f"f{i}.bin"} for i in ids]}, f)
+
+
+def test_reader_streams_messages_and_header(tmp_path):
+    path = str(tmp_path / 'export.json')
+    write_export(path, 1001, range(1, 2001))
+    reader = ExportReader(path, chunk_size=64)
+    assert [m['id'] for m in reader] == list(range(1, 2001))
+    assert reader.chat_id == 1001
+
+
+def test_reader_header_after_messages(tmp_path):
+    path = str(tmp_path / 'export.json')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('{"messages": [{"id": 1}, {"id": 2}], "id": 42}')
+    reader = ExportReader(path)
+    assert [m['id'] for m in reader] == [1, 2]
+    assert reader.chat_id == 42
+
+
+def test_reader_rejects_non_export(tmp_path):
+    path = str(tmp_path / 'export.json')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('not json at all')
+    with pytest.raises(ExportFormatError):
+        list(ExportReader(path))
+
+
+def test_filter_export_in_place(tmp_path):
+    path = str(tmp_path / 'export.json')
+    write_export(path, 7, range(1, 11))
+    assert filter_export(path, path, {2, 5, 99}) == 2
+    reader = ExportReader(path)
+    assert [m['id'] for m in reader] == [2, 5]
+    assert reader.chat_id == 7
+    assert filter_export(path, path, set()) == 0
+    assert list(ExportReader(path)) == []
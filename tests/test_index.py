@@ -0,0 +1,97 @@
+import os
+import stat
+import sys
+
+import pytest
+
+from tdl_index import IdBitmap, IdIndex, journal_path, write_json_atomic
+from tdl_journal import OP_ADD, RECORD, Journal
+
+
+def test_bitmap_add_and_contains():
+    ids = IdBitmap()
+    assert ids.add(5)
+    assert not ids.add(5)
+    assert 5 in ids and 4 not in ids and 10**6 not in ids
+    assert len(ids) == 1
+
+
+def test_bitmap_add_range_counts_existing_ids_once():
+    ids = IdBitmap()
+    ids.add(20)
+    ids.add_range(3, 40)
+    assert len(ids) == 38
+    assert ids.intervals() == [(3, 40)]
+    ids.add_range(100, 100)
+    assert ids.intervals() == [(3, 40), (100, 100)]
+
+
+def test_bitmap_intervals_window():
+    ids = IdBitmap()
+    ids.add_range(1, 10)
+    ids.add_range(20, 30)
+    assert ids.intervals(5, 25) == [(5, 10), (20, 25)]
+    assert ids.intervals(11, 19) == []
+
+
+def test_journal_replay_drops_torn_tail(tmp_path):
+    path = str(tmp_path / 'x.journal')
+    journal = Journal(path)
+    journal.append(OP_ADD, 1, 5)
+    journal.append(OP_ADD, 9, 9)
+    journal.close()
+    with open(path, 'ab') as f:
+        f.write(b'\x01\x00\x00')
+    journal = Journal(path)
+    assert list(journal.replay()) == [(OP_ADD, 1, 5), (OP_ADD, 9, 9)]
+    assert os.path.getsize(path) == 2 * RECORD.size
+
+
+def test_journal_replay_stops_at_corrupt_record(tmp_path):
+    path = str(tmp_path / 'x.journal')
+    journal = Journal(path)
+    for start in (1, 10, 20):
+        journal.append(OP_ADD, start, start)
+    journal.close()
+    with open(path, 'r+b') as f:
+        f.seek(RECORD.size + 4)
+        f.write(b'\xff')
+    assert list(Journal(path).replay()) == [(OP_ADD, 1, 1)]
+    assert os.path.getsize(path) == RECORD.size
+
+
+def test_index_reopens_from_journal(tmp_path):
+    path = str(tmp_path / 'chat.processed.idx')
+    index = IdIndex(path)
+    index.update([1, 2, 3, 7])
+    index.add(8)
+    index.close()
+    reopened = IdIndex(path)
+    assert reopened.intervals() == [(1, 3), (7, 8)]
+    # replaying compacts the journal into the checkpoint
+    assert not os.path.exists(journal_path(path))
+    reopened.close()
+
+
+def test_index_survives_torn_journal_tail(tmp_path):
+    path = str(tmp_path / 'chat.processed.idx')
+    index = IdIndex(path)
+    index.update(range(1, 6))
+    index.compact()
+    index.add(10)
+    index.close()
+    with open(journal_path(path), 'ab') as f:
+        f.write(b'\x01\x00')
+    reopened = IdIndex(path)
+    assert reopened.intervals() == [(1, 5), (10, 10)]
+    reopened.close()
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason='no POSIX file modes')
+def test_write_json_atomic_uses_umask_mode(tmp_path):
+    path = str(tmp_path / 'sub' / 'state.json')
+    write_json_atomic(path, {'a': 1})
+    umask = os.umask(0)
+    os.umask(umask)
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o666 & ~umask
+    assert os.listdir(os.path.dirname(path)) == ['state.json']
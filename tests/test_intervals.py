@@ -0,0 +1,57 @@
+from tdl_intervals import IntervalSet
+
+
+def test_merges_overlapping_and_adjacent():
+    s = IntervalSet([(5, 7), (1, 3), (4, 4), (10, 12), (11, 20)])
+    assert s.intervals() == [(1, 7), (10, 20)]
+    assert len(s) == 18
+    assert s.bounds() == (1, 20)
+
+
+def test_drops_empty_intervals():
+    s = IntervalSet([(5, 4), (1, 1)])
+    assert s.intervals() == [(1, 1)]
+    assert IntervalSet().bounds() is None
+
+
+def test_from_ids_builds_runs():
+    s = IntervalSet.from_ids([9, 3, 1, 2, 8])
+    assert s.intervals() == [(1, 3), (8, 9)]
+    assert list(s) == [1, 2, 3, 8, 9]
+
+
+def test_contains():
+    s = IntervalSet([(1, 3), (10, 10)])
+    assert 1 in s and 3 in s and 10 in s
+    assert 0 not in s and 4 not in s and 11 not in s
+
+
+def test_union():
+    a = IntervalSet([(1, 5), (20, 25)])
+    b = IntervalSet([(6, 8), (22, 30), (40, 40)])
+    assert (a | b).intervals() == [(1, 8), (20, 30), (40, 40)]
+
+
+def test_intersection():
+    a = IntervalSet([(1, 10), (20, 30)])
+    b = IntervalSet([(5, 22), (25, 26), (29, 40)])
+    assert (a & b).intervals() == [(5, 10), (20, 22), (25, 26), (29, 30)]
+    assert not (a & IntervalSet([(11, 19)]))
+
+
+def test_subtraction():
+    a = IntervalSet([(1, 20)])
+    b = IntervalSet([(1, 2), (5, 6), (10, 12), (20, 30)])
+    assert (a - b).intervals() == [(3, 4), (7, 9), (13, 19)]
+    assert (a - IntervalSet()).intervals() == [(1, 20)]
+    assert not (b - IntervalSet([(0, 100)]))
+
+
+def test_algebra_matches_python_sets():
+    a = IntervalSet([(1, 4), (9, 15), (30, 31)])
+    b = IntervalSet([(3, 10), (15, 15), (17, 29)])
+    sa, sb = set(a), set(b)
+    assert set(a | b) == sa | sb
+    assert set(a & b) == sa & sb
+    assert set(a - b) == sa - sb
+    assert set(b - a) == sb - sa
@@ -0,0 +1,79 @@
+import threading
+
+from tdl_jobs import STATUS_DONE, JobStore, Scheduler
+
+
+class FakeEngine:
+    """
+    Engine stand-in that runs until its job's event is set.
+    """
+
+    def __init__(self, chat, release):
+        self.chat = chat
+        self.release = release
+        self.stopped = False
+        self.budget = None
+
+    def run(self):
+        self.release.wait(5)
+        return {'downloaded': 0, 'failed': 0, 'skipped': 0}
+
+    def stop(self, kill=False):
+        self.stopped = True
+        self.release.set()
+
+
+def make_scheduler(tmp_path, max_jobs=4):
+    store = JobStore(str(tmp_path / 'jobs'))
+    releases = {}
+
+    def factory(mode, config):
+        engine = FakeEngine(config['chat'], threading.Event())
+        releases[config['name']] = engine.release
+        return engine
+    return store, Scheduler(store, factory, max_jobs=max_jobs), releases
+
+
+def add(store, name, chat, chats=None, priority=0):
+    return store.add('range', config={'name': name, 'chat': chat}, chat=chat,
+                     chats=chats, priority=priority)
+
+
+def running_names(scheduler):
+    return sorted(scheduler.store.get(job_id)['config']['name'] for job_id in scheduler.running)
+
+
+def test_one_job_per_chat(tmp_path):
+    store, scheduler, releases = make_scheduler(tmp_path)
+    add(store, 'a1', 'A')
+    add(store, 'a2', 'a')
+    add(store, 'b', 'B')
+    assert scheduler.schedule() == 2
+    assert running_names(scheduler) == ['a1', 'b']
+    scheduler.stop(timeout=5)
+
+
+def test_bulk_job_blocks_all_its_chats(tmp_path):
+    store, scheduler, releases = make_scheduler(tmp_path)
+    bulk = add(store, 'bulk', 'links', chats=['A', 'B'])
+    add(store, 'b', 'B')
+    add(store, 'c', 'C')
+    assert scheduler.schedule() == 2
+    assert running_names(scheduler) == ['bulk', 'c']
+    thread = scheduler._job_threads[bulk['id']]
+    releases['bulk'].set()
+    thread.join(5)
+    assert store.get(bulk['id'])['status'] == STATUS_DONE
+    assert scheduler.schedule() == 1
+    assert running_names(scheduler) == ['b', 'c']
+    scheduler.stop(timeout=5)
+
+
+def test_priority_then_age(tmp_path):
+    store, scheduler, _releases = make_scheduler(tmp_path, max_jobs=1)
+    add(store, 'old', 'A')
+    add(store, 'urgent', 'B', priority=5)
+    add(store, 'new', 'C')
+    scheduler.schedule()
+    assert running_names(scheduler) == ['urgent']
+    scheduler.stop(timeout=5)
@@ -0,0 +1,31 @@
+from tdl_links import group_links, parse_link, parse_links
+
+
+def test_parse_links_kinds_and_duplicates():
+    text = '\n'.join([
+        'https://t.me/c/1001/5',
+        'https://t.me/somechannel/7',
+        'see t.me/SomeChannel/7 again',
+        'https://t.me/c/1001/12/6',
+        'https://t.me/c/1001/5',
+        'https://t.me/joinchat',
+    ])
+    links, invalid, duplicates = parse_links(text)
+    assert [(link.chat, link.message) for link in links] == [
+        ('1001', 5), ('somechannel', 7), ('1001', 6)]
+    assert links[2].topic == 12
+    assert duplicates == 2
+    assert invalid == ['https://t.me/joinchat']
+
+
+def test_parse_link_single():
+    link = parse_link('https://t.me/c/1001/5')
+    assert (link.chat, link.topic, link.message) == ('1001', None, 5)
+    assert parse_link('https://example.com/1') is None
+
+
+def test_group_links_by_chat():
+    links, _invalid, _duplicates = parse_links(
+        'https://t.me/somechannel/9 https://t.me/c/1001/3 https://t.me/SomeChannel/2')
+    groups = group_links(links)
+    assert sorted(groups.values()) == [[2, 9], [3]]
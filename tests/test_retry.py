@@ -0,0 +1,28 @@
+from tdl_retry import DeadLetters
+
+
+def test_save_merges_concurrent_requeue(tmp_path):
+    job = DeadLetters.open(str(tmp_path), '1001')
+    job.update([1, 2, 3], error='boom')
+    job.save()
+    launcher = DeadLetters.open(str(tmp_path), '1001')
+    assert launcher.requeue([2]) == [2]
+    launcher.save()
+    job.add(4, error='boom')
+    job.save()
+    assert list(DeadLetters.open(str(tmp_path), '1001')) == [1, 3, 4]
+    assert list(job) == [1, 3, 4]
+
+
+def test_requeued_ids_kept_until_cleared(tmp_path):
+    letters = DeadLetters.open(str(tmp_path), '1001')
+    letters.update([5, 9])
+    letters.save()
+    letters.requeue()
+    letters.save()
+    reopened = DeadLetters.open(str(tmp_path), '1001')
+    assert len(reopened) == 0
+    assert reopened.requeued() == [5, 9]
+    reopened.clear_requeued([5])
+    reopened.save()
+    assert DeadLetters.open(str(tmp_path), '1001').requeued() == [9]